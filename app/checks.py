@@ -0,0 +1,14 @@
+from django.core.checks import Error, register
+
+
+@register()
+def check_export_schemas(app_configs, **kwargs):
+    from .views import BaseModelViewSet
+
+    errors = []
+    for viewset in BaseModelViewSet.__subclasses__():
+        if viewset.export_schema is None:
+            continue
+        for message in viewset.export_schema.check(viewset.queryset.model):
+            errors.append(Error(message, obj=viewset, id='app.E001'))
+    return errors
@@ -0,0 +1,129 @@
+import re
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Func, Q, Value
+from django.db.models.lookups import GreaterThan
+from django_filters import rest_framework as filters
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Contact, CreditNote, Expense, Invoice, SalesOrder
+
+# InnoDB drops shorter words from its full-text index (innodb_ft_min_token_size).
+MIN_TOKEN_SIZE = 3
+
+
+class SearchMatch(Func):
+    """Full-text match of `query` against the given columns.
+
+    Renders the expressions the full-text indexes in 0003_search_indexes
+    were built on: MATCH ... AGAINST on MySQL, to_tsvector('simple', ...)
+    on PostgreSQL.
+    """
+    output_field = BooleanField()
+
+    def __init__(self, *fields, query, output_field=None):
+        super().__init__(*[F(field) for field in fields], output_field=output_field)
+        self.query = query
+
+    def columns(self, compiler):
+        return [compiler.compile(expression)[0] for expression in self.get_source_expressions()]
+
+    def as_mysql(self, compiler, connection):
+        terms = ' '.join(f'+{word}*' for word in search_words(self.query))
+        return f"MATCH ({', '.join(self.columns(compiler))}) AGAINST (%s IN BOOLEAN MODE)", [terms]
+
+    def as_postgresql(self, compiler, connection):
+        document = " || ' ' || ".join(f"COALESCE({column}, '')" for column in self.columns(compiler))
+        return f"to_tsvector('simple', {document}) @@ plainto_tsquery('simple', %s)", [self.query]
+
+
+def search_words(query):
+    return [word for word in re.findall(r'\w+', query) if len(word) >= MIN_TOKEN_SIZE]
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    # ?q= over the view's search_fields. Backends without a full-text index
+    # (SQLite in development) fall back to icontains.
+    search_param = 'q'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        fields = getattr(view, 'search_fields', None)
+        if not query or not fields:
+            return queryset
+        vendor = connections[queryset.db].vendor
+        if vendor == 'mysql' and search_words(query):
+            # MATCH() is a relevance score there; InnoDB answers "> 0" from the
+            # FULLTEXT index, where Django would otherwise compare it to TRUE.
+            return queryset.filter(GreaterThan(SearchMatch(*fields, query=query, output_field=FloatField()), Value(0)))
+        if vendor == 'postgresql':
+            return queryset.filter(SearchMatch(*fields, query=query))
+        condition = Q()
+        for field in fields:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition)
+
+
+class ContactFilter(filters.FilterSet):
+    class Meta:
+        model = Contact
+        fields = {
+            'status': ['exact', 'in'],
+            'currency_code': ['exact'],
+        }
+
+
+class InvoiceFilter(filters.FilterSet):
+    date_from = filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = filters.DateFilter(field_name='date', lookup_expr='lte')
+    total_min = filters.NumberFilter(field_name='total', lookup_expr='gte')
+    total_max = filters.NumberFilter(field_name='total', lookup_expr='lte')
+
+    class Meta:
+        model = Invoice
+        fields = {
+            'status': ['exact', 'in'],
+            'customer_id': ['exact'],
+            'currency_code': ['exact'],
+        }
+
+
+class SalesOrderFilter(filters.FilterSet):
+    date_from = filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = filters.DateFilter(field_name='date', lookup_expr='lte')
+    customer_id = filters.CharFilter(field_name='contact_id')
+
+    class Meta:
+        model = SalesOrder
+        fields = {
+            'status': ['exact', 'in'],
+        }
+
+
+class CreditNoteFilter(filters.FilterSet):
+    date_from = filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = filters.DateFilter(field_name='date', lookup_expr='lte')
+    total_min = filters.NumberFilter(field_name='total', lookup_expr='gte')
+    total_max = filters.NumberFilter(field_name='total', lookup_expr='lte')
+
+    class Meta:
+        model = CreditNote
+        fields = {
+            'status': ['exact', 'in'],
+            'customer_id': ['exact'],
+            'currency_code': ['exact'],
+        }
+
+
+class ExpenseFilter(filters.FilterSet):
+    date_from = filters.DateFilter(field_name='date', lookup_expr='gte')
+    date_to = filters.DateFilter(field_name='date', lookup_expr='lte')
+    total_min = filters.NumberFilter(field_name='total', lookup_expr='gte')
+    total_max = filters.NumberFilter(field_name='total', lookup_expr='lte')
+
+    class Meta:
+        model = Expense
+        fields = {
+            'status': ['exact', 'in'],
+            'customer_id': ['exact'],
+            'currency_code': ['exact'],
+        }
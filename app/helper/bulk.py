@@ -0,0 +1,166 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+
+from . import cascade, summary
+from .validation import REQUIRED, CompiledValidator
+from .versions import bump
+from .writer import chunked
+
+
+class BulkWrite:
+    """Create, partially update or delete many rows of one user's entity.
+
+    Items are validated in one pass with the importer's CompiledValidator,
+    unique and foreign keys are checked with one query per field, and the
+    valid items are written in a single transaction with bulk_create,
+    bulk_update or one DELETE per batch. Every method returns one result per
+    input item, in input order; invalid items are reported and skipped.
+    The owner of created rows is always the requesting user.
+    """
+
+    def __init__(self, model, user, batch_size=None):
+        self.model = model
+        self.user = user
+        self.batch_size = batch_size or getattr(settings, 'BULK_WRITE_BATCH_SIZE', 500)
+        self.validator = CompiledValidator.for_model(model)
+        meta = model._meta
+        self.pk = meta.pk
+        self.unique_fields = [f for f in meta.concrete_fields if f.unique and not f.auto_created]
+        self.auto_now_fields = [f for f in meta.concrete_fields if getattr(f, 'auto_now', False)]
+
+    def create(self, items):
+        results = {}
+        clean = self.validate(items, results)
+        clean = self.check_unique([(index, None, data) for index, data in clean], results)
+        objs = [(index, self.model(user=self.user, **data)) for index, _, data in clean]
+        if objs:
+            with transaction.atomic():
+                self.model.objects.bulk_create([obj for _, obj in objs], batch_size=self.batch_size)
+                summary.apply(self.model, [], [obj for _, obj in objs])
+                bump(self.user.id, self.model)
+        for index, obj in objs:
+            # Auto-increment keys are not returned by bulk_create on MySQL.
+            results[index] = {"index": index, "status": "created", "pk": obj.pk}
+        return [results[index] for index in range(len(items))]
+
+    def update(self, items):
+        results = {}
+        keys = {}
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            try:
+                keys[index] = self.key(item)
+            except DjangoValidationError as e:
+                results[index] = self.failure(index, {self.pk.name: e.messages})
+        clean = self.validate(items, results, partial=True)
+        clean = [(index, keys[index], data) for index, data in clean if index in keys]
+
+        with transaction.atomic():
+            instances = self.fetch(keys.values(), lock=True)
+            changed = [(index, key, data) for index, key, data in clean if key in instances]
+            for index, key, _ in clean:
+                if key not in instances:
+                    results[index] = self.failure(index, {self.pk.name: ["Not found."]}, key)
+            changed = self.check_unique(changed, results)
+
+            updated, fields = {}, set()
+            for index, key, data in changed:
+                data.pop(self.pk.attname, None)
+                obj = instances[key]
+                for attname, value in data.items():
+                    setattr(obj, attname, value)
+                fields.update(data)
+                updated[key] = obj
+                results[index] = {"index": index, "status": "updated", "pk": key}
+            if updated:
+                old = summary.snapshot(self.model, list(updated))
+                for field in self.auto_now_fields:
+                    for obj in updated.values():
+                        field.pre_save(obj, add=False)
+                    fields.add(field.attname)
+                if fields:
+                    self.model.objects.bulk_update(list(updated.values()), sorted(fields), batch_size=self.batch_size)
+                summary.apply(self.model, old, list(updated.values()))
+                bump(self.user.id, self.model)
+        return [results[index] for index in range(len(items))]
+
+    def delete(self, items):
+        results = {}
+        keys = {}
+        for index, item in enumerate(items):
+            try:
+                keys[index] = self.key(item if isinstance(item, dict) else {self.pk.name: item})
+            except DjangoValidationError as e:
+                results[index] = self.failure(index, {self.pk.name: e.messages})
+
+        with transaction.atomic():
+            found = set(self.fetch(keys.values(), lock=True))
+            if found:
+                old = summary.snapshot(self.model, list(found))
+                for batch in chunked(found, self.batch_size):
+                    cascade.delete(self.model, self.model.objects.filter(pk__in=batch))
+                summary.apply(self.model, old, [])
+                bump(self.user.id, self.model)
+        for index, key in keys.items():
+            if key in found:
+                results[index] = {"index": index, "status": "deleted", "pk": key}
+            else:
+                results[index] = self.failure(index, {self.pk.name: ["Not found."]}, key)
+        return [results[index] for index in range(len(items))]
+
+    def validate(self, items, results, partial=False):
+        rows = [item if isinstance(item, dict) else {} for item in items]
+        clean, errors = self.validator.validate(rows, partial=partial, user=self.user)
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                results[index] = self.failure(index, {"non_field_errors": ["Expected an object."]})
+        for index, detail in errors:
+            if isinstance(items[index], dict):
+                results[index] = self.failure(index, detail)
+        return clean
+
+    def key(self, item):
+        if item.get(self.pk.name) in (None, ''):
+            raise DjangoValidationError(REQUIRED)
+        return self.pk.to_python(item[self.pk.name])
+
+    def fetch(self, keys, lock=False):
+        # The user's rows among `keys`, by primary key.
+        queryset = self.model.objects.filter(user=self.user)
+        if lock:
+            queryset = queryset.select_for_update()
+        instances = {}
+        for batch in chunked(set(keys), self.batch_size):
+            instances.update((obj.pk, obj) for obj in queryset.filter(pk__in=batch))
+        return instances
+
+    def check_unique(self, rows, results):
+        # rows are (index, pk or None, data); drops rows that would collide with
+        # an existing row or an earlier row of the same batch.
+        for field in self.unique_fields:
+            values = {data[field.attname] for _, _, data in rows if data.get(field.attname) is not None}
+            if not values:
+                continue
+            owners = {}
+            for batch in chunked(values, self.batch_size):
+                owners.update(self.model._base_manager.filter(**{f'{field.attname}__in': batch}).values_list(field.attname, 'pk'))
+            keep = []
+            for index, key, data in rows:
+                value = data.get(field.attname)
+                owner = key if key is not None else ('new', index)
+                if value is not None and owners.setdefault(value, owner) != owner:
+                    results[index] = self.failure(index, {
+                        field.name: [f"{self.model._meta.verbose_name} with this {field.verbose_name} already exists."]
+                    }, key)
+                    continue
+                keep.append((index, key, data))
+            rows = keep
+        return rows
+
+    def failure(self, index, errors, key=None):
+        result = {"index": index, "status": "failed", "errors": errors}
+        if key is not None:
+            result["pk"] = key
+        return result
@@ -0,0 +1,40 @@
+from collections import defaultdict
+from django.db import router
+from django.db.models.deletion import Collector
+
+from . import summary
+from .versions import VERSIONED_MODELS, bump
+
+
+def delete(model, objs):
+    """Delete objs (instances or a queryset) of `model` and whatever cascades from them.
+
+    Deleting an invoice also removes its expenses and credit notes, and a
+    contact its sales orders and credit notes. Those rows leave the summary
+    totals and their entities' versions are bumped, as if they had been
+    deleted directly. The caller still records the write to `model` itself;
+    call it inside that transaction.
+    """
+    collector = Collector(using=router.db_for_write(model))
+    collector.collect(objs)
+    children = cascaded(model, collector)
+    old = {child: summary.snapshot(child, list(rows)) for child, rows in children.items()}
+    deleted = collector.delete()
+    for child, rows in children.items():
+        summary.apply(child, old[child], [])
+        for user_id in set(rows.values()):
+            bump(user_id, child)
+    return deleted
+
+
+def cascaded(model, collector):
+    # {versioned model: {pk: user_id}} of the rows the collector will delete
+    # besides those of `model`.
+    rows = defaultdict(dict)
+    for child, instances in collector.data.items():
+        if child in VERSIONED_MODELS and child is not model:
+            rows[child].update((obj.pk, obj.user_id) for obj in instances)
+    for queryset in collector.fast_deletes:
+        if queryset.model in VERSIONED_MODELS and queryset.model is not model:
+            rows[queryset.model].update(queryset.values_list('pk', 'user_id'))
+    return rows
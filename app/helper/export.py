@@ -0,0 +1,556 @@
+import csv
+import datetime
+import functools
+import io
+import itertools
+import json
+import re
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from xml.sax.saxutils import escape, quoteattr
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, FieldError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models
+from django.utils import timezone
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+ILLEGAL_XML = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+ILLEGAL_TITLE = re.compile(r'[\[\]:*?/\\]')
+
+# Style indexes into cellXfs in STYLES.
+DATE_STYLE = 1
+DATETIME_STYLE = 2
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}</Types>'
+)
+SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}<Relationship Id="rIdStyles" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def column_letter(index):
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def sheet_title(title, used):
+    title = ILLEGAL_TITLE.sub(' ', str(title)).strip()[:31] or 'Sheet'
+    candidate, suffix = title, 1
+    while candidate.lower() in used:
+        suffix += 1
+        candidate = f"{title[:31 - len(str(suffix)) - 1]} {suffix}"
+    used.add(candidate.lower())
+    return candidate
+
+
+def excel_serial(value):
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value)
+        delta = value - EXCEL_EPOCH
+        return delta.days + (delta.seconds + delta.microseconds / 1e6) / 86400
+    return (value - EXCEL_EPOCH.date()).days
+
+
+def cell_xml(ref, value):
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, datetime.datetime):
+        return f'<c r="{ref}" s="{DATETIME_STYLE}"><v>{excel_serial(value)}</v></c>'
+    if isinstance(value, datetime.date):
+        return f'<c r="{ref}" s="{DATE_STYLE}"><v>{excel_serial(value)}</v></c>'
+    text = ILLEGAL_XML.sub('', str(value))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def skip_empty(generator):
+    # An empty chunk would end a chunked HTTP response early on some servers.
+    @functools.wraps(generator)
+    def wrapper(*args, **kwargs):
+        return (chunk for chunk in generator(*args, **kwargs) if chunk)
+    return wrapper
+
+
+class StreamBuffer(io.RawIOBase):
+    # Unseekable sink for ZipFile; whatever it holds is handed out by drain().
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def sheet_xml(headers, rows):
+    letters = []
+    lines = [SHEET_HEAD]
+    for number, row in enumerate(rows_with_header(headers, rows), start=1):
+        row = list(row)
+        while len(letters) < len(row):
+            letters.append(column_letter(len(letters)))
+        cells = ''.join(cell_xml(f'{letters[i]}{number}', value) for i, value in enumerate(row))
+        lines.append(f'<row r="{number}">{cells}</row>')
+        if number % 1000 == 0:
+            yield ''.join(lines).encode()
+            lines.clear()
+    lines.append(SHEET_TAIL)
+    yield ''.join(lines).encode()
+
+
+def stream_xlsx(sheets):
+    """Yield an .xlsx file in pieces from (title, headers, rows) sheets.
+
+    Rows are written straight into a deflated worksheet part, so memory stays
+    flat however many rows the iterables produce.
+    """
+    return stream_xlsx_parts((title, sheet_xml(headers, rows)) for title, headers, rows in sheets)
+
+
+@skip_empty
+def stream_xlsx_parts(parts):
+    # parts are (title, worksheet XML chunks), as produced by sheet_xml().
+    buffer = StreamBuffer()
+    titles = []
+    used = set()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for index, (title, chunks) in enumerate(parts, start=1):
+            titles.append(sheet_title(title, used))
+            with archive.open(f'xl/worksheets/sheet{index}.xml', 'w', force_zip64=True) as part:
+                for chunk in chunks:
+                    part.write(chunk)
+                    yield buffer.drain()
+            yield buffer.drain()
+
+        archive.writestr('[Content_Types].xml', CONTENT_TYPES.format(sheets=''.join(
+            SHEET_CONTENT_TYPE.format(index=index) for index in range(1, len(titles) + 1))))
+        archive.writestr('_rels/.rels', ROOT_RELS)
+        archive.writestr('xl/workbook.xml', WORKBOOK.format(sheets=''.join(
+            f'<sheet name={quoteattr(title)} sheetId="{index}" r:id="rId{index}"/>'
+            for index, title in enumerate(titles, start=1))))
+        archive.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS.format(sheets=''.join(
+            f'<Relationship Id="rId{index}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{index}.xml"/>' for index in range(1, len(titles) + 1))))
+        archive.writestr('xl/styles.xml', STYLES)
+    yield buffer.drain()
+
+
+@skip_empty
+def stream_zip(files):
+    # files are (name, chunks); each becomes one deflated entry.
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in files:
+            with archive.open(name, 'w', force_zip64=True) as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    yield buffer.drain()
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+class Spool:
+    """A temporary file one thread writes while another reads behind it."""
+
+    class Cancelled(Exception):
+        pass
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.condition = threading.Condition()
+        self.size = 0
+        self.done = False
+        self.cancelled = False
+        self.error = None
+
+    def fill(self, produce):
+        try:
+            for chunk in produce():
+                self.write(chunk)
+        except Exception as e:
+            self.finish(e)
+        else:
+            self.finish()
+        finally:
+            connection.close()  # runs in a worker thread with its own connection
+
+    def write(self, data):
+        with self.condition:
+            if self.cancelled:
+                raise self.Cancelled()
+            self.file.seek(0, io.SEEK_END)
+            self.file.write(data)
+            self.size += len(data)
+            self.condition.notify_all()
+
+    def finish(self, error=None):
+        with self.condition:
+            self.done = True
+            self.error = error
+            self.condition.notify_all()
+
+    def cancel(self):
+        with self.condition:
+            self.cancelled = True
+            self.file.close()
+            self.condition.notify_all()
+
+    def chunks(self):
+        position = 0
+        while True:
+            with self.condition:
+                while position == self.size and not self.done:
+                    self.condition.wait()
+                if self.error is not None:
+                    raise self.error
+                if position == self.size:
+                    return
+                self.file.seek(position)
+                data = self.file.read(self.size - position)
+            position += len(data)
+            yield data
+
+
+def in_parallel(producers):
+    """Start every producer (a callable returning byte chunks) in its own thread
+    and yield their outputs in order.
+
+    The output being read streams live; the ones behind it spool to temporary
+    files, so the total time is bounded by the slowest producer.
+    """
+    spools = [Spool() for _ in producers]
+    executor = ThreadPoolExecutor(max_workers=len(producers))
+    for produce, spool in zip(producers, spools):
+        executor.submit(spool.fill, produce)
+    try:
+        for spool in spools:
+            yield spool.chunks()
+    finally:
+        for spool in spools:
+            spool.cancel()
+        executor.shutdown(wait=False)
+
+
+def csv_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    return value
+
+
+@skip_empty
+def stream_csv(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    for number, row in enumerate(rows, start=1):
+        writer.writerow([csv_value(value) for value in row])
+        if number % 1000 == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def stream_ndjson(headers, rows):
+    encoder = DjangoJSONEncoder()
+    lines = []
+    for number, row in enumerate(rows, start=1):
+        lines.append(encoder.encode(dict(zip(headers, row))))
+        if number % 1000 == 0:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines.clear()
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def parquet_field_type(field):
+    if isinstance(field, models.BooleanField):
+        return pyarrow.bool_()
+    if isinstance(field, models.IntegerField):
+        return pyarrow.int64()
+    if isinstance(field, models.FloatField):
+        return pyarrow.float64()
+    if isinstance(field, models.DecimalField):
+        return pyarrow.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return pyarrow.timestamp('us', tz='UTC')
+    if isinstance(field, models.DateField):
+        return pyarrow.date32()
+    return pyarrow.string()
+
+
+def parquet_type(value):
+    if isinstance(value, bool):
+        return pyarrow.bool_()
+    if isinstance(value, int):
+        return pyarrow.int64()
+    if isinstance(value, float):
+        return pyarrow.float64()
+    if isinstance(value, Decimal):
+        # Model decimals carry at most 4 places; a fixed scale keeps every row group on one schema.
+        return pyarrow.decimal128(38, 4)
+    if isinstance(value, datetime.datetime):
+        return pyarrow.timestamp('us', tz='UTC')
+    if isinstance(value, datetime.date):
+        return pyarrow.date32()
+    return pyarrow.string()
+
+
+def parquet_column(values, type):
+    if pyarrow.types.is_string(type):
+        values = [value if value is None or isinstance(value, str) else str(csv_value(value)) for value in values]
+    return pyarrow.array(values, type=type)
+
+
+@skip_empty
+def stream_parquet(headers, rows, fields=None, row_group_size=None):
+    """Yield a Parquet file written one row group at a time.
+
+    Column types come from the model field behind each column, so a column
+    that happens to be all null still gets its real type. Columns without a
+    field take the type of their first non-null value in the first row group,
+    and are written as strings when that has none.
+    """
+    if pyarrow is None:
+        raise ImportError("Parquet export needs pyarrow installed")
+    row_group_size = row_group_size or getattr(settings, 'EXPORT_PARQUET_ROW_GROUP_SIZE', 50000)
+    buffer = StreamBuffer()
+    rows = iter(rows)
+    writer = None
+    while True:
+        batch = list(itertools.islice(rows, row_group_size))
+        columns = [list(column) for column in zip(*batch)] if batch else [[] for _ in headers]
+        if writer is None:
+            types = [
+                parquet_field_type(field) if field is not None
+                else next((parquet_type(value) for value in column if value is not None), pyarrow.string())
+                for field, column in zip(fields or [None] * len(headers), columns)
+            ]
+            schema = pyarrow.schema([pyarrow.field(str(header), type) for header, type in zip(headers, types)])
+            writer = pyarrow.parquet.ParquetWriter(buffer, schema)
+        if batch:
+            writer.write_table(pyarrow.Table.from_arrays(
+                [parquet_column(column, type) for column, type in zip(columns, schema.types)], schema=schema))
+            yield buffer.drain()
+        if len(batch) < row_group_size:
+            break
+    writer.close()
+    yield buffer.drain()
+
+
+def stream_export(export_format, title, headers, rows, fields=None):
+    if export_format == 'csv':
+        return stream_csv(headers, rows)
+    if export_format == 'ndjson':
+        return stream_ndjson(headers, rows)
+    if export_format == 'parquet':
+        return stream_parquet(headers, rows, fields)
+    return stream_xlsx([(title, headers, rows)])
+
+
+def stream_ledger(export_format, entities):
+    """One workbook with a sheet per (schema, queryset), or a zip of CSV files.
+
+    Each entity is queried and rendered in its own thread; the output is
+    still written in the given order.
+    """
+    if export_format == 'zip':
+        producers = [functools.partial(stream_csv, schema.headers, schema.rows(queryset)) for schema, queryset in entities]
+        names = [f"{schema.title}.csv" for schema, _ in entities]
+        return stream_zip(zip(names, in_parallel(producers)))
+    producers = [functools.partial(sheet_xml, schema.headers, schema.rows(queryset)) for schema, queryset in entities]
+    titles = [schema.title for schema, _ in entities]
+    return stream_xlsx_parts(zip(titles, in_parallel(producers)))
+
+
+def rows_with_header(headers, rows):
+    yield headers
+    yield from rows
+
+
+def iterate_queryset(queryset, chunk_size=None, key=None):
+    # Keyset batches on the primary key: MySQL client cursors buffer the whole
+    # result set, so .iterator() alone does not keep memory flat there.
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    key = key or (lambda obj: obj.pk)
+    queryset = queryset.order_by('pk')
+    last = None
+    while True:
+        batch = queryset if last is None else queryset.filter(pk__gt=last)
+        batch = list(batch[:chunk_size])
+        if not batch:
+            return
+        yield from batch
+        if len(batch) < chunk_size:
+            return
+        last = key(batch[-1])
+
+
+def path_error(model, path):
+    parts = path.split('__')
+    for position, part in enumerate(parts):
+        try:
+            field = model._meta.pk if part == 'pk' else model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return f"{model.__name__} has no field '{part}'"
+        if field.many_to_many or field.one_to_many:
+            return f"'{part}' is a to-many relation and would repeat rows"
+        if isinstance(field, models.JSONField):
+            return None  # the rest of the path are JSON keys
+        if field.is_relation and position < len(parts) - 1:
+            model = field.related_model
+        elif position < len(parts) - 1:
+            return f"'{part}' on {model.__name__} is not a relation"
+    return None
+
+
+def path_field(model, path):
+    # The field an ORM path or expression reads, or None past a JSONField.
+    if not isinstance(path, str):
+        return model._default_manager.annotate(export_field=path).query.annotations['export_field'].output_field
+    for part in path.split('__'):
+        field = model._meta.pk if part == 'pk' else model._meta.get_field(part)
+        if isinstance(field, models.JSONField):
+            return None
+        if field.is_relation:
+            model = field.related_model
+    return field.target_field if field.is_relation else field
+
+
+class ExportColumn:
+    def __init__(self, header, path, formatter=None, output_field=None):
+        # path is an ORM path ("contact__contact_name") or a query expression;
+        # output_field is the type of the formatter's values, if it has one.
+        self.header = header
+        self.path = path
+        self.formatter = formatter
+        self.output_field = output_field
+
+    def field(self, model):
+        if self.formatter is not None:
+            return self.output_field
+        return path_field(model, self.path)
+
+
+class ExportSchema:
+    """The columns of a viewset's export.
+
+    Rows are read with values_list() over just these columns, so no model
+    instances are built and unused columns (JSON blobs included) stay in the
+    database.
+    """
+
+    def __init__(self, title, columns):
+        self.title = title
+        self.columns = columns
+
+    @property
+    def headers(self):
+        return [column.header for column in self.columns]
+
+    def project(self, queryset):
+        annotations, names = {}, []
+        for index, column in enumerate(self.columns):
+            if isinstance(column.path, str):
+                names.append(column.path)
+            else:
+                annotations[f'export_{index}'] = column.path
+                names.append(f'export_{index}')
+        return queryset.annotate(**annotations).values_list('pk', *names)
+
+    def fields(self, model):
+        return [column.field(model) for column in self.columns]
+
+    def rows(self, queryset, chunk_size=None):
+        formatters = [(index, column.formatter) for index, column in enumerate(self.columns) if column.formatter]
+        for row in iterate_queryset(self.project(queryset), chunk_size, key=lambda row: row[0]):
+            row = list(row[1:])
+            for index, formatter in formatters:
+                row[index] = formatter(row[index])
+            yield row
+
+    def check(self, model):
+        errors = [
+            f"Export column '{column.header}': {error}"
+            for column in self.columns if isinstance(column.path, str)
+            for error in [path_error(model, column.path)] if error
+        ]
+        if not errors:
+            try:
+                self.project(model._default_manager.all())
+            except FieldError as e:
+                errors.append(f"Export schema '{self.title}': {e}")
+        return errors
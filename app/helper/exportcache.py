@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse
+
+from . import versions
+
+IGNORED_PARAMS = {'format', 'async'}
+
+
+class ExportCache:
+    """Finished export files on local disk, evicted least recently used first.
+
+    An entry is keyed by user, entity, format, the filter parameters and the
+    user's data version of the exported models (see helper.versions), which
+    every import, edit and delete of those models advances, so any write
+    produces a new key.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root or getattr(settings, 'EXPORT_CACHE_DIR', settings.BASE_DIR / 'export_cache'))
+        self.max_bytes = max_bytes or getattr(settings, 'EXPORT_CACHE_MAX_BYTES', 1024 ** 3)
+        self.lock = threading.Lock()
+        self.building = set()
+
+    def version(self, user_id, models):
+        return versions.current(user_id, models)
+
+    def key(self, user_id, entity, export_format, params, version):
+        filters = sorted((name, value) for name, values in params.lists() if name not in IGNORED_PARAMS for value in values)
+        content = json.dumps([user_id, entity, export_format, filters, version])
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def path(self, key):
+        return self.root / key[:2] / key
+
+    def meta(self, key):
+        try:
+            with open(f"{self.path(key)}.json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key):
+        path = self.path(key)
+        if not path.exists():
+            return None
+        os.utime(path)  # mtime doubles as the LRU clock
+        return self.meta(key)
+
+    def response(self, key, meta):
+        response = FileResponse(open(self.path(key), 'rb'), content_type=meta['content_type'])
+        response['Content-Disposition'] = f'attachment; filename="{meta["filename"]}"'
+        return response
+
+    def tee(self, key, meta, chunks):
+        """Pass chunks through while writing them to the cache.
+
+        The file is only published once the stream finished, so a client that
+        disconnects half-way never leaves a truncated artifact behind.
+        """
+        path = self.path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(f"{path.name}.{threading.get_ident()}.part")
+        try:
+            with open(partial, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            with open(f"{path}.json", 'w') as f:
+                json.dump(meta, f)
+            os.replace(partial, path)
+        finally:
+            if partial.exists():
+                partial.unlink()
+        self.evict()
+
+    def build_async(self, key, meta, make_chunks):
+        # Returns False when the artifact is already being built.
+        with self.lock:
+            if key in self.building:
+                return False
+            self.building.add(key)
+
+        def run():
+            try:
+                for _ in self.tee(key, meta, make_chunks()):
+                    pass
+            except Exception as e:
+                logging.error(f"Building export {key} failed: {str(e)}")
+            finally:
+                with self.lock:
+                    self.building.discard(key)
+                connection.close()
+
+        threading.Thread(target=run, daemon=True).start()
+        return True
+
+    def is_building(self, key):
+        with self.lock:
+            return key in self.building
+
+    def evict(self):
+        with self.lock:
+            files = []
+            for path in self.root.glob('*/*'):
+                if path.suffix in ('.json', '.part'):
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                for stale in (path, Path(f"{path}.json")):
+                    try:
+                        stale.unlink()
+                    except OSError:
+                        pass
+                total -= size
+
+
+export_cache = ExportCache()
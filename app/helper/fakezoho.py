@@ -0,0 +1,170 @@
+import ast
+import csv
+import http.server
+import itertools
+import json
+import logging
+import threading
+import time
+import urllib.parse
+from datetime import datetime, timedelta, timezone
+from django.conf import settings
+
+IST = timezone(timedelta(hours=5, minutes=30))
+BASE_TIME = datetime(2024, 1, 1, tzinfo=IST)
+
+# module -> (CSV export used as the record shape, renamed columns, fields made unique per record).
+# '{}' fields get the same id across modules, so customer_id points at a generated contact.
+MODULE_SHAPES = {
+    'contacts': ('contacts.csv', {'id': 'contact_id'}, {'contact_id': '{}', 'contact_name': 'Contact {}'}),
+    'salesorders': ('sales_orders.csv', {'id': 'salesorder_id'}, {'salesorder_id': '{}', 'salesorder_number': 'SO-{:08d}', 'customer_id': '{}'}),
+    'invoices': ('invoices.csv', {}, {'invoice_id': '{}', 'invoice_number': 'INV-{:08d}', 'customer_id': '{}'}),
+    'expenses': ('expenses.csv', {}, {'expense_id': '{}'}),
+    'creditnotes': (None, {}, {'creditnote_id': '{}', 'creditnote_number': 'CN-{:08d}', 'customer_id': '{}'}),
+}
+
+# No credit note export ships with the repo; this mirrors the Zoho list shape.
+CREDITNOTE_TEMPLATE = {
+    'creditnote_id': '', 'creditnote_number': '', 'status': 'open', 'date': '2024-06-14',
+    'customer_id': '1877419000000026297', 'customer_name': 'Demooo', 'reference_number': '1',
+    'currency_id': '1877419000000000064', 'currency_code': 'INR', 'exchange_rate': 1.0,
+    'is_viewed_by_client': False, 'total': 100.0, 'balance': 100.0,
+    'created_time': '2024-06-14T18:31:33+0530', 'last_modified_time': '2024-06-14T18:31:33+0530',
+}
+
+
+def json_value(value):
+    # CSV cells hold Python reprs of the API's JSON values ("False", "0.0", "[]").
+    if value in ('True', 'False') or value[:1] in ('[', '{'):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return value
+    if '.' in value:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return value
+
+
+def load_template(name):
+    filename, renames, _ = MODULE_SHAPES[name]
+    if filename is None:
+        return dict(CREDITNOTE_TEMPLATE)
+    with open(settings.BASE_DIR / filename, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        row = next(reader)
+    return {renames.get(column, column): json_value(value) for column, value in zip(header, row)}
+
+
+class FakeZohoServer(http.server.ThreadingHTTPServer):
+    """Serves /oauth/v2/token and paginated /books/v3/<module> listings generated on the fly."""
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), records=1000, latency=0.0, rate_limit_every=0, retry_after=1):
+        super().__init__(address, FakeZohoHandler)
+        self.records = records
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.templates = {name: load_template(name) for name in MODULE_SHAPES}
+        self.counter = itertools.count(1)
+        self.requests = 0
+        self.throttled = 0
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def record(self, name, index):
+        record = dict(self.templates[name])
+        for field, pattern in MODULE_SHAPES[name][2].items():
+            record[field] = pattern.format(10 ** 15 + index if pattern == '{}' else index)
+        modified = (BASE_TIME + timedelta(seconds=index)).strftime('%Y-%m-%dT%H:%M:%S%z')
+        record['last_modified_time'] = modified
+        if 'created_time' in record:
+            record['created_time'] = modified
+        return record
+
+    def page(self, name, page, per_page, modified_since=None):
+        start = 0
+        if modified_since:
+            # Records are generated one second apart, so the filter maps to an offset.
+            start = max(0, int((modified_since - BASE_TIME).total_seconds()))
+        first = start + (page - 1) * per_page
+        last = min(self.records, first + per_page)
+        records = [self.record(name, index) for index in range(first, last)]
+        return {
+            "code": 0,
+            "message": "success",
+            name: records,
+            "page_context": {"page": page, "per_page": per_page, "has_more_page": last < self.records},
+        }
+
+
+class FakeZohoHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logging.debug("fake zoho: " + format, *args)
+
+    def send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def throttle(self):
+        server = self.server
+        server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if server.rate_limit_every and next(server.counter) % server.rate_limit_every == 0:
+            server.throttled += 1
+            self.send_json(429, {"code": 45, "message": "Too many requests"}, {"Retry-After": str(server.retry_after)})
+            return True
+        return False
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if urllib.parse.urlparse(self.path).path != '/oauth/v2/token':
+            return self.send_json(404, {"error": "not_found"})
+        if self.throttle():
+            return
+        self.send_json(200, {
+            "access_token": "fake-access-token",
+            "refresh_token": "fake-refresh-token",
+            "expires_in": 3600,
+            "token_type": "Bearer",
+        })
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        name = url.path.rstrip('/').rsplit('/', 1)[-1]
+        if not url.path.startswith('/books/v3/') or name not in MODULE_SHAPES:
+            return self.send_json(404, {"code": 5, "message": "Invalid URL Passed"})
+        if self.throttle():
+            return
+        query = urllib.parse.parse_qs(url.query)
+        page = int(query.get('page', ['1'])[0])
+        per_page = int(query.get('per_page', ['200'])[0])
+        modified_since = query.get('last_modified_time', [None])[0]
+        if modified_since:
+            modified_since = datetime.strptime(modified_since, '%Y-%m-%dT%H:%M:%S%z')
+        self.send_json(200, self.server.page(name, page, per_page, modified_since))
@@ -1,108 +1,103 @@
-import http.server
 import logging
 import requests
-import urllib.parse
-from django.contrib.auth import get_user_model
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.db import connection
 
-from app.models import Contact, SalesOrder, Invoice, CreditNote
-from ..serializer import ContactSerializer, ExpensesOrderSerializer, SalesOrderSerializer, InvoiceSerializer, CreditNoteSerializer
+from app.models import ImportJob, SyncState
+from .tokens import token_store
+from .writer import BulkWriter
+from .zoho import ZohoClient
 
-User = get_user_model()
+IMPORT_MODULE_NAMES = ['contacts', 'salesorders', 'invoices', 'creditnotes', 'expenses']
 
-class MyHandler(http.server.BaseHTTPRequestHandler):
-    client_id = ""
-    client_secret = ""
-    redirect_uri = ""
-    organization_id = ""
-    token_url = ""
-    apis_to_handle = []
-    user = None
-    successful_operations = True
 
-    def do_GET(self):
-        logging.info("Received GET request at: %s", self.path)
-        query_components = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
-        code = query_components.get("code", [None])[0]
+def apis_to_handle():
+    return [{"url": f"{settings.ZOHO_API_URL}/{name}", "name": name} for name in IMPORT_MODULE_NAMES]
 
-        if code:
-            token_info = self.fetch_token(code)
-            if not token_info:
-                self.send_error(500, "Failed to fetch token")
-                self.server.shutdown()
-                return
 
-            headers = {"Authorization": f"Zoho-oauthtoken {token_info.get('access_token')}"}
-            for api in self.apis_to_handle:
+class JobProgress:
+    # Per-module counters shared by the module threads and flushed to the job row.
+    max_errors = BulkWriter.max_errors
+
+    def __init__(self, job):
+        self.job = job
+        self.lock = threading.Lock()
+        self.modules = {
+            name: {"status": "pending", "pages": 0, "rows_written": 0, "rows_failed": 0, "errors": []}
+            for name in IMPORT_MODULE_NAMES
+        }
+
+    def update(self, name, **values):
+        with self.lock:
+            module = self.modules[name]
+            module["pages"] += values.pop("pages", 0)
+            error = values.pop("error", None)
+            module.update(values)
+            if error:
+                module["errors"] = module["errors"][:self.max_errors - 1] + [error]
+            ImportJob.objects.filter(pk=self.job.pk).update(progress=self.modules)
+
+
+class MyHandler:
+    def __init__(self, job):
+        self.job = job
+        self.user = job.user
+        self.progress = JobProgress(job)
+        self.successful_operations = True
+
+    def run(self):
+        if self.job.authorization_code:
+            token_store.exchange_code(self.user, self.job.authorization_code)
+            ImportJob.objects.filter(pk=self.job.pk).update(authorization_code=None)
+        apis = apis_to_handle()
+        client = ZohoClient(lambda: token_store.get_access_token(self.user), self.job.organization_id)
+        with ThreadPoolExecutor(max_workers=len(apis)) as executor:
+            futures = {
+                executor.submit(self.fetch_and_save_data, client, api['url'], api['name']): api
+                for api in apis
+            }
+            for future in as_completed(futures):
+                name = futures[future]['name']
                 try:
-                    self.fetch_and_save_data(api['url'], headers, api['name'])
+                    future.result()
                 except Exception as e:
-                    logging.error(f"Error handling {api['name']} API: {str(e)}")
+                    logging.error(f"Error handling {name} API: {str(e)}")
+                    self.progress.update(name, status="failed", error=str(e))
                     self.successful_operations = False
-                    break
-            
-            if self.successful_operations:
-                self.send_response(200)
-                self.end_headers()
-                self.wfile.write(b"Authorization and data import completed successfully.")
-                self.server.shutdown()
-            else:
-                self.send_error(500, "Some operations failed. Check logs for details.")
-                self.server.shutdown()
-        else:
-            self.send_response(400)
-            self.end_headers()
-            self.wfile.write(b"Error: No code provided or invalid request.")
-    
-    def fetch_token(self, code):
-        data = {
-            "client_id": self.client_id,
-            "client_secret": self.client_secret,
-            "code": code,
-            "redirect_uri": self.redirect_uri,
-            "grant_type": "authorization_code",
-            "prompt": "consent",
-            "access_type": "offline"
-        }
-        try:
-            response = requests.post(self.token_url, data=data)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Error during token retrieval: {str(e)}")
-            raise  # Raise the exception to signal failure
-    
-    def fetch_and_save_data(self, api_url, headers, name):
+        client.close()
+        return self.successful_operations
+
+    def iter_records(self, client, api_url, name, params):
+        for records in client.iter_pages(api_url, name, params):
+            self.progress.update(name, pages=1)
+            yield from records
+
+    def fetch_and_save_data(self, client, api_url, name):
         try:
-            response = requests.get(api_url, headers=headers, params={"organization_id": self.organization_id})
-            response.raise_for_status()
-            data = response.json().get(name, [])
-            print(data)
-            for item in data:
-                item['user'] = self.user.id
-                serializer = self.get_serializer(name, data=item)
-                
-                if serializer.is_valid():
-                    serializer.save()
-                else:
-                    logging.error(f"Validation error for {name}: {serializer.errors}")
-                    self.successful_operations = False
+            self.progress.update(name, status="running")
+            state, _ = SyncState.objects.get_or_create(user=self.user, module=name)
+            params = {}
+            if state.last_modified_time and not self.job.full_resync:
+                params["last_modified_time"] = state.last_modified_time.strftime("%Y-%m-%dT%H:%M:%S%z")
+                logging.info(f"Syncing {name} changed since {params['last_modified_time']}")
+
+            writer = BulkWriter(name, self.user, progress=lambda w: self.progress.update(
+                name, rows_written=w.written, rows_failed=w.failed, errors=w.errors))
+            writer.write(self.iter_records(client, api_url, name, params))
+            if writer.failed:
+                self.successful_operations = False
+            # Failed rows stay after the watermark, so the next sync retries them.
+            watermark = writer.watermark()
+            if watermark and (state.last_modified_time is None or watermark > state.last_modified_time):
+                state.last_modified_time = watermark
+                state.save()
+            self.progress.update(name, status="failed" if writer.failed else "completed")
 
         except requests.exceptions.RequestException as e:
             logging.error(f"Error fetching {name} data: {str(e)}")
             self.successful_operations = False
             raise  # Raise the exception to signal failure
-
-    def get_serializer(self, name, data):
-        if name == 'contacts':
-            return ContactSerializer(data=data)
-        elif name == 'salesorders':
-            return SalesOrderSerializer(data=data)
-        elif name == 'invoices':
-            return InvoiceSerializer(data=data)
-        elif name == 'creditnotes':
-            return CreditNoteSerializer(data=data)
-        elif name == 'expenses':
-            return ExpensesOrderSerializer(data=data)
-        else:
-            logging.error(f"No serializer found for {name}")
-            return None
+        finally:
+            connection.close()  # runs in a worker thread with its own connection
@@ -0,0 +1,263 @@
+import ast
+import csv
+import json
+import logging
+import os
+import tempfile
+import time
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.db import DatabaseError, connections, models, transaction
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import summary
+from .validation import CompiledValidator
+from .versions import bump
+from .writer import BulkWriter, chunked
+
+# CSV export column -> model field, where the Zoho export and the model disagree.
+# None drops the column.
+COLUMN_ALIASES = {
+    'contacts': {'id': 'contact_id'},
+    'salesorders': {'id': None, 'customer_id': 'contact'},
+    'invoices': {},
+    'creditnotes': {},
+    'expenses': {},
+}
+
+FILE_ENTITIES = {
+    'contacts': 'contacts',
+    'sales_orders': 'salesorders',
+    'salesorders': 'salesorders',
+    'invoices': 'invoices',
+    'creditnotes': 'creditnotes',
+    'credit_notes': 'creditnotes',
+    'expenses': 'expenses',
+}
+
+
+def entity_for_path(path):
+    stem = os.path.splitext(os.path.basename(path))[0].lower()
+    if stem not in FILE_ENTITIES:
+        raise ValueError(f"Cannot tell which module {path} holds; pass --entity")
+    return FILE_ENTITIES[stem]
+
+
+def parse_bool(value):
+    return value.strip().lower() in ('true', '1', 'yes')
+
+
+def parse_decimal(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"invalid decimal {value!r}")
+
+
+def parse_json(value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        # Zoho exports nested objects as Python reprs, e.g. "{'city': ''}".
+        return ast.literal_eval(value)
+
+
+def strict(parser, kind):
+    def parse(value):
+        result = parser(value)
+        if result is None:
+            raise ValueError(f"invalid {kind} {value!r}")
+        return result
+    return parse
+
+
+def column_parser(field):
+    if isinstance(field, models.BooleanField):
+        parse = parse_bool
+    elif isinstance(field, models.DecimalField):
+        parse = parse_decimal
+    elif isinstance(field, models.IntegerField):
+        parse = lambda value: int(float(value))
+    elif isinstance(field, models.DateTimeField):
+        parse = strict(parse_datetime, 'datetime')
+    elif isinstance(field, models.DateField):
+        parse = strict(parse_date, 'date')
+    elif isinstance(field, models.JSONField):
+        parse = parse_json
+    else:
+        parse = str
+
+    if field.null:
+        empty = None
+    elif field.has_default():
+        empty = field.get_default()
+    elif isinstance(field, (models.CharField, models.TextField)):
+        empty = ''
+    else:
+        empty = None
+
+    def convert(value):
+        return parse(value) if value != '' else empty
+    return convert
+
+
+class CsvLoader:
+    def __init__(self, name, user, chunk_size=None, native=True):
+        self.name = name
+        self.user = user
+        self.writer = BulkWriter(name, user, chunk_size=chunk_size)
+        self.model = self.writer.model
+        self.chunk_size = self.writer.chunk_size
+        # Empty cells of text columns load as '', as they always have.
+        self.validator = CompiledValidator.for_model(self.model, allow_blank=True)
+        # LOAD DATA LOCAL INFILE runs on its own alias, the only connection
+        # opened with local_infile.
+        self.alias = getattr(settings, 'CSV_LOAD_DATABASE', 'bulk_load')
+        self.native = (
+            native and self.alias in settings.DATABASES and connections[self.alias].vendor == 'mysql'
+            and self.model._meta.pk.name == self.writer.key
+        )
+        self.loaded = 0
+        self.failed = 0
+        # Native loads bypass BulkWriter's summary deltas.
+        self.stale_summary = False
+
+    def load(self, path):
+        started = time.monotonic()
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            self.columns = self.plan_columns(next(reader))
+            for rows in chunked(reader, self.chunk_size):
+                self.load_rows(rows)
+        if self.stale_summary and summary.metrics_for(self.model):
+            summary.rebuild(self.user)
+        elapsed = time.monotonic() - started
+        rate = self.loaded / elapsed if elapsed else 0
+        logging.info(f"{self.name}: loaded {self.loaded} rows, {self.failed} failed in {elapsed:.2f}s ({rate:.0f} rows/s)")
+        return {"loaded": self.loaded, "failed": self.failed, "seconds": elapsed, "rows_per_second": rate}
+
+    def plan_columns(self, header):
+        # Resolve every CSV column once: (position, model field, converter).
+        aliases = COLUMN_ALIASES[self.name]
+        fields = {f.name: f for f in self.model._meta.concrete_fields}
+        columns = []
+        for index, column in enumerate(header):
+            target = aliases.get(column, column)
+            field = fields.get(target)
+            if field is None or field.name == 'user' or (field.primary_key and field.auto_created):
+                continue
+            convert = (lambda value: value or None) if field.is_relation else column_parser(field)
+            columns.append((index, field, convert))
+        return columns
+
+    def coerce(self, rows):
+        # Convert column by column so each converter runs over the whole chunk.
+        width = max(index for index, _, _ in self.columns) + 1
+        complete = [row for row in rows if len(row) >= width]
+        self.failed += len(rows) - len(complete)
+        rows = complete
+        values = {}
+        bad = set()
+        for index, field, convert in self.columns:
+            converted = []
+            for position, raw in enumerate(row[index] for row in rows):
+                try:
+                    converted.append(convert(raw))
+                except (ValueError, SyntaxError) as e:
+                    logging.error(f"{self.name}: row {self.loaded + self.failed + position + 1} {field.name}: {e}")
+                    bad.add(position)
+                    converted.append(None)
+            values[field.name] = converted
+
+        related = [(field.name, field.related_model) for _, field, _ in self.columns if field.is_relation]
+        for name, related_model in related:
+            # Only keep references to this user's rows that are already loaded.
+            known = related_model.objects.filter(pk__in=set(values[name]) - {None})
+            if any(field.name == 'user' for field in related_model._meta.concrete_fields):
+                known = known.filter(user=self.user)
+            known = set(known.values_list('pk', flat=True))
+            values[name] = [value if value in known else None for value in values[name]]
+
+        names = list(values)
+        rows = [dict(zip(names, row_values)) for position, row_values in enumerate(zip(*values.values())) if position not in bad]
+        self.failed += len(bad)
+        # Lengths, digits and choices, which the converters do not check.
+        clean, errors = self.validator.validate(rows, partial=True, user=self.user)
+        for index, detail in errors:
+            logging.error(f"Validation error for {self.name}: {rows[index].get(self.writer.key)}: {detail}")
+        self.failed += len(errors)
+        return [self.model(user=self.user, **data) for _, data in clean]
+
+    def load_rows(self, rows):
+        # A key repeated in the chunk is written once, with its last row, as
+        # BulkWriter.write_chunk does.
+        objs = list({getattr(obj, self.writer.key) or id(obj): obj for obj in self.coerce(rows)}.values())
+        if self.native:
+            try:
+                rejected = self.load_data_infile(objs)
+                self.loaded += len(objs) - rejected
+                self.failed += rejected
+                self.stale_summary = True
+                return
+            except DatabaseError as e:
+                logging.warning(f"LOAD DATA failed ({e}), falling back to batched inserts")
+                self.native = False
+        written, failed = self.writer.written, self.writer.failed
+        self.writer.save_objects(objs)
+        self.loaded += self.writer.written - written
+        self.failed += self.writer.failed - failed
+
+    def load_data_infile(self, objs):
+        # Load into a temporary copy of the table, drop the rows whose key belongs
+        # to another user, and upsert the rest; returns the number dropped.
+        fields = [f for f in self.model._meta.concrete_fields if not (f.primary_key and f.auto_created)]
+        with tempfile.NamedTemporaryFile('w', suffix='.tsv', encoding='utf-8', delete=False) as f:
+            for obj in objs:
+                f.write('\t'.join(self.tsv_value(field, obj) for field in fields))
+                f.write('\n')
+        try:
+            connection = connections[self.alias]
+            quote = connection.ops.quote_name
+            meta = self.model._meta
+            table = quote(meta.db_table)
+            staging = quote(f"{meta.db_table}_load")
+            pk = quote(meta.pk.column)
+            owner = quote(meta.get_field('user').column)
+            columns = ', '.join(quote(field.column) for field in fields)
+            updates = ', '.join(
+                f"{quote(field.column)} = VALUES({quote(field.column)})"
+                for field in fields if not field.primary_key and not getattr(field, 'auto_now_add', False)
+            )
+            with transaction.atomic(using=self.alias), connection.cursor() as cursor:
+                cursor.execute(f"CREATE TEMPORARY TABLE {staging} LIKE {table}")
+                try:
+                    cursor.execute(
+                        f"LOAD DATA LOCAL INFILE %s INTO TABLE {staging} CHARACTER SET utf8mb4 "
+                        f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({columns})",
+                        [f.name],
+                    )
+                    cursor.execute(
+                        f"DELETE s FROM {staging} s JOIN {table} t ON t.{pk} = s.{pk} WHERE t.{owner} <> %s",
+                        [self.user.id],
+                    )
+                    rejected = cursor.rowcount
+                    cursor.execute(
+                        f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} ON DUPLICATE KEY UPDATE {updates}"
+                    )
+                finally:
+                    cursor.execute(f"DROP TEMPORARY TABLE {staging}")
+                bump(self.user.id, self.model, using=self.alias)
+        finally:
+            os.unlink(f.name)
+        if rejected:
+            logging.error(f"{self.name}: {rejected} rows skipped, their keys belong to another user")
+        return rejected
+
+    def tsv_value(self, field, obj):
+        value = field.pre_save(obj, add=True)
+        value = field.get_db_prep_save(value, connections[self.alias])
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import logging
+
+from app.models import Address, Contact, ContactPerson, LineItem, SalesOrderContactPerson, SalesOrderCustomField, SubStatus
+from .validation import CompiledValidator
+
+ADDRESS_FIELDS = ['attention', 'address', 'street2', 'city', 'state', 'zip', 'country', 'fax', 'phone']
+
+# module -> {payload key: (address type, owned)}. Owned addresses sit behind a
+# OneToOneField, so each record keeps its own row; the others are shared by content.
+ADDRESSES = {
+    'contacts': {'billing_address': (Address.BILLING, True), 'shipping_address': (Address.SHIPPING, True)},
+    'creditnotes': {'billing_address': (Address.BILLING, True), 'shipping_address': (Address.SHIPPING, True)},
+    'salesorders': {'billing_address': (Address.BILLING, False), 'shipping_address': (Address.SHIPPING, False)},
+}
+
+# module -> payload keys holding lists of child objects
+CHILDREN = {
+    'contacts': ['contact_persons'],
+    'creditnotes': ['contact_persons'],
+    'salesorders': ['line_items', 'sub_statuses', 'custom_fields', 'contact_persons'],
+    'invoices': ['line_items'],
+}
+
+# Nested payloads that have no table to go to yet.
+DROPPED = {
+    'contacts': ['default_templates'],
+}
+
+
+def build_address(data, address_type):
+    values = {}
+    for name in ADDRESS_FIELDS:
+        value = data.get(name)
+        if name == 'zip' and value is None:
+            value = data.get('zipcode')
+        field = Address._meta.get_field(name)
+        value = str(value or '').strip()[:field.max_length]
+        values[name] = value or (None if field.null else '')
+    if not any(values.values()):
+        return None
+    return Address(address_type=address_type, **values)
+
+
+def address_hash(address, scope):
+    content = [scope, address.address_type] + [getattr(address, name) or '' for name in ADDRESS_FIELDS]
+    return hashlib.sha256(json.dumps(content).encode()).hexdigest()
+
+
+class NestedWriter:
+    # Pulls nested Zoho objects out of a batch and writes them with a handful
+    # of set-based queries; FK ids are wired up in memory.
+    def __init__(self, name, user, model, key):
+        self.name = name
+        self.user = user
+        self.model = model
+        self.key = key
+        self.addresses = ADDRESSES.get(name, {})
+        self.children = CHILDREN.get(name, [])
+        self.nested_keys = list(self.addresses) + self.children + DROPPED.get(name, [])
+
+    def extract(self, items):
+        rows, nested = [], []
+        for item in items:
+            row = dict(item)
+            extra = {}
+            for key in self.nested_keys:
+                value = row.pop(key, None)
+                if value is not None:
+                    extra[key] = value
+            if self.name == 'salesorders' and row.get('customer_id'):
+                extra['customer_id'] = row['customer_id']
+            rows.append(row)
+            nested.append(extra)
+        return rows, nested
+
+    def attach(self, pairs):
+        if self.addresses:
+            self.attach_addresses(pairs)
+        if self.name == 'salesorders':
+            self.attach_contacts(pairs)
+
+    def attach_contacts(self, pairs):
+        ids = {extra['customer_id'] for _, extra in pairs if extra.get('customer_id')}
+        if not ids:
+            return
+        known = set(Contact.objects.filter(user=self.user, pk__in=ids).values_list('pk', flat=True))
+        for obj, extra in pairs:
+            if extra.get('customer_id') in known:
+                obj.contact_id = extra['customer_id']
+
+    def attach_addresses(self, pairs):
+        attnames = {key: self.model._meta.get_field(key).attname for key in self.addresses}
+        current = {}
+        if any(owned for _, owned in self.addresses.values()):
+            keys = [getattr(obj, self.key) for obj, _ in pairs]
+            current = {
+                row[self.key]: row
+                for row in self.model.objects.filter(user=self.user, **{f'{self.key}__in': keys}).values(self.key, *attnames.values())
+            }
+
+        wanted = []
+        for obj, extra in pairs:
+            owner = getattr(obj, self.key)
+            for key, (address_type, owned) in self.addresses.items():
+                data = extra.get(key)
+                address = build_address(data, address_type) if isinstance(data, dict) else None
+                if address is None:
+                    continue
+                # Shared addresses are shared within one user's records only.
+                scope = f"{self.user.id}:{self.name}:{owner}" if owned else str(self.user.id)
+                address.content_hash = address_hash(address, scope)
+                existing_id = current.get(owner, {}).get(attnames[key]) if owned else None
+                wanted.append((obj, attnames[key], address, existing_id))
+
+        # Owned addresses are updated in place, and only when their content changed.
+        existing_ids = [existing_id for *_, existing_id in wanted if existing_id]
+        stored = dict(Address.objects.filter(pk__in=existing_ids).values_list('pk', 'content_hash')) if existing_ids else {}
+        changed = []
+        pending = []
+        for obj, attname, address, existing_id in wanted:
+            if existing_id in stored:
+                if stored[existing_id] != address.content_hash:
+                    address.pk = existing_id
+                    changed.append(address)
+                setattr(obj, attname, existing_id)
+            else:
+                pending.append((obj, attname, address))
+        if changed:
+            Address.objects.bulk_update(changed, ADDRESS_FIELDS + ['address_type', 'content_hash'])
+
+        by_hash = {address.content_hash: address for _, _, address in pending}
+        if not by_hash:
+            return
+        ids = dict(Address.objects.filter(content_hash__in=by_hash).values_list('content_hash', 'pk'))
+        missing = [address for content_hash, address in by_hash.items() if content_hash not in ids]
+        if missing:
+            Address.objects.bulk_create(missing)
+            ids.update(Address.objects.filter(content_hash__in=[a.content_hash for a in missing]).values_list('content_hash', 'pk'))
+        for obj, attname, address in pending:
+            setattr(obj, attname, ids.get(address.content_hash))
+
+    def write_children(self, pairs):
+        pairs = [(obj, extra) for obj, extra in pairs if any(key in extra for key in self.children)]
+        if not pairs:
+            return
+        parent_ids = self.parent_ids(pairs)
+        for key in self.children:
+            # Only records whose payload carried the list get their children replaced.
+            owned = [(parent_ids[getattr(obj, self.key)], extra[key]) for obj, extra in pairs
+                     if key in extra and getattr(obj, self.key) in parent_ids]
+            if not owned:
+                continue
+            if key == 'contact_persons':
+                self.write_contact_persons(owned)
+            elif key == 'line_items':
+                fk = 'sales_order' if self.name == 'salesorders' else 'invoice'
+                self.replace_children(LineItem, fk, owned, exclude=('sales_order', 'invoice'))
+            elif key == 'sub_statuses':
+                self.replace_children(SubStatus, 'sales_order', owned)
+            elif key == 'custom_fields':
+                self.replace_children(SalesOrderCustomField, 'sales_order', owned)
+
+    def parent_ids(self, pairs):
+        keys = [getattr(obj, self.key) for obj, _ in pairs]
+        if self.model._meta.pk.name == self.key:
+            return {key: key for key in keys}
+        return dict(self.model.objects.filter(user=self.user, **{f'{self.key}__in': keys}).values_list(self.key, 'pk'))
+
+    def validate_children(self, model, owned, exclude):
+        rows, owners = [], []
+        for parent_id, children in owned:
+            for child in children if isinstance(children, list) else []:
+                if isinstance(child, dict):
+                    rows.append(child)
+                    owners.append(parent_id)
+        clean, errors = CompiledValidator.for_model(model, exclude=exclude, allow_blank=True).validate(rows, user=self.user)
+        for index, detail in errors:
+            logging.error(f"Validation error for {self.name} {model.__name__}: {detail}")
+        return [(owners[index], data) for index, data in clean]
+
+    def replace_children(self, model, fk, owned, exclude=None):
+        clean = self.validate_children(model, owned, exclude or (fk,))
+        model.objects.filter(**{f'{fk}_id__in': [parent_id for parent_id, _ in owned]}).delete()
+        model.objects.bulk_create([model(**{f'{fk}_id': parent_id}, **data) for parent_id, data in clean])
+
+    def write_contact_persons(self, owned):
+        # Full person objects (contacts) are upserted on the user's
+        # contact_person_id; sales orders and credit notes usually reference
+        # them by id only. Another user's person with the same id is a
+        # different row and is never read or written here.
+        people = {}
+        for parent_id, data in self.validate_children(ContactPerson, owned, ('user',)):
+            if data.get('contact_person_id'):
+                people[data['contact_person_id']] = data
+        references = {
+            str(child.get('contact_person_id') if isinstance(child, dict) else child)
+            for _, children in owned for child in (children if isinstance(children, list) else [])
+        }
+
+        persons = ContactPerson.objects.filter(user=self.user)
+        ids = dict(persons.filter(contact_person_id__in=references | set(people)).values_list('contact_person_id', 'pk'))
+        if people:
+            updated = [ContactPerson(pk=ids[key], user=self.user, **data) for key, data in people.items() if key in ids]
+            created = [ContactPerson(user=self.user, **data) for key, data in people.items() if key not in ids]
+            if updated:
+                fields = [f.name for f in ContactPerson._meta.concrete_fields if not f.primary_key]
+                ContactPerson.objects.bulk_update(updated, fields)
+            if created:
+                ContactPerson.objects.bulk_create(created)
+                ids.update(persons.filter(contact_person_id__in=[p.contact_person_id for p in created]).values_list('contact_person_id', 'pk'))
+
+        links = []
+        for parent_id, children in owned:
+            for child in children if isinstance(children, list) else []:
+                person_id = ids.get(str(child.get('contact_person_id') if isinstance(child, dict) else child))
+                if person_id is not None:
+                    links.append((parent_id, person_id))
+
+        if self.name == 'salesorders':
+            SalesOrderContactPerson.objects.filter(sales_order_id__in=[parent_id for parent_id, _ in owned]).delete()
+            SalesOrderContactPerson.objects.bulk_create([
+                SalesOrderContactPerson(sales_order_id=parent_id, contact_person_id=person_id)
+                for parent_id, person_id in set(links)
+            ])
+        else:
+            field = self.model._meta.get_field('contact_persons')
+            through = field.remote_field.through
+            source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+            through.objects.filter(**{f'{source}_id__in': [parent_id for parent_id, _ in owned]}).delete()
+            through.objects.bulk_create([
+                through(**{f'{source}_id': parent_id, f'{target}_id': person_id})
+                for parent_id, person_id in set(links)
+            ])
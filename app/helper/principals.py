@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+
+class PrincipalCache:
+    """Users looked up by the token's user id claim, so authenticating skips the users table.
+
+    Entries live in a per-process LRU for PRINCIPAL_CACHE_TTL seconds and,
+    when PRINCIPAL_CACHE_ALIAS names a CACHES backend, in that shared cache
+    too. Saving or deleting a user (a password or is_active change) evicts it
+    from this process and the shared cache; other processes drop their copy
+    once the TTL passes. The password hash is not cached: it is a deferred
+    field on the returned users. A TTL of 0 disables caching.
+    """
+
+    def __init__(self, size=None, ttl=None, alias=None):
+        self._size = size
+        self._ttl = ttl
+        self._alias = alias
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.generation = 0
+        self.fields = [field.attname for field in User._meta.concrete_fields if field.attname != 'password']
+
+    @property
+    def size(self):
+        return self._size or getattr(settings, 'PRINCIPAL_CACHE_SIZE', 10000)
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'PRINCIPAL_CACHE_TTL', 60) if self._ttl is None else self._ttl
+
+    @property
+    def alias(self):
+        return self._alias or getattr(settings, 'PRINCIPAL_CACHE_ALIAS', None)
+
+    def key(self, user_id):
+        return f"principal:{user_id}"
+
+    def get(self, user_id):
+        """The user with this id, active or not, or None if there is none."""
+        if self.ttl <= 0:
+            return self.build(self.query(user_id))
+        key = self.key(user_id)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                return self.build(entry[1])
+            generation = self.generation
+        values = caches[self.alias].get(key) if self.alias else None
+        if values is None:
+            values = self.query(user_id)
+            if values is None:
+                return None
+            if self.alias:
+                caches[self.alias].set(key, values, self.ttl)
+        with self.lock:
+            # An invalidation while we were reading may have made `values` stale.
+            if generation == self.generation:
+                self.entries[key] = (now + self.ttl, values)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.size:
+                    self.entries.popitem(last=False)
+        return self.build(values)
+
+    def query(self, user_id):
+        values = User._default_manager.filter(**{api_settings.USER_ID_FIELD: user_id}).values_list(*self.fields)
+        return values.first()
+
+    def build(self, values):
+        # A new instance per request, so one request's changes never leak into another's.
+        if values is None:
+            return None
+        return User.from_db(router.db_for_read(User), self.fields, values)
+
+    def invalidate(self, user_id):
+        key = self.key(user_id)
+        with self.lock:
+            self.entries.pop(key, None)
+            self.generation += 1
+        if self.alias:
+            caches[self.alias].delete(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+
+principal_cache = PrincipalCache()
+
+
+@receiver([post_save, post_delete], sender=User, dispatch_uid='app.principal_cache')
+def invalidate_principal(sender, instance, **kwargs):
+    user_id = getattr(instance, api_settings.USER_ID_FIELD)
+    principal_cache.invalidate(user_id)
+    # A request reading the old row before this transaction commits could cache it again.
+    transaction.on_commit(lambda: principal_cache.invalidate(user_id))
@@ -0,0 +1,44 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+
+
+class ResponseCache:
+    """Serialized API response data, keyed on the response's ETag.
+
+    The ETag already covers the user, the URL and the version of every
+    entity the response was built from, so a write moves the affected
+    responses to new keys and the stale ones simply expire. Disabled while
+    RESPONSE_CACHE_TIMEOUT is 0.
+    """
+
+    def __init__(self, alias=None, timeout=None):
+        self._alias = alias
+        self._timeout = timeout
+
+    @property
+    def alias(self):
+        return self._alias or getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 0) if self._timeout is None else self._timeout
+
+    @property
+    def enabled(self):
+        return self.timeout > 0
+
+    def key(self, etag):
+        return f"api-response:{hashlib.sha256(etag.encode()).hexdigest()}"
+
+    def get(self, etag):
+        if not self.enabled:
+            return None
+        return caches[self.alias].get(self.key(etag))
+
+    def set(self, etag, data):
+        if self.enabled:
+            caches[self.alias].set(self.key(etag), data, self.timeout)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,166 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+
+from app.models import Contact, Expense, Invoice, SummaryState, SummaryTotal
+
+ZERO = Decimal('0')
+
+
+def read(row, field):
+    return row[field] if isinstance(row, dict) else getattr(row, field)
+
+
+class Metric:
+    """Row count, amount and balance of a model, grouped by `key` and by month of `period`."""
+
+    def __init__(self, name, model, amount, balance=None, key=None, period=None):
+        self.name = name
+        self.model = model
+        self.amount = amount
+        self.balance = balance
+        self.key = key
+        self.period = period
+
+    @property
+    def fields(self):
+        return [field for field in (self.amount, self.balance, self.key, self.period) if field]
+
+    def bucket(self, row):
+        key = (read(row, self.key) or '') if self.key else ''
+        period = read(row, self.period) if self.period else None
+        return key, period.strftime('%Y-%m') if period else ''
+
+    def contribution(self, row):
+        amount = read(row, self.amount)
+        balance = read(row, self.balance) if self.balance else None
+        return (
+            1,
+            Decimal(str(amount)) if amount is not None else ZERO,
+            Decimal(str(balance)) if balance is not None else ZERO,
+        )
+
+    def totals(self, queryset):
+        # The same buckets computed from scratch with one GROUP BY.
+        group = [self.key] if self.key else []
+        if self.period:
+            queryset = queryset.annotate(month=TruncMonth(self.period))
+            group.append('month')
+        sums = {'rows': Count('pk'), 'amount_sum': Sum(self.amount)}
+        if self.balance:
+            sums['balance_sum'] = Sum(self.balance)
+        if group:
+            totals = queryset.order_by().values(*group).annotate(**sums)
+        else:
+            totals = [queryset.aggregate(**sums)]
+        for total in totals:
+            if not total['rows']:
+                continue
+            yield {
+                'key': (total[self.key] or '') if self.key else '',
+                'period': total['month'].strftime('%Y-%m') if self.period and total['month'] else '',
+                'count': total['rows'],
+                'amount': total['amount_sum'] or ZERO,
+                'balance': total.get('balance_sum') or ZERO,
+            }
+
+
+METRICS = [
+    Metric('receivables', Contact, amount='outstanding_receivable_amount_bcy', balance='unused_credits_receivable_amount_bcy'),
+    Metric('invoices_by_status', Invoice, amount='total', balance='balance', key='status'),
+    Metric('expenses_by_account_month', Expense, amount='total', key='account_name', period='date'),
+]
+
+SUMMARY_MODELS = list(dict.fromkeys(metric.model for metric in METRICS))
+
+
+def metrics_for(model):
+    return [metric for metric in METRICS if metric.model is model]
+
+
+def snapshot(model, pks):
+    """The summarized columns of rows about to be changed or deleted.
+
+    Must run inside the writing transaction: the rows stay locked until it
+    ends, so the delta is taken against the values actually replaced.
+    """
+    metrics = metrics_for(model)
+    if not metrics or not pks:
+        return []
+    fields = {'user_id'}.union(*(metric.fields for metric in metrics))
+    return list(model.objects.select_for_update().filter(pk__in=pks).values(*fields))
+
+
+def apply(model, old_rows, new_rows):
+    """Take old_rows out of the totals and add new_rows, in the writing transaction.
+
+    Rows are model instances or value dicts; only buckets that changed are
+    touched, with one UPDATE each.
+    """
+    deltas = defaultdict(lambda: [0, ZERO, ZERO])
+    for metric in metrics_for(model):
+        for rows, sign in ((old_rows, -1), (new_rows, 1)):
+            for row in rows:
+                user_id = read(row, 'user_id')
+                if user_id is None:
+                    continue
+                count, amount, balance = metric.contribution(row)
+                delta = deltas[(user_id, metric.name, *metric.bucket(row))]
+                delta[0] += sign * count
+                delta[1] += sign * amount
+                delta[2] += sign * balance
+    for (user_id, metric, key, period), (count, amount, balance) in deltas.items():
+        if count or amount or balance:
+            add(user_id, metric, key, period, count, amount, balance)
+
+
+def add(user_id, metric, key, period, count, amount, balance):
+    totals = SummaryTotal.objects.filter(user_id=user_id, metric=metric, key=key, period=period)
+    changes = {'count': F('count') + count, 'amount': F('amount') + amount, 'balance': F('balance') + balance}
+    if totals.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            SummaryTotal.objects.create(
+                user_id=user_id, metric=metric, key=key, period=period, count=count, amount=amount, balance=balance)
+    except IntegrityError:
+        totals.update(**changes)
+
+
+def rebuild(user):
+    """Recompute a user's totals from their rows (first use, or repair after drift)."""
+    with transaction.atomic():
+        SummaryTotal.objects.filter(user=user).delete()
+        SummaryTotal.objects.bulk_create([
+            SummaryTotal(user=user, metric=metric.name, **total)
+            for metric in METRICS
+            for total in metric.totals(metric.model.objects.filter(user=user))
+        ])
+        SummaryState.objects.update_or_create(user=user)
+
+
+def report(user):
+    # Reads only the aggregate rows, however large the ledger is.
+    if not SummaryState.objects.filter(user=user).exists():
+        rebuild(user)
+    result = {
+        'receivables': {'contacts': 0, 'outstanding_bcy': str(ZERO), 'unused_credits_bcy': str(ZERO)},
+        'invoices_by_status': [],
+        'expenses_by_account_month': [],
+    }
+    for total in SummaryTotal.objects.filter(user=user, count__gt=0).order_by('metric', 'key', 'period'):
+        if total.metric == 'receivables':
+            result['receivables'] = {
+                'contacts': total.count, 'outstanding_bcy': str(total.amount), 'unused_credits_bcy': str(total.balance),
+            }
+        elif total.metric == 'invoices_by_status':
+            result['invoices_by_status'].append({
+                'status': total.key, 'count': total.count, 'total': str(total.amount), 'balance': str(total.balance),
+            })
+        elif total.metric == 'expenses_by_account_month':
+            result['expenses_by_account_month'].append({
+                'account_name': total.key, 'month': total.period, 'count': total.count, 'total': str(total.amount),
+            })
+    return result
@@ -0,0 +1,112 @@
+import logging
+import threading
+import requests
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from app.models import ZohoToken
+
+
+class TokenStore:
+    # Access tokens are cached per user in this process and in the ZohoToken row.
+    # A token that is close to expiry is still handed out while a background
+    # thread refreshes it; an expired one is refreshed inline.
+    cache = {}
+    refreshing = set()
+    lock = threading.Lock()
+
+    @property
+    def margin(self):
+        return timedelta(seconds=getattr(settings, 'ZOHO_TOKEN_REFRESH_MARGIN', 300))
+
+    @property
+    def token_url(self):
+        return f"{settings.ZOHO_ACCOUNTS_URL}/oauth/v2/token"
+
+    def exchange_code(self, user, code):
+        # ImportView stored the client credentials on the user's token row.
+        token = ZohoToken.objects.get(user=user)
+        token_info = self.request_token({
+            "client_id": token.client_id,
+            "client_secret": token.client_secret,
+            "code": code,
+            "redirect_uri": settings.ZOHO_REDIRECT_URI,
+            "grant_type": "authorization_code",
+            "prompt": "consent",
+            "access_type": "offline"
+        })
+        if token_info.get("refresh_token"):
+            token.refresh_token = token_info["refresh_token"]
+            token.save(update_fields=["refresh_token", "updated_time"])
+        return self.store(token, token_info)
+
+    def get_access_token(self, user):
+        now = timezone.now()
+        with self.lock:
+            cached = self.cache.get(user.id)
+        if cached is None:
+            token = ZohoToken.objects.get(user=user)
+            cached = (token.access_token, token.expires_at)
+            with self.lock:
+                self.cache[user.id] = cached
+
+        access_token, expires_at = cached
+        if access_token and expires_at and expires_at > now + self.margin:
+            return access_token
+        if access_token and expires_at and expires_at > now:
+            self.refresh_in_background(user)
+            return access_token
+        return self.refresh(user)
+
+    def refresh(self, user):
+        token = ZohoToken.objects.get(user=user)
+        token_info = self.request_token({
+            "client_id": token.client_id,
+            "client_secret": token.client_secret,
+            "refresh_token": token.refresh_token,
+            "grant_type": "refresh_token",
+        })
+        return self.store(token, token_info)
+
+    def refresh_in_background(self, user):
+        with self.lock:
+            if user.id in self.refreshing:
+                return
+            self.refreshing.add(user.id)
+
+        def run():
+            try:
+                self.refresh(user)
+            except Exception as e:
+                logging.error(f"Background Zoho token refresh failed for {user}: {str(e)}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(user.id)
+                connection.close()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def request_token(self, data):
+        try:
+            response = requests.post(self.token_url, data=data)
+            response.raise_for_status()
+            token_info = response.json()
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Error during token retrieval: {str(e)}")
+            raise  # Raise the exception to signal failure
+        if "access_token" not in token_info:
+            raise ValueError(f"Token request rejected: {token_info.get('error', token_info)}")
+        return token_info
+
+    def store(self, token, token_info):
+        token.access_token = token_info["access_token"]
+        token.expires_at = timezone.now() + timedelta(seconds=int(token_info.get("expires_in", 3600)))
+        token.save(update_fields=["access_token", "expires_at", "updated_time"])
+        with self.lock:
+            self.cache[token.user_id] = (token.access_token, token.expires_at)
+        return token.access_token
+
+
+token_store = TokenStore()
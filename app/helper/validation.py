@@ -0,0 +1,261 @@
+import datetime
+from decimal import Decimal, InvalidOperation
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import EmailValidator, URLValidator
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.fields import BooleanField
+
+# Error messages follow DRF's wording so clients see the same errors as before.
+REQUIRED = "This field is required."
+NOT_NULL = "This field may not be null."
+NOT_BLANK = "This field may not be blank."
+
+
+class Invalid(Exception):
+    pass
+
+
+def coerce_bool(value):
+    if value in BooleanField.TRUE_VALUES:
+        return True
+    if value in BooleanField.FALSE_VALUES:
+        return False
+    raise Invalid("Must be a valid boolean.")
+
+
+def coerce_int(value):
+    try:
+        if isinstance(value, str):
+            value = value.strip()
+        number = float(value) if not isinstance(value, int) else value
+        if number != int(number):
+            raise ValueError
+        return int(number)
+    except (TypeError, ValueError, OverflowError):
+        raise Invalid("A valid integer is required.")
+
+
+def decimal_coercer(field):
+    max_digits, decimal_places = field.max_digits, field.decimal_places
+    whole_digits = max_digits - decimal_places
+
+    def coerce(value):
+        try:
+            number = Decimal(str(value).strip())
+        except InvalidOperation:
+            raise Invalid("A valid number is required.")
+        if not number.is_finite():
+            raise Invalid("A valid number is required.")
+        _, digits, exponent = number.as_tuple()
+        if exponent >= 0:
+            total, whole, decimals = len(digits) + exponent, len(digits) + exponent, 0
+        elif len(digits) > -exponent:
+            total, whole, decimals = len(digits), len(digits) + exponent, -exponent
+        else:
+            total, whole, decimals = -exponent, 0, -exponent
+        if total > max_digits:
+            raise Invalid(f"Ensure that there are no more than {max_digits} digits in total.")
+        if decimals > decimal_places:
+            raise Invalid(f"Ensure that there are no more than {decimal_places} decimal places.")
+        if whole > whole_digits:
+            raise Invalid(f"Ensure that there are no more than {whole_digits} digits before the decimal point.")
+        return number
+    return coerce
+
+
+def coerce_date(value):
+    if isinstance(value, datetime.datetime):
+        raise Invalid("Expected a date but got a datetime.")
+    if isinstance(value, datetime.date):
+        return value
+    try:
+        parsed = parse_date(value)
+    except (TypeError, ValueError):
+        parsed = None
+    if parsed is None:
+        raise Invalid("Date has wrong format. Use one of these formats instead: YYYY-MM-DD.")
+    return parsed
+
+
+def coerce_datetime(value):
+    if isinstance(value, datetime.datetime):
+        parsed = value
+    else:
+        try:
+            parsed = parse_datetime(value)
+        except (TypeError, ValueError):
+            parsed = None
+        if parsed is None:
+            raise Invalid("Datetime has wrong format. Use one of these formats instead: YYYY-MM-DDThh:mm[:ss[.uuuuuu]][+HH:MM|-HH:MM|Z].")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def string_coercer(field, allow_blank=False):
+    max_length = field.max_length
+    allow_blank = allow_blank or field.blank
+    check = None
+    if isinstance(field, models.EmailField):
+        check = EmailValidator()
+    elif isinstance(field, models.URLField):
+        check = URLValidator()
+
+    def coerce(value):
+        if isinstance(value, (dict, list, bool)):
+            raise Invalid("Not a valid string.")
+        value = str(value).strip()
+        if not value:
+            if not allow_blank:
+                raise Invalid(NOT_BLANK)
+            return value
+        if max_length is not None and len(value) > max_length:
+            raise Invalid(f"Ensure this field has no more than {max_length} characters.")
+        if check is not None:
+            try:
+                check(value)
+            except DjangoValidationError as e:
+                raise Invalid(e.messages[0])
+        return value
+    return coerce
+
+
+def relation_coercer(field):
+    to_python = field.target_field.to_python
+
+    def coerce(value):
+        if isinstance(value, (dict, list, bool)):
+            raise Invalid(f"Incorrect type. Expected pk value, received {type(value).__name__}.")
+        try:
+            return to_python(value)
+        except DjangoValidationError:
+            raise Invalid(f"Incorrect type. Expected pk value, received {type(value).__name__}.")
+    return coerce
+
+
+def field_coercer(field, allow_blank=False):
+    if field.is_relation:
+        return relation_coercer(field)
+    if isinstance(field, models.BooleanField):
+        return coerce_bool
+    if isinstance(field, models.DecimalField):
+        return decimal_coercer(field)
+    if isinstance(field, models.IntegerField):
+        return coerce_int
+    if isinstance(field, models.DateTimeField):
+        return coerce_datetime
+    if isinstance(field, models.DateField):
+        return coerce_date
+    if isinstance(field, models.JSONField):
+        return lambda value: value
+    if isinstance(field, (models.CharField, models.TextField)):
+        return string_coercer(field, allow_blank)
+    return lambda value: field.to_python(value)
+
+
+class CompiledField:
+    def __init__(self, field, allow_blank=False):
+        self.name = field.name
+        self.attname = field.attname
+        self.null = field.null
+        is_text = isinstance(field, (models.CharField, models.TextField))
+        self.required = not (field.null or field.blank or field.has_default() or (allow_blank and is_text))
+        self.related_model = field.related_model if field.is_relation else None
+        # References to tenant-owned rows must stay within the writing user's.
+        self.owned = self.related_model is not None and any(
+            f.name == 'user' for f in self.related_model._meta.concrete_fields
+        )
+        self.blank_is_null = field.is_relation or (field.null and isinstance(field, models.DecimalField))
+        self.coerce = field_coercer(field, allow_blank)
+        self.choices = {str(choice) for choice, _ in field.flatchoices} if field.choices else None
+
+
+class CompiledValidator:
+    # Built once per model from _meta and reused for every batch; a stand-in for
+    # the "__all__" ModelSerializers on bulk write paths.
+    compiled = {}
+
+    @classmethod
+    def for_model(cls, model, exclude=('user',), allow_blank=False):
+        key = (model, tuple(exclude), allow_blank)
+        if key not in cls.compiled:
+            cls.compiled[key] = cls(model, exclude, allow_blank)
+        return cls.compiled[key]
+
+    def __init__(self, model, exclude=(), allow_blank=False):
+        # allow_blank accepts empty or missing text, for nested Zoho objects
+        # that routinely leave names, phones and codes empty.
+        self.model = model
+        self.fields = [
+            CompiledField(field, allow_blank) for field in model._meta.concrete_fields
+            if field.editable and not field.auto_created and field.name not in exclude
+        ]
+
+    def validate(self, rows, partial=False, user=None):
+        """Return (clean, errors): clean rows keyed by attname, and (index, errors) pairs.
+
+        Given a user, references to tenant-owned models must be that user's rows.
+        """
+        clean = []
+        errors = []
+        references = {}
+        for index, row in enumerate(rows):
+            data = {}
+            row_errors = {}
+            for field in self.fields:
+                if field.name not in row:
+                    if field.required and not partial:
+                        row_errors[field.name] = [REQUIRED]
+                    continue
+                value = row[field.name]
+                if field.blank_is_null and isinstance(value, str) and not value.strip():
+                    value = None
+                if value is None:
+                    if field.null:
+                        data[field.attname] = None
+                    else:
+                        row_errors[field.name] = [NOT_NULL]
+                    continue
+                try:
+                    value = field.coerce(value)
+                except Invalid as e:
+                    row_errors[field.name] = [str(e)]
+                    continue
+                if field.choices is not None and str(value) not in field.choices:
+                    row_errors[field.name] = [f'"{value}" is not a valid choice.']
+                    continue
+                if field.related_model is not None:
+                    references.setdefault(field, set()).add(value)
+                data[field.attname] = value
+            if row_errors:
+                errors.append((index, row_errors))
+            else:
+                clean.append((index, data))
+
+        if references:
+            clean = self.check_references(clean, errors, references, user)
+        errors.sort(key=lambda error: error[0])
+        return clean, errors
+
+    def check_references(self, clean, errors, references, user=None):
+        # One query per relation for the whole batch instead of one per row.
+        known = {}
+        for field, values in references.items():
+            queryset = field.related_model._base_manager.filter(pk__in=values)
+            if user is not None and field.owned:
+                queryset = queryset.filter(user=user)
+            known[field] = set(queryset.values_list('pk', flat=True))
+        valid = []
+        for index, data in clean:
+            row_errors = {
+                field.name: [f'Invalid pk "{data[field.attname]}" - object does not exist.']
+                for field in known
+                if data.get(field.attname) is not None and data[field.attname] not in known[field]
+            }
+            if row_errors:
+                errors.append((index, row_errors))
+            else:
+                valid.append((index, data))
+        return valid
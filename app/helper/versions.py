@@ -0,0 +1,66 @@
+import hashlib
+import json
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from app.models import Contact, CreditNote, DataVersion, Expense, Invoice, SalesOrder
+
+# Entities whose writes are versioned. Child rows (line items, addresses,
+# contact persons) are only written together with their parent entity.
+VERSIONED_MODELS = [Contact, SalesOrder, Invoice, CreditNote, Expense]
+
+
+def bump(user_id, model, using=None):
+    """Advance the version of one user's rows of `model`.
+
+    Call it inside the transaction that writes the rows, on the same
+    database alias, so the new version becomes visible together with the
+    data it describes.
+    """
+    if user_id is None:
+        return
+    entity = model._meta.model_name
+    now = timezone.now()
+    manager = DataVersion.objects.db_manager(using)
+    versions = manager.filter(user_id=user_id, entity=entity)
+    if versions.update(version=F('version') + 1, modified_time=now):
+        return
+    try:
+        with transaction.atomic(using=using):
+            manager.create(user_id=user_id, entity=entity, version=1, modified_time=now)
+    except IntegrityError:
+        versions.update(version=F('version') + 1, modified_time=now)
+
+
+def read(user_id, entities):
+    return {
+        entity: (version, modified)
+        for entity, version, modified in DataVersion.objects.filter(user_id=user_id, entity__in=entities)
+        .values_list('entity', 'version', 'modified_time')
+    }
+
+
+def current(user_id, models):
+    """The version of one user's rows of each of `models`, in that order.
+
+    Entities that were never written have version 0.
+    """
+    rows = read(user_id, [model._meta.model_name for model in models])
+    return [rows.get(model._meta.model_name, (0, None))[0] for model in models]
+
+
+def stamp(user_id, models, variant):
+    """ETag and Last-Modified timestamp for a response built from `models`.
+
+    `variant` distinguishes representations of the same data (path, query
+    string, media type). Entities that were never written have version 0.
+    """
+    entities = sorted(model._meta.model_name for model in models)
+    rows = read(user_id, entities)
+    versions = [rows.get(entity, (0, None))[0] for entity in entities]
+    content = json.dumps([user_id, entities, versions, variant])
+    etag = f'W/"{hashlib.sha256(content.encode()).hexdigest()[:32]}"'
+    modified = [modified for _, modified in rows.values() if modified]
+    last_modified = int(max(modified).timestamp()) if modified else None
+    return etag, last_modified
@@ -0,0 +1,190 @@
+import logging
+import time
+from datetime import timedelta
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from app.models import Contact, CreditNote, Expense, Invoice, SalesOrder
+from .nested import NestedWriter
+from . import summary
+from .versions import bump
+from .validation import CompiledValidator
+
+# Zoho module name -> (model, natural key used to match existing rows)
+IMPORT_MODULES = {
+    'contacts': (Contact, 'contact_id'),
+    'salesorders': (SalesOrder, 'salesorder_number'),
+    'invoices': (Invoice, 'invoice_id'),
+    'creditnotes': (CreditNote, 'creditnote_id'),
+    'expenses': (Expense, 'expense_id'),
+}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BulkWriter:
+    max_errors = 20
+
+    def __init__(self, name, user, chunk_size=None, progress=None):
+        self.model, self.key = IMPORT_MODULES[name]
+        self.name = name
+        self.user = user
+        self.chunk_size = chunk_size or getattr(settings, 'IMPORT_CHUNK_SIZE', 500)
+        self.validator = CompiledValidator.for_model(self.model)
+        self.nested = NestedWriter(name, user, self.model, self.key)
+        self.progress = progress
+
+        meta = self.model._meta
+        # Primary and unique keys are unique across tenants, not per user.
+        self.global_key = meta.get_field(self.key).unique
+        self.auto_now_fields = [f for f in meta.concrete_fields if getattr(f, 'auto_now', False)]
+        self.update_fields = [
+            f.name for f in meta.concrete_fields
+            if not f.primary_key and f.name != self.key and (f.editable or f in self.auto_now_fields)
+        ]
+
+        self.written = 0
+        self.failed = 0
+        self.errors = []
+        self.last_modified_time = None
+        self.oldest_failure = None
+        self.timed_failures = 0
+        self.started = time.monotonic()
+
+    def write(self, records):
+        for chunk in chunked(records, self.chunk_size):
+            self.write_chunk(chunk)
+        return self.report()
+
+    def write_chunk(self, items):
+        items, nested = self.nested.extract(items)
+        clean, errors = self.validator.validate(items, user=self.user)
+        for index, detail in errors:
+            logging.error(f"Validation error for {self.name}: {detail}")
+            if len(self.errors) < self.max_errors:
+                self.errors.append({"key": items[index].get(self.key), "errors": detail})
+            self.track_failure(items[index].get('last_modified_time'))
+        self.failed += len(errors)
+
+        pairs = {}
+        for index, data in clean:
+            obj = self.model(user=self.user, **data)
+            pairs[getattr(obj, self.key) or id(obj)] = (obj, nested[index])
+        pairs = list(pairs.values())
+        taken = self.save_objects([obj for obj, _ in pairs], pairs)
+        for index, data in clean:
+            if data.get(self.key) in taken:
+                self.track_failure(items[index].get('last_modified_time'))
+            else:
+                self.track_watermark(items[index].get('last_modified_time'))
+        if self.progress:
+            self.progress(self)
+
+    def save_objects(self, objs, nested_pairs=None):
+        # Returns the keys that were rejected because another user holds them.
+        if not objs:
+            return set()
+        # Look up existing keys before opening the write transaction so it
+        # starts with a write and stays short.
+        existing, taken = self.existing_keys(objs)
+        if taken:
+            objs = self.reject(objs, taken)
+            nested_pairs = [(obj, extra) for obj, extra in nested_pairs or [] if getattr(obj, self.key) not in taken]
+            if not objs:
+                return taken
+        with transaction.atomic():
+            # The version bump goes first: SQLite fails a read transaction
+            # that tries to write while another connection holds the write
+            # lock, where a transaction that writes first waits for it.
+            bump(self.user.id, self.model)
+            old = summary.snapshot(self.model, list(existing.values()))
+            if nested_pairs:
+                self.nested.attach(nested_pairs)
+            self.upsert(objs, existing)
+            if nested_pairs:
+                self.nested.write_children(nested_pairs)
+            summary.apply(self.model, old, objs)
+        self.written += len(objs)
+        return taken
+
+    def track_watermark(self, value):
+        modified = parse_datetime(value) if isinstance(value, str) else value
+        if modified and (self.last_modified_time is None or modified > self.last_modified_time):
+            self.last_modified_time = modified
+
+    def track_failure(self, value):
+        modified = parse_datetime(value) if isinstance(value, str) else value
+        if modified:
+            self.timed_failures += 1
+            if self.oldest_failure is None or modified < self.oldest_failure:
+                self.oldest_failure = modified
+
+    def watermark(self):
+        # The newest stored change, held back to just before the oldest failed
+        # record so that the next incremental sync fetches it again.
+        if self.last_modified_time is None or self.failed > self.timed_failures:
+            return None
+        if self.oldest_failure is None:
+            return self.last_modified_time
+        return min(self.last_modified_time, self.oldest_failure - timedelta(seconds=1))
+
+    def existing_keys(self, objs):
+        # This user's rows by key, and the keys already taken by another user.
+        keys = [getattr(obj, self.key) for obj in objs]
+        rows = self.model._base_manager.filter(**{f'{self.key}__in': keys})
+        if not self.global_key:
+            rows = rows.filter(user=self.user)
+        existing, taken = {}, set()
+        for key, pk, user_id in rows.values_list(self.key, 'pk', 'user_id'):
+            if user_id == self.user.id:
+                existing[key] = pk
+            else:
+                taken.add(key)
+        return existing, taken
+
+    def reject(self, objs, taken):
+        field = self.model._meta.get_field(self.key)
+        message = f"{self.model._meta.verbose_name} with this {field.verbose_name} already exists."
+        kept = []
+        for obj in objs:
+            key = getattr(obj, self.key)
+            if key not in taken:
+                kept.append(obj)
+                continue
+            logging.error(f"Validation error for {self.name}: {key} belongs to another user")
+            if len(self.errors) < self.max_errors:
+                self.errors.append({"key": key, "errors": {self.key: [message]}})
+        self.failed += len(objs) - len(kept)
+        return kept
+
+    def upsert(self, objs, existing):
+        new, old = [], []
+        for obj in objs:
+            pk = existing.get(getattr(obj, self.key))
+            if pk is None:
+                new.append(obj)
+            else:
+                obj.pk = pk
+                for field in self.auto_now_fields:
+                    field.pre_save(obj, add=False)
+                old.append(obj)
+
+        if new:
+            self.model.objects.bulk_create(new, batch_size=self.chunk_size)
+        if old:
+            self.model.objects.bulk_update(old, self.update_fields, batch_size=self.chunk_size)
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        rate = self.written / elapsed if elapsed else 0
+        logging.info(f"{self.name}: wrote {self.written} rows, {self.failed} failed in {elapsed:.2f}s ({rate:.0f} rows/s)")
+        return {"written": self.written, "failed": self.failed, "seconds": elapsed, "rows_per_second": rate}
@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+import requests
+from email.utils import parsedate_to_datetime
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+class AdaptiveLimiter:
+    # Bounds in-flight requests. The limit is halved and requests are paused on
+    # every 429, then grows back by one per successful response.
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self.resume_at = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                wait = self.resume_at - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                elif self.active < self.limit:
+                    break
+                else:
+                    self.condition.wait()
+            self.active += 1
+
+    def release(self, retry_after=None):
+        with self.condition:
+            self.active -= 1
+            if retry_after is not None:
+                self.limit = max(1, self.limit // 2)
+                self.resume_at = max(self.resume_at, time.monotonic() + retry_after)
+                logging.warning(f"Zoho rate limit hit, concurrency {self.limit}, pausing {retry_after:.1f}s")
+            elif self.limit < self.max_concurrency:
+                self.limit += 1
+            self.condition.notify_all()
+
+
+def parse_retry_after(value, default):
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class ZohoClient:
+    def __init__(self, access_token, organization_id):
+        # access_token is a string or a callable returning the current token.
+        self.access_token = access_token if callable(access_token) else lambda: access_token
+        self.organization_id = organization_id
+        self.per_page = getattr(settings, 'ZOHO_PAGE_SIZE', 200)
+        self.timeout = getattr(settings, 'ZOHO_TIMEOUT', 30)
+        self.max_retries = getattr(settings, 'ZOHO_MAX_RETRIES', 5)
+        max_concurrency = getattr(settings, 'ZOHO_MAX_CONCURRENCY', 5)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.limiter = AdaptiveLimiter(max_concurrency)
+
+    def get(self, url, params):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            retry_after = None
+            try:
+                headers = {"Authorization": f"Zoho-oauthtoken {self.access_token()}"}
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+                if response.status_code == 429 and attempt < self.max_retries:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"), 2 ** attempt)
+                    continue
+                response.raise_for_status()
+                return response
+            finally:
+                self.limiter.release(retry_after)
+
+    def iter_pages(self, api_url, name, params=None):
+        page = 1
+        while True:
+            query = {"organization_id": self.organization_id, "page": page, "per_page": self.per_page}
+            query.update(params or {})
+            payload = self.get(api_url, query).json()
+            records = payload.get(name, [])
+            logging.info(f"Fetched {name} page {page} ({len(records)} records)")
+            yield records
+            if not payload.get("page_context", {}).get("has_more_page"):
+                break
+            page += 1
+
+    def iter_records(self, api_url, name, params=None):
+        for records in self.iter_pages(api_url, name, params):
+            yield from records
+
+    def close(self):
+        self.session.close()
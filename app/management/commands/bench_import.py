@@ -0,0 +1,137 @@
+import json
+import resource
+import secrets
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from app.helper.fakezoho import FakeZohoServer
+from app.helper.handler import MyHandler
+from app.helper.tokens import token_store
+from app.models import ImportJob, ZohoToken
+
+User = get_user_model()
+
+BENCH_EMAIL = 'bench-import@example.com'
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class BenchHandler(MyHandler):
+    # Counts the queries each module thread issues on its own connection.
+    def __init__(self, job):
+        super().__init__(job)
+        self.queries = {}
+
+    def fetch_and_save_data(self, client, api_url, name):
+        counter = self.queries[name] = QueryCounter()
+        with connection.execute_wrapper(counter):
+            return super().fetch_and_save_data(client, api_url, name)
+
+
+class Command(BaseCommand):
+    help = "Run a full Zoho import against a local fake Zoho Books server and report throughput."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=2000, help="Records served per module.")
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every fake API response.")
+        parser.add_argument('--rate-limit-every', type=int, default=0, help="Answer every Nth request with a 429.")
+        parser.add_argument('--retry-after', type=int, default=1)
+        parser.add_argument('--page-size', type=int, default=None)
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--runs', type=int, default=1, help="Repeat the import; later runs are incremental.")
+        parser.add_argument('--json', dest='json_path', help="Also write the results to this file.")
+        parser.add_argument('--keep', action='store_true', help="Keep the imported rows afterwards.")
+
+    def handle(self, *args, **options):
+        server = FakeZohoServer(
+            records=options['records'], latency=options['latency'],
+            rate_limit_every=options['rate_limit_every'], retry_after=options['retry_after'],
+        ).start()
+        overrides = {
+            'ZOHO_API_URL': f"{server.url}/books/v3",
+            'ZOHO_ACCOUNTS_URL': server.url,
+        }
+        if options['page_size']:
+            overrides['ZOHO_PAGE_SIZE'] = options['page_size']
+        if options['chunk_size']:
+            overrides['IMPORT_CHUNK_SIZE'] = options['chunk_size']
+
+        User.objects.filter(email=BENCH_EMAIL).delete()
+        user = User.objects.create_user(email=BENCH_EMAIL, password=None, username='bench-import')
+        ZohoToken.objects.create(user=user, client_id='bench', client_secret='bench')
+        results = []
+        try:
+            with override_settings(**overrides):
+                for run in range(options['runs']):
+                    results.append(self.run_import(user, server, run))
+        finally:
+            server.stop()
+            token_store.cache.pop(user.pk, None)
+            if not options['keep']:
+                user.delete()
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({"vendor": connection.vendor, "options": {k: options[k] for k in (
+                    'records', 'latency', 'rate_limit_every', 'page_size', 'chunk_size')}, "runs": results}, f, indent=2)
+
+    def run_import(self, user, server, run):
+        job = ImportJob.objects.create(
+            user=user, status=ImportJob.RUNNING, state=secrets.token_urlsafe(32), client_id='bench', organization_id='bench',
+            authorization_code='bench' if run == 0 else None,
+        )
+        handler = BenchHandler(job)
+        requests_before, throttled_before = server.requests, server.throttled
+        started = time.perf_counter()
+        ok = handler.run()
+        elapsed = time.perf_counter() - started
+        job.refresh_from_db()
+        job.status = ImportJob.COMPLETED if ok else ImportJob.FAILED
+        job.save(update_fields=['status'])
+
+        # ru_maxrss is in kilobytes on Linux.
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        modules = {
+            name: {
+                "rows_written": progress["rows_written"],
+                "rows_failed": progress["rows_failed"],
+                "pages": progress["pages"],
+                "queries": handler.queries[name].count if name in handler.queries else 0,
+                "status": progress["status"],
+            }
+            for name, progress in job.progress.items()
+        }
+        written = sum(module["rows_written"] for module in modules.values())
+        result = {
+            "run": run + 1,
+            "ok": ok,
+            "seconds": elapsed,
+            "rows_written": written,
+            "rows_per_second": written / elapsed if elapsed else 0,
+            "peak_rss_mb": peak_rss,
+            "requests": server.requests - requests_before,
+            "throttled": server.throttled - throttled_before,
+            "modules": modules,
+        }
+
+        self.stdout.write(
+            f"run {run + 1} on {connection.vendor}: {written} rows in {elapsed:.2f}s "
+            f"({result['rows_per_second']:.0f} rows/s), peak RSS {peak_rss:.1f} MB, "
+            f"{result['requests']} requests ({result['throttled']} throttled)"
+        )
+        for name, module in modules.items():
+            self.stdout.write(
+                f"  {name:12} {module['status']:10} rows {module['rows_written']:8} failed {module['rows_failed']:6} "
+                f"pages {module['pages']:5} queries {module['queries']:6}"
+            )
+        return result
@@ -0,0 +1,90 @@
+import json
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIClient
+
+from app.management.commands.bench_import import BENCH_EMAIL, QueryCounter
+from app.views import ContactsView, CreditNoteView, ExpensesView, InvoiceView, SalesOrderView
+
+User = get_user_model()
+
+ENDPOINTS = [
+    ('contacts', ContactsView),
+    ('sales_order', SalesOrderView),
+    ('invoice', InvoiceView),
+    ('credit_note', CreditNoteView),
+    ('expenses', ExpensesView),
+]
+
+
+class Command(BaseCommand):
+    help = "Measure list endpoint throughput for the serializer and values() read paths, with and without ?fields=."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=2000, help="Rows per entity, imported from the fake Zoho server.")
+        parser.add_argument('--limit', type=int, default=100, help="Page size of every request.")
+        parser.add_argument('--requests', type=int, default=20, help="Requests per endpoint and mode.")
+        parser.add_argument('--fields', type=int, default=5, help="Size of the ?fields= subset.")
+        parser.add_argument('--json', dest='json_path', help="Also write the results to this file.")
+        parser.add_argument('--keep', action='store_true', help="Keep the imported rows afterwards.")
+
+    def handle(self, *args, **options):
+        call_command('bench_import', records=options['records'], keep=True, stdout=self.stdout)
+        user = User.objects.get(email=BENCH_EMAIL)
+        client = APIClient()
+        client.force_authenticate(user)
+        results = []
+        try:
+            for path, viewset in ENDPOINTS:
+                fields = ','.join(list(viewset.serializer_class().fields)[:options['fields']])
+                for mode, lean, query in (
+                    ('serializer', False, ''),
+                    ('values', True, ''),
+                    ('serializer+fields', False, f'&fields={fields}'),
+                    ('values+fields', True, f'&fields={fields}'),
+                ):
+                    url = f"/api/{path}/?limit={options['limit']}{query}"
+                    results.append(self.measure(client, viewset, path, mode, lean, url, options['requests']))
+        finally:
+            if not options['keep']:
+                user.delete()
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump({"vendor": connection.vendor, "options": {k: options[k] for k in (
+                    'records', 'limit', 'requests', 'fields')}, "results": results}, f, indent=2)
+
+    def measure(self, client, viewset, path, mode, lean, url, requests):
+        viewset.lean_list = lean
+        counter = QueryCounter()
+        timings = []
+        try:
+            with connection.execute_wrapper(counter):
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    timings.append(time.perf_counter() - started)
+                    assert response.status_code == 200, response.content[:200]
+        finally:
+            viewset.lean_list = True
+
+        rows = len(response.data['results'])
+        elapsed = sum(timings)
+        result = {
+            "endpoint": path,
+            "mode": mode,
+            "requests_per_second": requests / elapsed,
+            "rows_per_second": rows * requests / elapsed,
+            "median_ms": statistics.median(timings) * 1000,
+            "queries": counter.count / requests,
+            "bytes": len(response.content),
+        }
+        self.stdout.write(
+            f"{path:12} {mode:18} {result['requests_per_second']:8.1f} req/s {result['rows_per_second']:10.0f} rows/s "
+            f"median {result['median_ms']:7.1f} ms, {result['queries']:.0f} queries, {result['bytes']} bytes"
+        )
+        return result
@@ -0,0 +1,86 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from app.helper.validation import CompiledValidator
+from app.helper.writer import IMPORT_MODULES
+from app.serializer import ContactSerializer, CreditNoteSerializer, ExpensesOrderSerializer, InvoiceSerializer, SalesOrderSerializer
+
+User = get_user_model()
+
+SERIALIZERS = {
+    'contacts': ContactSerializer,
+    'salesorders': SalesOrderSerializer,
+    'invoices': InvoiceSerializer,
+    'creditnotes': CreditNoteSerializer,
+    'expenses': ExpensesOrderSerializer,
+}
+
+
+def sample_value(field, i):
+    # Zoho-shaped JSON values: strings for dates and "+0530" datetimes.
+    if isinstance(field, models.BooleanField):
+        return i % 2 == 0
+    if isinstance(field, models.DecimalField):
+        return f"{i % 10 ** (field.max_digits - field.decimal_places)}.{i % 100:02d}"
+    if isinstance(field, models.IntegerField):
+        return i % 90
+    if isinstance(field, models.DateTimeField):
+        return "2024-06-14T18:31:33+0530"
+    if isinstance(field, models.DateField):
+        return "2024-06-14"
+    if isinstance(field, models.JSONField):
+        return []
+    if isinstance(field, models.URLField):
+        return "https://example.com"
+    if isinstance(field, models.EmailField):
+        return f"user{i}@example.com"
+    if isinstance(field, (models.CharField, models.TextField)):
+        return f"{field.name[:8]}-{i}"[:field.max_length or 255]
+    return None
+
+
+def sample_rows(model, count):
+    fields = [f for f in model._meta.concrete_fields if f.editable and not f.auto_created and not f.is_relation]
+    return [{f.name: sample_value(f, i) for f in fields} for i in range(count)]
+
+
+class Command(BaseCommand):
+    help = "Compare import validation throughput: per-row DRF serializers vs the compiled batch validator."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5000)
+        parser.add_argument('--module', choices=sorted(IMPORT_MODULES), action='append')
+
+    def handle(self, *args, **options):
+        modules = options['module'] or list(IMPORT_MODULES)
+        # The serializer path looks the owner up per row, so it needs a real
+        # user; everything is rolled back afterwards.
+        with transaction.atomic():
+            user = User.objects.create_user(email='bench-validation@example.com', password=None, username='bench')
+            for name in modules:
+                model = IMPORT_MODULES[name][0]
+                rows = sample_rows(model, options['rows'])
+                serializer_rate = self.time_serializer(SERIALIZERS[name], rows, user)
+                compiled_rate = self.time_compiled(model, rows)
+                self.stdout.write(
+                    f"{name:12} serializer {serializer_rate:10.0f} rows/s   compiled {compiled_rate:10.0f} rows/s   "
+                    f"x{compiled_rate / serializer_rate:.1f}"
+                )
+            transaction.set_rollback(True)
+
+    def time_serializer(self, serializer_class, rows, user):
+        started = time.perf_counter()
+        for row in rows:
+            serializer = serializer_class(data=dict(row, user=user.id))
+            if not serializer.is_valid():
+                raise AssertionError(serializer.errors)
+        return len(rows) / (time.perf_counter() - started)
+
+    def time_compiled(self, model, rows):
+        started = time.perf_counter()
+        clean, errors = CompiledValidator(model, exclude=('user',)).validate(rows)
+        if errors:
+            raise AssertionError(errors[:3])
+        return len(rows) / (time.perf_counter() - started)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from app.helper.fakezoho import FakeZohoServer
+
+
+class Command(BaseCommand):
+    help = "Serve a fake Zoho Books API locally; point ZOHO_API_URL and ZOHO_ACCOUNTS_URL at it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8010)
+        parser.add_argument('--records', type=int, default=1000, help="Records served per module.")
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response.")
+        parser.add_argument('--rate-limit-every', type=int, default=0, help="Answer every Nth request with a 429.")
+        parser.add_argument('--retry-after', type=int, default=1)
+
+    def handle(self, *args, **options):
+        server = FakeZohoServer(
+            ('127.0.0.1', options['port']), records=options['records'], latency=options['latency'],
+            rate_limit_every=options['rate_limit_every'], retry_after=options['retry_after'],
+        )
+        self.stdout.write(f"ZOHO_ACCOUNTS_URL={server.url}  ZOHO_API_URL={server.url}/books/v3")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
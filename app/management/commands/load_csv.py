@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from app.helper.loader import CsvLoader, entity_for_path
+from app.helper.writer import IMPORT_MODULES
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Bulk-load Zoho CSV exports (contacts.csv, invoices.csv, ...) for a user without calling the Zoho API."
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--user', required=True, help="Email of the user that will own the rows.")
+        parser.add_argument('--entity', choices=sorted(IMPORT_MODULES), help="Module held by the files; guessed from the file name by default.")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--no-native', action='store_true', help="Use batched inserts even on MySQL.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user with email {options['user']}")
+
+        for path in options['paths']:
+            try:
+                entity = options['entity'] or entity_for_path(path)
+            except ValueError as e:
+                raise CommandError(str(e))
+            loader = CsvLoader(entity, user, chunk_size=options['chunk_size'], native=not options['no_native'])
+            stats = loader.load(path)
+            self.stdout.write(
+                f"{path}: {stats['loaded']} {entity} loaded, {stats['failed']} failed "
+                f"in {stats['seconds']:.2f}s ({stats['rows_per_second']:.0f} rows/s)"
+            )
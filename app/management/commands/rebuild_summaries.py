@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.helper import summary, versions
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Recompute the precomputed summary totals from the ledger rows, for one user or all of them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username to rebuild; all users by default.")
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+        for user in users.iterator():
+            with transaction.atomic():
+                summary.rebuild(user)
+                # Clients holding an ETag of the old totals must refetch them.
+                for model in summary.SUMMARY_MODELS:
+                    versions.bump(user.id, model)
+            self.stdout.write(f"Rebuilt summary totals for {user.username}")
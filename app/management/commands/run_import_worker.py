@@ -0,0 +1,89 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.models import Q
+from django.utils import timezone
+
+from app.helper.handler import MyHandler
+from app.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = "Run queued Zoho import jobs. Start several processes (or --concurrency) to import tenants in parallel."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help="Jobs to run at the same time in this process.")
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty.")
+
+    def handle(self, *args, **options):
+        self.once = options['once']
+        self.poll_interval = getattr(settings, 'IMPORT_WORKER_POLL_INTERVAL', 5)
+        self.heartbeat_interval = getattr(settings, 'IMPORT_WORKER_HEARTBEAT_INTERVAL', 30)
+        threads = [threading.Thread(target=self.work, daemon=True) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            logging.info("Import worker stopped.")
+
+    def work(self):
+        while True:
+            close_old_connections()
+            job = self.claim_job()
+            if job is None:
+                if self.once:
+                    connection.close()
+                    return
+                time.sleep(self.poll_interval)
+                continue
+            self.run_job(job)
+
+    def claim_job(self):
+        # Claim by a conditional UPDATE so that concurrent workers never pick the
+        # same job, without relying on SELECT ... FOR UPDATE SKIP LOCKED support.
+        # Running jobs without a recent heartbeat lost their worker and are
+        # claimed again; the claim refreshes the heartbeat.
+        now = timezone.now()
+        cutoff = now - timedelta(seconds=getattr(settings, 'IMPORT_JOB_STALE_AFTER', 300))
+        stale = Q(heartbeat_time__lt=cutoff) | Q(heartbeat_time__isnull=True, started_time__lt=cutoff)
+        claimable = Q(status=ImportJob.QUEUED) | (Q(status=ImportJob.RUNNING) & stale)
+        for job_id in ImportJob.objects.filter(claimable).order_by('created_time').values_list('pk', flat=True)[:10]:
+            claimed = ImportJob.objects.filter(claimable, pk=job_id).update(
+                status=ImportJob.RUNNING, started_time=now, heartbeat_time=now
+            )
+            if claimed:
+                return ImportJob.objects.select_related('user').get(pk=job_id)
+        return None
+
+    def heartbeat(self, job, stop):
+        try:
+            while not stop.wait(self.heartbeat_interval):
+                ImportJob.objects.filter(pk=job.pk, status=ImportJob.RUNNING).update(heartbeat_time=timezone.now())
+        finally:
+            connection.close()
+
+    def run_job(self, job):
+        logging.info(f"Starting import job {job.id} for {job.user}")
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self.heartbeat, args=(job, stop), daemon=True)
+        heartbeat.start()
+        try:
+            successful = MyHandler(job).run()
+            job.status = ImportJob.COMPLETED if successful else ImportJob.FAILED
+            job.error = None if successful else "Some operations failed. Check progress for details."
+        except Exception as e:
+            logging.exception(f"Import job {job.id} failed")
+            job.status = ImportJob.FAILED
+            job.error = str(e)
+        finally:
+            stop.set()
+            heartbeat.join()
+        job.finished_time = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_time'])
+        logging.info(f"Import job {job.id} finished: {job.status}")
@@ -0,0 +1,487 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Users',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('username', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('phone', models.CharField(max_length=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_staff', models.BooleanField(default=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Address',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address_type', models.CharField(choices=[('billing', 'Billing'), ('shipping', 'Shipping')], max_length=10)),
+                ('attention', models.CharField(blank=True, max_length=255, null=True)),
+                ('address', models.CharField(max_length=255)),
+                ('street2', models.CharField(blank=True, max_length=255, null=True)),
+                ('city', models.CharField(max_length=100)),
+                ('state', models.CharField(max_length=100)),
+                ('zip', models.CharField(max_length=20)),
+                ('country', models.CharField(max_length=100)),
+                ('fax', models.CharField(blank=True, max_length=20, null=True)),
+                ('phone', models.CharField(blank=True, max_length=20, null=True)),
+                ('content_hash', models.CharField(blank=True, db_index=True, max_length=64, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Contact',
+            fields=[
+                ('contact_id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('contact_name', models.CharField(max_length=255)),
+                ('company_name', models.CharField(max_length=255)),
+                ('has_transaction', models.BooleanField(default=False)),
+                ('contact_type', models.CharField(max_length=50)),
+                ('customer_sub_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('credit_limit', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_taxable', models.BooleanField(default=False)),
+                ('tax_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_percentage', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('tax_authority_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_exemption_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_authority_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('tax_exemption_code', models.CharField(blank=True, max_length=255, null=True)),
+                ('place_of_contact', models.CharField(blank=True, max_length=50, null=True)),
+                ('gst_no', models.CharField(blank=True, max_length=50, null=True)),
+                ('tax_treatment', models.CharField(blank=True, max_length=50, null=True)),
+                ('tax_regime', models.CharField(blank=True, max_length=50, null=True)),
+                ('legal_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('is_tds_registered', models.BooleanField(default=False)),
+                ('vat_treatment', models.CharField(blank=True, max_length=50, null=True)),
+                ('gst_treatment', models.CharField(blank=True, max_length=50, null=True)),
+                ('is_linked_with_zohocrm', models.BooleanField(default=False)),
+                ('website', models.URLField(blank=True, null=True)),
+                ('owner_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('primary_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('payment_terms', models.IntegerField(blank=True, null=True)),
+                ('payment_terms_label', models.CharField(blank=True, max_length=50, null=True)),
+                ('currency_id', models.CharField(blank=True, max_length=20, null=True)),
+                ('currency_code', models.CharField(blank=True, max_length=10, null=True)),
+                ('currency_symbol', models.CharField(blank=True, max_length=5, null=True)),
+                ('opening_balance_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('exchange_rate', models.DecimalField(decimal_places=2, default=1.0, max_digits=10)),
+                ('outstanding_receivable_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('outstanding_receivable_amount_bcy', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unused_credits_receivable_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unused_credits_receivable_amount_bcy', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(max_length=50)),
+                ('facebook', models.CharField(blank=True, max_length=255, null=True)),
+                ('twitter', models.CharField(blank=True, max_length=255, null=True)),
+                ('payment_reminder_enabled', models.BooleanField(default=False)),
+                ('custom_fields', models.JSONField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('created_time', models.DateTimeField()),
+                ('last_modified_time', models.DateTimeField()),
+                ('billing_address', models.OneToOneField(blank=True, limit_choices_to={'address_type': 'billing'}, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='billing_contact', to='app.address')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ContactPerson',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contact_person_id', models.CharField(max_length=100)),
+                ('salutation', models.CharField(max_length=10)),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('phone', models.CharField(max_length=20)),
+                ('mobile', models.CharField(max_length=20)),
+                ('designation', models.CharField(max_length=100)),
+                ('department', models.CharField(max_length=100)),
+                ('skype', models.CharField(max_length=50)),
+                ('is_primary_contact', models.BooleanField(default=False)),
+                ('enable_portal', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomField',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('value', models.CharField(max_length=255)),
+                ('label', models.CharField(max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DefaultTemplates',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('invoice_template_id', models.CharField(max_length=100)),
+                ('estimate_template_id', models.CharField(max_length=100)),
+                ('creditnote_template_id', models.CharField(max_length=100)),
+                ('purchaseorder_template_id', models.CharField(max_length=100)),
+                ('salesorder_template_id', models.CharField(max_length=100)),
+                ('retainerinvoice_template_id', models.CharField(max_length=100)),
+                ('paymentthankyou_template_id', models.CharField(max_length=100)),
+                ('retainerinvoice_paymentthankyou_template_id', models.CharField(max_length=100)),
+                ('invoice_email_template_id', models.CharField(max_length=100)),
+                ('estimate_email_template_id', models.CharField(max_length=100)),
+                ('creditnote_email_template_id', models.CharField(max_length=100)),
+                ('purchaseorder_email_template_id', models.CharField(max_length=100)),
+                ('salesorder_email_template_id', models.CharField(max_length=100)),
+                ('retainerinvoice_email_template_id', models.CharField(max_length=100)),
+                ('paymentthankyou_email_template_id', models.CharField(max_length=100)),
+                ('retainerinvoice_paymentthankyou_email_template_id', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Invoice',
+            fields=[
+                ('invoice_id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('ach_payment_initiated', models.BooleanField(default=False)),
+                ('date', models.DateField(blank=True, null=True)),
+                ('invoice_number', models.CharField(max_length=100)),
+                ('is_pre_gst', models.BooleanField(default=False)),
+                ('place_of_supply', models.CharField(blank=True, max_length=50, null=True)),
+                ('gst_no', models.CharField(blank=True, max_length=15, null=True)),
+                ('gst_treatment', models.CharField(blank=True, max_length=50, null=True)),
+                ('cfdi_usage', models.CharField(blank=True, max_length=100, null=True)),
+                ('vat_treatment', models.CharField(blank=True, max_length=50, null=True)),
+                ('tax_treatment', models.CharField(blank=True, max_length=50, null=True)),
+                ('vat_reg_no', models.CharField(blank=True, max_length=50, null=True)),
+                ('customer_id', models.CharField(max_length=100)),
+                ('total', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('balance', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('customer_name', models.CharField(max_length=255)),
+                ('status', models.CharField(max_length=50)),
+                ('invoice_date', models.DateField(blank=True, null=True)),
+                ('due_date', models.DateField(blank=True, null=True)),
+                ('payment_terms', models.IntegerField(blank=True, null=True)),
+                ('payment_terms_label', models.CharField(blank=True, max_length=50, null=True)),
+                ('currency_id', models.CharField(blank=True, max_length=20, null=True)),
+                ('currency_code', models.CharField(max_length=10)),
+                ('exchange_rate', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('discount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_discount_before_tax', models.BooleanField(default=False)),
+                ('discount_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('is_inclusive_tax', models.BooleanField(default=False)),
+                ('recurring_invoice_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('custom_fields', models.JSONField(blank=True, null=True)),
+                ('invoice_items', models.JSONField(blank=True, null=True)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('last_modified_time', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_pre_gst', models.BooleanField(default=False)),
+                ('gst_no', models.CharField(blank=True, max_length=15, null=True)),
+                ('gst_treatment', models.CharField(blank=True, default='', max_length=50, null=True)),
+                ('place_of_supply', models.CharField(blank=True, max_length=50, null=True)),
+                ('crm_owner_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('crm_custom_reference_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('zcrm_potential_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('vat_treatment', models.CharField(blank=True, max_length=50, null=True)),
+                ('tax_treatment', models.CharField(blank=True, max_length=50, null=True)),
+                ('is_update_customer', models.BooleanField(default=False)),
+                ('salesorder_number', models.CharField(max_length=50, unique=True)),
+                ('reference_number', models.CharField(blank=True, max_length=50, null=True)),
+                ('customer_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('status', models.CharField(blank=True, max_length=50, null=True)),
+                ('invoice_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('template_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('date', models.DateField()),
+                ('shipment_date', models.DateField(blank=True, null=True)),
+                ('exchange_rate', models.DecimalField(decimal_places=4, default=1.0, max_digits=10)),
+                ('discount', models.CharField(blank=True, max_length=100, null=True)),
+                ('is_discount_before_tax', models.BooleanField(default=False)),
+                ('discount_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('salesperson_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('salesperson_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('merchant_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('merchant_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('estimate_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_authority_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_authority_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('tax_exemption_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_exemption_code', models.CharField(blank=True, max_length=255, null=True)),
+                ('avatax_exempt_no', models.CharField(blank=True, max_length=100, null=True)),
+                ('avatax_use_code', models.CharField(blank=True, max_length=100, null=True)),
+                ('is_inclusive_tax', models.BooleanField(default=False)),
+                ('shipping_charge', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('adjustment', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('adjustment_description', models.CharField(blank=True, max_length=255, null=True)),
+                ('delivery_method', models.CharField(blank=True, max_length=50, null=True)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('notes_default', models.TextField(blank=True, null=True)),
+                ('terms', models.TextField(blank=True, null=True)),
+                ('terms_default', models.TextField(blank=True, null=True)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('last_modified_time', models.DateTimeField(auto_now=True)),
+                ('billing_address', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_orders_billing', to='app.address')),
+                ('contact', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app.contact')),
+                ('shipping_address', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sales_orders_shipping', to='app.address')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ZohoToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.CharField(max_length=255)),
+                ('client_secret', models.CharField(max_length=255)),
+                ('refresh_token', models.CharField(max_length=255)),
+                ('access_token', models.CharField(blank=True, max_length=255, null=True)),
+                ('expires_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_time', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='zoho_token', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SubStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status_id', models.CharField(max_length=100)),
+                ('status_code', models.CharField(max_length=50)),
+                ('parent_status', models.CharField(max_length=50)),
+                ('description', models.TextField()),
+                ('display_name', models.CharField(max_length=100)),
+                ('label_name', models.CharField(max_length=50)),
+                ('color_code', models.CharField(max_length=7)),
+                ('sales_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sub_statuses', to='app.salesorder')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesOrderCustomField',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customfield_id', models.CharField(max_length=100)),
+                ('index', models.IntegerField()),
+                ('value', models.CharField(max_length=255)),
+                ('label', models.CharField(max_length=255)),
+                ('sales_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='custom_fields', to='app.salesorder')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesOrderContactPerson',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contact_person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.contactperson')),
+                ('sales_order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contact_persons', to='app.salesorder')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LineItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('line_item_id', models.CharField(max_length=100)),
+                ('sku', models.CharField(blank=True, max_length=100, null=True)),
+                ('bcy_rate', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('tax_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('tax_percentage', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('tax_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('tds_tax_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_treatment_code', models.CharField(blank=True, max_length=50, null=True)),
+                ('is_taxable', models.BooleanField(default=False)),
+                ('product_exemption_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('product_exemption_code', models.CharField(blank=True, max_length=100, null=True)),
+                ('avatax_use_code_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('avatax_use_code_desc', models.CharField(blank=True, max_length=255, null=True)),
+                ('avatax_tax_code_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('avatax_tax_code_desc', models.CharField(blank=True, max_length=255, null=True)),
+                ('item_total_inclusive_of_tax', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('product_type', models.CharField(max_length=50)),
+                ('hsn_or_sac', models.CharField(blank=True, max_length=50, null=True)),
+                ('sat_item_key_code', models.CharField(blank=True, max_length=50, null=True)),
+                ('unitkey_code', models.CharField(blank=True, max_length=50, null=True)),
+                ('is_invoiced', models.BooleanField(default=False)),
+                ('stock_on_hand', models.CharField(blank=True, max_length=100, null=True)),
+                ('image_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('image_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('image_type', models.CharField(blank=True, max_length=50, null=True)),
+                ('project_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('project_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('warehouse_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='app.invoice')),
+                ('sales_order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='app.salesorder')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Waiting for authorization'), ('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('state', models.CharField(max_length=64, unique=True)),
+                ('client_id', models.CharField(max_length=255)),
+                ('client_secret', models.CharField(max_length=255)),
+                ('organization_id', models.CharField(max_length=100)),
+                ('authorization_code', models.CharField(blank=True, max_length=255, null=True)),
+                ('full_resync', models.BooleanField(default=False)),
+                ('progress', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('started_time', models.DateTimeField(blank=True, null=True)),
+                ('finished_time', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Expense',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('expense_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('transaction_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('transaction_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('gst_no', models.CharField(blank=True, max_length=15, null=True)),
+                ('gst_treatment', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_treatment', models.CharField(blank=True, max_length=100, null=True)),
+                ('destination_of_supply', models.CharField(blank=True, max_length=100, null=True)),
+                ('destination_of_supply_state', models.CharField(blank=True, max_length=100, null=True)),
+                ('place_of_supply', models.CharField(blank=True, max_length=100, null=True)),
+                ('hsn_or_sac', models.CharField(blank=True, max_length=100, null=True)),
+                ('source_of_supply', models.CharField(blank=True, max_length=100, null=True)),
+                ('paid_through_account_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('vat_reg_no', models.CharField(blank=True, max_length=100, null=True)),
+                ('reverse_charge_tax_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('reverse_charge_tax_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('reverse_charge_tax_percentage', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('reverse_charge_tax_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('tax_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_itemized_expense', models.BooleanField(blank=True, null=True)),
+                ('is_pre_gst', models.BooleanField(blank=True, null=True)),
+                ('trip_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('trip_number', models.CharField(blank=True, max_length=100, null=True)),
+                ('reverse_charge_vat_total', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('acquisition_vat_total', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('expense_item_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('account_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('account_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('date', models.DateField(blank=True, null=True)),
+                ('tax_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('tax_percentage', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('currency_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('currency_code', models.CharField(blank=True, max_length=10, null=True)),
+                ('exchange_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('sub_total', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('total', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('bcy_total', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_inclusive_tax', models.BooleanField(blank=True, null=True)),
+                ('reference_number', models.CharField(blank=True, max_length=100, null=True)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('is_billable', models.BooleanField(blank=True, null=True)),
+                ('is_personal', models.BooleanField(blank=True, null=True)),
+                ('customer_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('customer_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('expense_receipt_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('expense_receipt_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('last_modified_time', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(blank=True, max_length=100, null=True)),
+                ('project_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('project_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('mileage_rate', models.CharField(blank=True, max_length=100, null=True)),
+                ('mileage_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('expense_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('start_reading', models.CharField(blank=True, max_length=100, null=True)),
+                ('end_reading', models.CharField(blank=True, max_length=100, null=True)),
+                ('invoice', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app.invoice')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CreditNote',
+            fields=[
+                ('creditnote_id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('is_discount_before_tax', models.BooleanField(blank=True, null=True)),
+                ('refund_mode', models.CharField(blank=True, max_length=255, null=True)),
+                ('place_of_supply', models.CharField(blank=True, max_length=255, null=True)),
+                ('gst_no', models.CharField(blank=True, max_length=255, null=True)),
+                ('gst_treatment', models.CharField(blank=True, max_length=255, null=True)),
+                ('vat_treatment', models.CharField(blank=True, max_length=255, null=True)),
+                ('vat_reg_no', models.CharField(blank=True, max_length=255, null=True)),
+                ('creditnote_number', models.CharField(max_length=255)),
+                ('reference_number', models.CharField(blank=True, max_length=255, null=True)),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=50)),
+                ('currency_id', models.CharField(max_length=50)),
+                ('currency_code', models.CharField(max_length=10)),
+                ('currency_symbol', models.CharField(blank=True, max_length=5, null=True)),
+                ('exchange_rate', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('discount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_viewed_by_client', models.BooleanField()),
+                ('customer_id', models.CharField(max_length=255)),
+                ('sub_total', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('total', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('total_in_words', models.CharField(blank=True, max_length=255, null=True)),
+                ('total_tax_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('refundable_amount', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('customer_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('custom_fields', models.JSONField(blank=True, null=True)),
+                ('attachments', models.JSONField(blank=True, null=True)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('terms', models.TextField(blank=True, null=True)),
+                ('created_time', models.DateTimeField()),
+                ('last_modified_time', models.DateTimeField()),
+                ('billing_address', models.OneToOneField(blank=True, limit_choices_to={'address_type': 'billing'}, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='creditnote_billing_address', to='app.address')),
+                ('contact', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app.contact')),
+                ('contact_persons', models.ManyToManyField(blank=True, related_name='creditnote_contact_persons', to='app.ContactPerson')),
+                ('invoice', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app.invoice')),
+                ('invoices', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='invoices', to='app.invoice')),
+                ('shipping_address', models.OneToOneField(blank=True, limit_choices_to={'address_type': 'shipping'}, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='creditnote_shipping_address', to='app.address')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='contact_persons',
+            field=models.ManyToManyField(blank=True, related_name='contact_persons', to='app.ContactPerson'),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='default_templates',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='default_templates', to='app.defaulttemplates'),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='shipping_address',
+            field=models.OneToOneField(blank=True, limit_choices_to={'address_type': 'shipping'}, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shipping_contact', to='app.address'),
+        ),
+        migrations.AddField(
+            model_name='contact',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('module', models.CharField(max_length=50)),
+                ('last_modified_time', models.DateTimeField(blank=True, null=True)),
+                ('last_synced_time', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'module')},
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:02
+
+from django.db import migrations, models
+
+# Kept in step with search_fields on the viewsets and SearchMatch in app/filters.py.
+SEARCH_INDEXES = {
+    'app_contact': ['contact_name', 'company_name'],
+    'app_invoice': ['invoice_number', 'customer_name'],
+    'app_salesorder': ['salesorder_number', 'reference_number', 'customer_name'],
+    'app_creditnote': ['creditnote_number', 'reference_number', 'customer_name'],
+    'app_expense': ['reference_number', 'customer_name'],
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    for table, columns in SEARCH_INDEXES.items():
+        name = quote(f"{table[4:]}_search_idx")
+        if connection.vendor == 'mysql':
+            schema_editor.execute(f"CREATE FULLTEXT INDEX {name} ON {quote(table)} ({', '.join(quote(c) for c in columns)})")
+        elif connection.vendor == 'postgresql':
+            document = " || ' ' || ".join(f"COALESCE({quote(c)}, '')" for c in columns)
+            schema_editor.execute(f"CREATE INDEX {name} ON {quote(table)} USING gin ((to_tsvector('simple', {document})))")
+
+
+def drop_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    for table in SEARCH_INDEXES:
+        name = quote(f"{table[4:]}_search_idx")
+        if connection.vendor == 'mysql':
+            schema_editor.execute(f"DROP INDEX {name} ON {quote(table)}")
+        elif connection.vendor == 'postgresql':
+            schema_editor.execute(f"DROP INDEX {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_tenant_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['user', 'currency_code'], name='contact_user_currency_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditnote',
+            index=models.Index(fields=['user', 'currency_code'], name='credit_user_currency_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='creditnote',
+            index=models.Index(fields=['user', 'total'], name='credit_user_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'currency_code'], name='expense_user_currency_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'total'], name='expense_user_total_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['user', 'currency_code'], name='invoice_user_currency_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['user', 'total'], name='invoice_user_total_idx'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
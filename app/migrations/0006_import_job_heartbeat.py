@@ -0,0 +1,18 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_summary_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='heartbeat_time',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:34
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_import_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='importjob',
+            name='client_secret',
+        ),
+    ]
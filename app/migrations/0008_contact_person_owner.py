@@ -0,0 +1,57 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:52
+
+from collections import defaultdict
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def person_links(apps):
+    # (link model, person column, owner path) for every way a person is linked to a record.
+    Contact = apps.get_model('app', 'Contact')
+    CreditNote = apps.get_model('app', 'CreditNote')
+    return [
+        (Contact._meta.get_field('contact_persons').remote_field.through, 'contactperson_id', 'contact__user_id'),
+        (CreditNote._meta.get_field('contact_persons').remote_field.through, 'contactperson_id', 'creditnote__user_id'),
+        (apps.get_model('app', 'SalesOrderContactPerson'), 'contact_person_id', 'sales_order__user_id'),
+    ]
+
+
+def assign_owners(apps, schema_editor):
+    # A person linked from one user's records becomes theirs; one that several
+    # users' imports shared is copied, so each user links to their own row.
+    ContactPerson = apps.get_model('app', 'ContactPerson')
+    links = person_links(apps)
+    owners = defaultdict(set)
+    for link, person, owner in links:
+        for person_id, user_id in link.objects.values_list(person, owner):
+            if user_id is not None:
+                owners[person_id].add(user_id)
+    fields = [field.attname for field in ContactPerson._meta.concrete_fields if not field.primary_key and field.name != 'user']
+    for person in ContactPerson.objects.filter(pk__in=list(owners)):
+        first, *others = sorted(owners[person.pk])
+        ContactPerson.objects.filter(pk=person.pk).update(user_id=first)
+        for user_id in others:
+            copy = ContactPerson.objects.create(user_id=user_id, **{name: getattr(person, name) for name in fields})
+            for link, column, owner in links:
+                link.objects.filter(**{column: person.pk, owner: user_id}).update(**{column: copy.pk})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_import_job_no_secret'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactperson',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='contactperson',
+            index=models.Index(fields=['user', 'contact_person_id'], name='person_user_person_id_idx'),
+        ),
+        migrations.RunPython(assign_owners, migrations.RunPython.noop),
+    ]
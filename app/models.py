@@ -19,7 +19,7 @@ class UserManager(BaseUserManager):
 
 
 class Users(AbstractBaseUser):
-    username = models.CharField(max_length=100)
+    username = models.CharField(max_length=100, db_index=True)
     email = models.EmailField(unique=True)
     phone = models.CharField(max_length=10)
     is_active = models.BooleanField(default=True)
@@ -51,12 +51,14 @@ class Address(models.Model):
     country = models.CharField(max_length=100)
     fax = models.CharField(max_length=20, null=True, blank=True)
     phone = models.CharField(max_length=20, null=True, blank=True)
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
 
     def __str__(self):
         return f"{self.address}, {self.city}, {self.state}, {self.country} ({self.get_address_type_display()})"
 
 
 class ContactPerson(models.Model):
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, null=True, blank=True)
     contact_person_id = models.CharField(max_length=100)
     salutation = models.CharField(max_length=10)
     first_name = models.CharField(max_length=100)
@@ -70,6 +72,11 @@ class ContactPerson(models.Model):
     is_primary_contact = models.BooleanField(default=False)
     enable_portal = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'contact_person_id'], name='person_user_person_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
@@ -155,6 +162,13 @@ class Contact(models.Model):
     created_time = models.DateTimeField()
     last_modified_time = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'last_modified_time'], name='contact_user_modified_idx'),
+            models.Index(fields=['user', 'status'], name='contact_user_status_idx'),
+            models.Index(fields=['user', 'currency_code'], name='contact_user_currency_idx'),
+        ]
+
     def __str__(self):
         return self.contact_name
 
@@ -195,6 +209,16 @@ class Invoice(models.Model):
     created_time = models.DateTimeField(auto_now_add=True)
     last_modified_time = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'last_modified_time'], name='invoice_user_modified_idx'),
+            models.Index(fields=['user', 'date'], name='invoice_user_date_idx'),
+            models.Index(fields=['user', 'status', 'date'], name='invoice_user_status_date_idx'),
+            models.Index(fields=['user', 'customer_id'], name='invoice_user_customer_idx'),
+            models.Index(fields=['user', 'currency_code'], name='invoice_user_currency_idx'),
+            models.Index(fields=['user', 'total'], name='invoice_user_total_idx'),
+        ]
+
     def __str__(self):
         return self.invoice_number
 
@@ -250,12 +274,20 @@ class SalesOrder(models.Model):
     created_time = models.DateTimeField(auto_now_add=True)
     last_modified_time = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'last_modified_time'], name='order_user_modified_idx'),
+            models.Index(fields=['user', 'date'], name='order_user_date_idx'),
+            models.Index(fields=['user', 'status', 'date'], name='order_user_status_date_idx'),
+        ]
+
     def __str__(self):
         return self.salesorder_number
 
 
 class LineItem(models.Model):
-    sales_order = models.ForeignKey(SalesOrder, related_name='line_items', on_delete=models.CASCADE)
+    sales_order = models.ForeignKey(SalesOrder, related_name='line_items', on_delete=models.CASCADE, blank=True, null=True)
+    invoice = models.ForeignKey(Invoice, related_name='line_items', on_delete=models.CASCADE, blank=True, null=True)
     line_item_id = models.CharField(max_length=100)
     sku = models.CharField(max_length=100, blank=True, null=True)
     bcy_rate = models.DecimalField(max_digits=10, decimal_places=2)
@@ -348,6 +380,16 @@ class CreditNote(models.Model):
     created_time = models.DateTimeField()
     last_modified_time = models.DateTimeField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'last_modified_time'], name='credit_user_modified_idx'),
+            models.Index(fields=['user', 'date'], name='credit_user_date_idx'),
+            models.Index(fields=['user', 'status', 'date'], name='credit_user_status_date_idx'),
+            models.Index(fields=['user', 'customer_id'], name='credit_user_customer_idx'),
+            models.Index(fields=['user', 'currency_code'], name='credit_user_currency_idx'),
+            models.Index(fields=['user', 'total'], name='credit_user_total_idx'),
+        ]
+
     def __str__(self):
         return self.creditnote_number
     
@@ -412,5 +454,111 @@ class Expense(models.Model):
 
     user = models.ForeignKey(Users, on_delete=models.CASCADE, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'last_modified_time'], name='expense_user_modified_idx'),
+            models.Index(fields=['user', 'date'], name='expense_user_date_idx'),
+            models.Index(fields=['user', 'status', 'date'], name='expense_user_status_date_idx'),
+            models.Index(fields=['user', 'customer_id'], name='expense_user_customer_idx'),
+            models.Index(fields=['user', 'currency_code'], name='expense_user_currency_idx'),
+            models.Index(fields=['user', 'total'], name='expense_user_total_idx'),
+        ]
+
+    def __str__(self):
+        return f"Expense {self.expense_id} by {self.customer_name}"
+
+class SyncState(models.Model):
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='sync_states')
+    module = models.CharField(max_length=50)
+    last_modified_time = models.DateTimeField(null=True, blank=True)
+    last_synced_time = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'module')
+
+    def __str__(self):
+        return f"{self.user} {self.module} @ {self.last_modified_time}"
+
+
+class DataVersion(models.Model):
+    # Bumped on every write to one user's rows of an entity; the version is
+    # what ETags and cached API responses are keyed on.
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='data_versions')
+    entity = models.CharField(max_length=50)
+    version = models.PositiveBigIntegerField(default=0)
+    modified_time = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'entity')
+
+    def __str__(self):
+        return f"{self.user} {self.entity} v{self.version}"
+
+
+class SummaryTotal(models.Model):
+    # One aggregate bucket of a user's ledger (see app.helper.summary), kept
+    # current by applying the delta of every write.
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='summary_totals')
+    metric = models.CharField(max_length=50)
+    key = models.CharField(max_length=100, blank=True, default='')
+    period = models.CharField(max_length=7, blank=True, default='')
+    count = models.BigIntegerField(default=0)
+    amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('user', 'metric', 'key', 'period')
+
+    def __str__(self):
+        return f"{self.user} {self.metric} {self.key} {self.period}"
+
+
+class SummaryState(models.Model):
+    # Present once a user's summary totals have been built from their rows.
+    user = models.OneToOneField(Users, on_delete=models.CASCADE, related_name='summary_state')
+    built_time = models.DateTimeField(auto_now=True)
+
+
+class ZohoToken(models.Model):
+    user = models.OneToOneField(Users, on_delete=models.CASCADE, related_name='zoho_token')
+    client_id = models.CharField(max_length=255)
+    client_secret = models.CharField(max_length=255)
+    refresh_token = models.CharField(max_length=255)
+    access_token = models.CharField(max_length=255, null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    updated_time = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Zoho token for {self.user}"
+
+class ImportJob(models.Model):
+    PENDING = 'pending'
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Waiting for authorization'),
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (COMPLETED, 'Completed'),
+        (FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='import_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+    state = models.CharField(max_length=64, unique=True)
+    client_id = models.CharField(max_length=255)
+    organization_id = models.CharField(max_length=100)
+    authorization_code = models.CharField(max_length=255, null=True, blank=True)
+    full_resync = models.BooleanField(default=False)
+    progress = models.JSONField(default=dict, blank=True)
+    error = models.TextField(null=True, blank=True)
+    created_time = models.DateTimeField(auto_now_add=True)
+    started_time = models.DateTimeField(null=True, blank=True)
+    # Touched by the worker while the job runs; a stale one means the worker died.
+    heartbeat_time = models.DateTimeField(null=True, blank=True)
+    finished_time = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
-        return f"Expense {self.expense_id} by {self.customer_name}"
\ No newline at end of file
+        return f"Import {self.pk} for {self.user} ({self.status})"
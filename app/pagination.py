@@ -0,0 +1,272 @@
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import connection, connections
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Newest first on (last_modified_time, pk), without OFFSET or COUNT(*).
+
+    The cursor holds the sort key of the last row served, so every page is an
+    index range scan from that point. Rows without a last_modified_time come
+    last.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    max_limit = 1000
+    ordering_field = 'last_modified_time'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        position, reverse = self.decode_cursor(request, queryset)
+
+        queryset = queryset.order_by(*self.ordering(queryset, reverse))
+        if position is not None:
+            queryset = queryset.filter(self.after(position, reverse))
+
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.position(rows[-1]) if rows and (has_more or reverse) else None
+        self.previous_position = self.position(rows[0]) if rows and (position is not None and (not reverse or has_more)) else None
+        return rows
+
+    def ordering(self, queryset, reverse):
+        field = self.ordering_field
+        if not connections[queryset.db].features.nulls_order_largest:
+            # MySQL and SQLite already sort NULL lowest; an explicit NULLS
+            # LAST would be emulated with an expression that skips the index.
+            return (field, 'pk') if reverse else (f'-{field}', '-pk')
+        if reverse:
+            return (F(field).asc(nulls_first=True), 'pk')
+        return (F(field).desc(nulls_last=True), '-pk')
+
+    def after(self, position, reverse):
+        # Rows strictly past `position` in the direction being read.
+        value, pk = position
+        field = self.ordering_field
+        if not reverse:
+            if value is None:
+                return Q(**{f'{field}__isnull': True, 'pk__lt': pk})
+            return Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}) | Q(**{f'{field}__isnull': True})
+        if value is None:
+            return Q(**{f'{field}__isnull': True, 'pk__gt': pk}) | Q(**{f'{field}__isnull': False})
+        return Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+
+    def position(self, row):
+        if isinstance(row, dict):
+            return row[self.ordering_field], row['pk']
+        return getattr(row, self.ordering_field), row.pk
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return max(1, min(limit, self.max_limit))
+
+    def encode_cursor(self, position, reverse):
+        value, pk = position
+        payload = {"v": value.isoformat() if value is not None else None, "p": pk}
+        if reverse:
+            payload["r"] = 1
+        data = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, data)
+
+    def decode_cursor(self, request, queryset):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            value = parse_datetime(payload["v"]) if payload["v"] is not None else None
+            if payload["v"] is not None and value is None:
+                raise ValueError
+            pk = queryset.model._meta.pk.to_python(payload["p"])
+            if pk is None:
+                raise ValueError
+            return (value, pk), bool(payload.get("r"))
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound("Invalid cursor")
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class CountFreePagination(LimitOffsetPagination):
+    """Limit/offset pages without SELECT COUNT(*).
+
+    One extra row is fetched to tell whether a next page exists. The
+    response has no count.
+    """
+    template = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        rows = rows[:self.limit]
+        self.count = self.get_count(queryset, request, rows)
+        return rows
+
+    def get_count(self, queryset, request, rows):
+        return None
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class CachedCountPagination(CountFreePagination):
+    """Count-free pages plus a cached row count per user and filter.
+
+    The count comes from the cache alias PAGINATION_COUNT_CACHE_ALIAS. A
+    missing or stale count (older than PAGINATION_COUNT_TTL seconds) is
+    recomputed in a background thread while the request is answered with
+    the old value, or with null. A page that reaches the end of the rows
+    knows the exact count and stores it. count_exact tells clients which
+    of the two they got.
+    """
+    ignored_params = {'limit', 'offset', 'cursor', 'pagination', 'format', 'fields', 'expand'}
+    background = True
+    lock = threading.Lock()
+    refreshing = set()
+
+    def get_count(self, queryset, request, rows):
+        cache = caches[getattr(settings, 'PAGINATION_COUNT_CACHE_ALIAS', 'default')]
+        key = self.cache_key(queryset, request)
+        self.count_exact = not self.has_next and bool(rows or self.offset == 0)
+        if self.count_exact:
+            count = self.offset + len(rows)
+            cache.set(key, (count, time.time()), None)
+            return count
+
+        cached = cache.get(key)
+        if cached is None or time.time() - cached[1] > getattr(settings, 'PAGINATION_COUNT_TTL', 300):
+            self.refresh(cache, key, queryset)
+            cached = cache.get(key, cached)
+        if cached is None:
+            return None
+        # Never less than the rows this page has already shown to exist.
+        return max(cached[0], self.offset + len(rows) + 1)
+
+    def cache_key(self, queryset, request):
+        filters = sorted(
+            (name, value) for name, values in request.query_params.lists()
+            if name not in self.ignored_params for value in values
+        )
+        content = json.dumps([request.user.id, queryset.model._meta.label, filters])
+        return f"page-count:{hashlib.sha256(content.encode()).hexdigest()}"
+
+    def refresh(self, cache, key, queryset):
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+        queryset = queryset.order_by()
+
+        def run():
+            try:
+                cache.set(key, (queryset.count(), time.time()), None)
+            except Exception as e:
+                logging.error(f"Counting rows for {key} failed: {str(e)}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+                if self.background:
+                    connection.close()
+
+        if self.background:
+            threading.Thread(target=run, daemon=True).start()
+        else:
+            run()
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'count_exact': self.count_exact,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {'type': 'integer', 'nullable': True}
+        response_schema['properties']['count_exact'] = {'type': 'boolean'}
+        return response_schema
+
+
+PAGINATION_MODES = {
+    'offset': LimitOffsetPagination,
+    'keyset': KeysetPagination,
+    'nocount': CountFreePagination,
+    'cached': CachedCountPagination,
+}
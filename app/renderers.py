@@ -0,0 +1,44 @@
+import json
+from rest_framework.renderers import BaseRenderer
+
+from .helper.export import XLSX_CONTENT_TYPE
+
+
+class ExportRenderer(BaseRenderer):
+    # Export actions stream their own response; these renderers only take part
+    # in ?format= / Accept negotiation and render error payloads as JSON.
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data).encode()
+
+
+class XlsxRenderer(ExportRenderer):
+    media_type = XLSX_CONTENT_TYPE
+    format = 'xlsx'
+
+
+class CsvRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NdjsonRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class ParquetRenderer(ExportRenderer):
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
+
+
+class ZipRenderer(ExportRenderer):
+    media_type = 'application/zip'
+    format = 'zip'
+
+
+EXPORT_RENDERERS = [XlsxRenderer, CsvRenderer, NdjsonRenderer, ParquetRenderer]
+LEDGER_RENDERERS = [XlsxRenderer, ZipRenderer]
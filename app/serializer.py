@@ -1,9 +1,21 @@
 from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Contact, CreditNote, SalesOrder, Invoice, Expense
+from .models import (
+    Address, Contact, ContactPerson, CreditNote, DefaultTemplates, Expense, ImportJob, Invoice, LineItem,
+    SalesOrder, SalesOrderContactPerson, SalesOrderCustomField, SubStatus
+)
 
 User = get_user_model()
 
+def tenant_owned(model):
+    # Models whose rows belong to one user; another tenant's row must never be expanded.
+    try:
+        return model._meta.get_field('user').related_model is User
+    except FieldDoesNotExist:
+        return False
+
 class UserRegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -13,23 +25,249 @@ class UserRegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         return User.objects.create_user(**validated_data)
 
-class BaseSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    # Keeps only the fields named in context['fields'] (the ?fields= parameter).
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if not fields:
+            return
+        unknown = [name for name in fields if name not in self.fields]
+        if unknown:
+            raise serializers.ValidationError({'fields': [f"Unknown field: {name}" for name in unknown]})
+        for name in set(self.fields) - set(fields):
+            self.fields.pop(name)
+
+class ExpandMixin:
+    """Replaces relations listed in Meta.expandable with nested serializers.
+
+    The root serializer reads context['expand'] (the ?expand= parameter);
+    dotted paths such as contact.contact_persons are handed on to the nested
+    serializer, which validates them against its own Meta.expandable.
+    """
+    def __init__(self, *args, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if expand is None:
+            expand = self.context.get('expand') or []
+        expandable = getattr(self.Meta, 'expandable', {})
+        nested = {}
+        for path in expand:
+            name, _, rest = path.partition('.')
+            nested.setdefault(name, [])
+            if rest:
+                nested[name].append(rest)
+        unknown = [name for name in nested if name not in expandable]
+        if unknown:
+            raise serializers.ValidationError({'expand': [f"Cannot expand: {name}" for name in unknown]})
+        for name, rest in nested.items():
+            relation = self.Meta.model._meta.get_field(name)
+            many = relation.many_to_many or relation.one_to_many
+            self.fields[name] = expandable[name](many=many, read_only=True, expand=rest)
+
+    def get_attribute(self, instance):
+        # A foreign key may point at another tenant's row (related_lookups
+        # filters only what is prefetched); render it as null.
+        related = super().get_attribute(instance)
+        request = self.context.get('request')
+        if related is not None and request is not None and tenant_owned(type(related)) \
+                and related.user_id != request.user.id:
+            return None
+        return related
+
+class NestedSerializer(ExpandMixin, serializers.ModelSerializer):
+    pass
+
+class AddressSerializer(NestedSerializer):
+    class Meta:
+        model = Address
+        fields = "__all__"
+
+class ContactPersonSerializer(NestedSerializer):
+    class Meta:
+        model = ContactPerson
+        fields = "__all__"
+
+class DefaultTemplatesSerializer(NestedSerializer):
+    class Meta:
+        model = DefaultTemplates
+        fields = "__all__"
+
+class LineItemSerializer(NestedSerializer):
+    class Meta:
+        model = LineItem
+        fields = "__all__"
+
+class SubStatusSerializer(NestedSerializer):
+    class Meta:
+        model = SubStatus
+        fields = "__all__"
+
+class SalesOrderCustomFieldSerializer(NestedSerializer):
+    class Meta:
+        model = SalesOrderCustomField
+        fields = "__all__"
+
+class SalesOrderContactPersonSerializer(NestedSerializer):
+    class Meta:
+        model = SalesOrderContactPerson
+        fields = "__all__"
+        expandable = {'contact_person': ContactPersonSerializer}
+
+class BaseSerializer(SparseFieldsMixin, ExpandMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
 
+    def get_fields(self):
+        # Writes may only reference the requester's own contacts, invoices etc.
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None:
+            return fields
+        for field in fields.values():
+            relation = getattr(field, 'child_relation', field)
+            if isinstance(relation, serializers.PrimaryKeyRelatedField) and relation.queryset is not None \
+                    and tenant_owned(relation.queryset.model):
+                relation.queryset = relation.queryset.filter(user=request.user)
+        return fields
+
+def related_lookups(serializer, prefix='', prefetching=False, user=None):
+    """select_related() and prefetch_related() lookups for every relation `serializer` reads.
+
+    Forward foreign keys rendered as primary keys are read from their _id
+    column and need nothing. Everything under a many-valued relation is
+    prefetched, which keeps a page at a fixed number of queries. Given a
+    user, prefetched tenant-owned rows are limited to that user's.
+    """
+    select, prefetch = [], []
+    model = serializer.Meta.model
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        try:
+            relation = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            continue
+        if not relation.is_relation:
+            continue
+        lookup = f"{prefix}{field.source}"
+        many = prefetching or relation.many_to_many or relation.one_to_many
+        prefetched = lookup
+        if user is not None and tenant_owned(relation.related_model):
+            prefetched = Prefetch(lookup, queryset=relation.related_model.objects.filter(user=user))
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.append(prefetched)
+            nested = related_lookups(field.child, f"{lookup}__", True, user)
+        elif isinstance(field, serializers.BaseSerializer):
+            if many:
+                prefetch.append(prefetched)
+            else:
+                select.append(lookup)
+            nested = related_lookups(field, f"{lookup}__", many, user)
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch.append(lookup)
+            continue
+        else:
+            continue
+        select += nested[0]
+        prefetch += nested[1]
+    return select, prefetch
+
+# Field types whose to_representation() returns what values() already holds.
+PLAIN_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+class ValuesReader:
+    """Renders queryset.values() rows the way `serializer` would render instances.
+
+    List pages skip model instances and DRF's per-field get_attribute() walk:
+    only the serializer's columns are selected, plain columns are copied as
+    they are, and Decimal/date/datetime columns go through the serializer
+    field's own to_representation(), so the output is unchanged. Many-to-many
+    primary keys are read with one query per page.
+    Raises ValueError for serializers with fields that are not plain columns.
+    """
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        self.fields = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            try:
+                model_field = self.model._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                raise ValueError(f"{name} is not a model column")
+            if isinstance(field, serializers.ManyRelatedField):
+                if not model_field.many_to_many or model_field.auto_created or field.child_relation.pk_field:
+                    raise ValueError(f"{name} is not a many-to-many primary key list")
+                self.fields.append((name, model_field, None))
+            elif isinstance(field, serializers.PrimaryKeyRelatedField):
+                if not model_field.concrete or field.pk_field:
+                    raise ValueError(f"{name} is not a foreign key column")
+                self.fields.append((name, field.source, None))
+            elif not model_field.concrete or model_field.is_relation:
+                raise ValueError(f"{name} is not a model column")
+            elif isinstance(field, PLAIN_FIELDS) or (isinstance(field, serializers.JSONField) and not field.binary):
+                self.fields.append((name, field.source, None))
+            else:
+                self.fields.append((name, field.source, field.to_representation))
+
+    @property
+    def columns(self):
+        return ['pk'] + [column for _, column, _ in self.fields if isinstance(column, str)]
+
+    def many(self, model_field, pks):
+        through = model_field.remote_field.through
+        source, target = model_field.m2m_field_name(), model_field.m2m_reverse_field_name()
+        related = {pk: [] for pk in pks}
+        for pk, target_pk in through.objects.filter(**{f'{source}__in': pks}).order_by('pk').values_list(source, target):
+            related[pk].append(target_pk)
+        return related
+
+    def represent(self, rows):
+        pks = [row['pk'] for row in rows]
+        many = {name: self.many(column, pks) for name, column, _ in self.fields if not isinstance(column, str)}
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert in self.fields:
+                if name in many:
+                    item[name] = many[name][row['pk']]
+                    continue
+                value = row[column]
+                item[name] = value if value is None or convert is None else convert(value)
+            data.append(item)
+        return data
+
 class ContactSerializer(BaseSerializer):
     class Meta:
         model = Contact
         fields = "__all__"
+        expandable = {
+            'billing_address': AddressSerializer,
+            'shipping_address': AddressSerializer,
+            'contact_persons': ContactPersonSerializer,
+            'default_templates': DefaultTemplatesSerializer,
+        }
 
 class SalesOrderSerializer(BaseSerializer):
     class Meta:
         model = SalesOrder
         fields = "__all__"
+        expandable = {
+            'contact': ContactSerializer,
+            'billing_address': AddressSerializer,
+            'shipping_address': AddressSerializer,
+            'line_items': LineItemSerializer,
+            'sub_statuses': SubStatusSerializer,
+            'custom_fields': SalesOrderCustomFieldSerializer,
+            'contact_persons': SalesOrderContactPersonSerializer,
+        }
 
 class InvoiceSerializer(BaseSerializer):
     class Meta:
         model = Invoice
         fields = "__all__"
+        expandable = {
+            'line_items': LineItemSerializer,
+        }
 
 class ExpensesOrderSerializer(BaseSerializer):
     class Meta:
@@ -40,3 +278,15 @@ class CreditNoteSerializer(BaseSerializer):
     class Meta:
         model = CreditNote
         fields = "__all__"
+        expandable = {
+            'contact': ContactSerializer,
+            'invoice': InvoiceSerializer,
+            'billing_address': AddressSerializer,
+            'shipping_address': AddressSerializer,
+            'contact_persons': ContactPersonSerializer,
+        }
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'status', 'full_resync', 'progress', 'error', 'created_time', 'started_time', 'finished_time']
@@ -1,3 +1,1321 @@
-from django.test import TestCase
+import base64
+import csv
+import datetime
+import io
+import json
+import os
+import re
+import requests
+import secrets
+import tempfile
+import time
+import unittest
+import zipfile
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+from xml.etree import ElementTree
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, models, transaction
+from django.http import FileResponse
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
 
-# Create your tests here.
+from .checks import check_export_schemas
+from .filters import FullTextSearchFilter
+from .helper import summary
+from .helper.export import ExportColumn, ExportSchema, in_parallel, pyarrow
+from .helper.exportcache import export_cache
+from .helper.fakezoho import BASE_TIME, FakeZohoServer
+from .helper.handler import MyHandler
+from .helper.loader import CsvLoader
+from .helper.principals import principal_cache
+from .helper.tokens import token_store
+from .helper.validation import CompiledValidator
+from .helper.writer import IMPORT_MODULES, BulkWriter
+from .helper.zoho import AdaptiveLimiter, ZohoClient, parse_retry_after
+from .management.commands.bench_validation import SERIALIZERS, sample_rows
+from .management.commands.run_import_worker import Command as ImportWorker
+from .models import (
+    Address, Contact, ContactPerson, CreditNote, DataVersion, DefaultTemplates, Expense, ImportJob, Invoice, LineItem,
+    SalesOrder, SalesOrderContactPerson, SalesOrderCustomField, SubStatus, SummaryTotal, SyncState, Users, ZohoToken
+)
+from .pagination import CachedCountPagination
+from .views import ContactsView, CreditNoteView, ExpensesView, InvoiceView, LedgerExportView, SalesOrderView
+
+USERS = 20
+ROWS_PER_USER = 40
+STATUSES = ['draft', 'open', 'paid', 'void']
+SPREADSHEET = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+
+def seed_rows(user, index):
+    # Enough tenants that a user_id filter is selective, as it is in production.
+    base = timezone.make_aware(datetime.datetime(2024, 1, 1))
+    rows = {Contact: [], Invoice: [], SalesOrder: [], CreditNote: [], Expense: []}
+    for i in range(ROWS_PER_USER):
+        key = f"{index}-{i}"
+        status = STATUSES[i % len(STATUSES)]
+        date = datetime.date(2024, 1, 1) + datetime.timedelta(days=i)
+        modified = base + datetime.timedelta(hours=i)
+        rows[Contact].append(Contact(
+            user=user, contact_id=f"c{key}", contact_name=f"Contact {key}", company_name="Acme", contact_type="customer",
+            outstanding_receivable_amount=0, outstanding_receivable_amount_bcy=0, unused_credits_receivable_amount=0,
+            unused_credits_receivable_amount_bcy=0, status=status, created_time=modified, last_modified_time=modified,
+        ))
+        rows[Invoice].append(Invoice(
+            user=user, invoice_id=f"i{key}", invoice_number=f"INV-{key}", customer_id=f"c{key}", customer_name="Acme",
+            status=status, date=date, currency_code="INR", exchange_rate=1,
+        ))
+        rows[SalesOrder].append(SalesOrder(user=user, salesorder_number=f"SO-{key}", status=status, date=date))
+        rows[CreditNote].append(CreditNote(
+            user=user, creditnote_id=f"n{key}", creditnote_number=f"CN-{key}", date=date, status=status,
+            currency_id="1", currency_code="INR", exchange_rate=1, is_viewed_by_client=False, customer_id=f"c{key}",
+            total=1, balance=1, created_time=modified, last_modified_time=modified,
+        ))
+        rows[Expense].append(Expense(
+            user=user, date=date, status=status, customer_id=f"c{key}", last_modified_time=modified,
+        ))
+    for model, objs in rows.items():
+        model.objects.bulk_create(objs)
+
+
+def zoho_records(name, indexes):
+    # Records shaped like the Zoho list APIs, built from the fake server's templates.
+    server = FakeZohoServer()
+    server.server_close()
+    return [server.record(name, index) for index in indexes]
+
+
+def xlsx_sheets(archive):
+    workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+    return [sheet.get('name') for sheet in workbook.iter(f'{SPREADSHEET}sheet')]
+
+
+def xlsx_rows(archive, index):
+    # Cell text per row; the writer leaves out empty cells.
+    sheet = ElementTree.fromstring(archive.read(f'xl/worksheets/sheet{index}.xml'))
+    return [[''.join(cell.itertext()) for cell in row.iter(f'{SPREADSHEET}c')] for row in sheet.iter(f'{SPREADSHEET}row')]
+
+
+@override_settings(ZOHO_PAGE_SIZE=200)
+class ZohoClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeZohoServer(records=450).start()
+        self.addCleanup(self.server.stop)
+        self.client = ZohoClient("token", "org")
+        self.addCleanup(self.client.close)
+
+    def test_pages_until_has_more_page_is_false(self):
+        pages = list(self.client.iter_pages(f"{self.server.url}/books/v3/contacts", 'contacts'))
+        self.assertEqual([len(page) for page in pages], [200, 200, 50])
+        self.assertEqual(self.server.requests, 3)
+        records = list(self.client.iter_records(f"{self.server.url}/books/v3/contacts", 'contacts'))
+        self.assertEqual(len({record['contact_id'] for record in records}), 450)
+
+    def test_retries_rate_limited_requests(self):
+        self.server.rate_limit_every, self.server.retry_after = 2, 0
+        pages = list(self.client.iter_pages(f"{self.server.url}/books/v3/invoices", 'invoices'))
+        self.assertEqual(sum(len(page) for page in pages), 450)
+        self.assertGreater(self.server.throttled, 0)
+
+    @override_settings(ZOHO_MAX_RETRIES=1)
+    def test_gives_up_after_max_retries(self):
+        self.server.rate_limit_every, self.server.retry_after = 1, 0
+        client = ZohoClient("token", "org")
+        self.addCleanup(client.close)
+        with self.assertRaises(requests.HTTPError):
+            list(client.iter_pages(f"{self.server.url}/books/v3/invoices", 'invoices'))
+        self.assertEqual(self.server.requests, 2)
+
+
+class AdaptiveLimiterTests(SimpleTestCase):
+    def test_halves_on_rate_limit_and_recovers(self):
+        limiter = AdaptiveLimiter(4)
+        limiter.acquire()
+        limiter.acquire()
+        limiter.release(retry_after=0.2)
+        self.assertEqual((limiter.limit, limiter.active), (2, 1))
+        started = time.monotonic()
+        limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        limiter.release()
+        limiter.release()
+        self.assertEqual((limiter.limit, limiter.active), (4, 0))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("3", 1), 3.0)
+        self.assertEqual(parse_retry_after(None, 1), 1)
+        self.assertEqual(parse_retry_after("soon", 1), 1)
+        self.assertAlmostEqual(parse_retry_after(http_date(time.time() + 30), 1), 30, delta=2)
+        self.assertEqual(parse_retry_after(http_date(time.time() - 30), 1), 0)
+
+
+class BulkWriterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="import@example.com", username="import")
+        cls.other = Users.objects.create_user(email="tenant@example.com", username="tenant")
+
+    def test_upsert(self):
+        BulkWriter('contacts', self.user).write(zoho_records('contacts', range(5)))
+        records = zoho_records('contacts', range(3, 8))
+        records[0]['company_name'] = "Renamed"
+        report = BulkWriter('contacts', self.user).write(records)
+        self.assertEqual((report['written'], report['failed']), (5, 0))
+        self.assertEqual(Contact.objects.filter(user=self.user).count(), 8)
+        self.assertEqual(Contact.objects.get(pk=records[0]['contact_id']).company_name, "Renamed")
+
+    def test_duplicates_in_a_chunk(self):
+        records = zoho_records('salesorders', [1, 1, 2])
+        records[1]['status'] = 'void'
+        BulkWriter('salesorders', self.user).write(records)
+        self.assertEqual(SalesOrder.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(SalesOrder.objects.get(salesorder_number=records[1]['salesorder_number']).status, 'void')
+
+    def test_keys_of_another_tenant(self):
+        for name, model in (('contacts', Contact), ('salesorders', SalesOrder)):
+            BulkWriter(name, self.other).write(zoho_records(name, range(3)))
+            writer = BulkWriter(name, self.user)
+            report = writer.write(zoho_records(name, range(5)))
+            self.assertEqual((report['written'], report['failed'], len(writer.errors)), (2, 3, 3))
+            self.assertEqual(model.objects.filter(user=self.other).count(), 3)
+            self.assertEqual(model.objects.filter(user=self.user).count(), 2)
+
+
+@override_settings(ZOHO_PAGE_SIZE=10)
+class IncrementalSyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="sync@example.com", username="sync")
+
+    def setUp(self):
+        self.server = FakeZohoServer(records=30).start()
+        self.addCleanup(self.server.stop)
+        self.zoho = ZohoClient("token", "org")
+        self.addCleanup(self.zoho.close)
+
+    def sync(self, full_resync=False):
+        job = ImportJob.objects.create(
+            user=self.user, status=ImportJob.RUNNING, state=secrets.token_urlsafe(16), client_id="client",
+            organization_id="org", full_resync=full_resync,
+        )
+        handler = MyHandler(job)
+        handler.fetch_and_save_data(self.zoho, f"{self.server.url}/books/v3/contacts", 'contacts')
+        return handler.progress.modules['contacts']
+
+    def watermark(self):
+        return SyncState.objects.get(user=self.user, module='contacts').last_modified_time
+
+    def test_watermark_advances(self):
+        self.assertEqual(self.sync()['rows_written'], 30)
+        self.assertEqual(self.watermark(), BASE_TIME + datetime.timedelta(seconds=29))
+        self.server.records = 35
+        # The watermark itself is inclusive, so the newest stored record comes back once.
+        self.assertEqual(self.sync()['rows_written'], 6)
+        self.assertEqual(self.watermark(), BASE_TIME + datetime.timedelta(seconds=34))
+
+    def test_full_resync(self):
+        self.sync()
+        self.assertEqual(self.sync(full_resync=True)['rows_written'], 30)
+        self.assertEqual(self.watermark(), BASE_TIME + datetime.timedelta(seconds=29))
+
+    def test_failed_record_holds_the_watermark_back(self):
+        other = Users.objects.create_user(email="owner@example.com", username="owner")
+        BulkWriter('contacts', other).write(zoho_records('contacts', [10]))
+        progress = self.sync()
+        self.assertEqual((progress['rows_written'], progress['rows_failed'], progress['status']), (29, 1, 'failed'))
+        self.assertEqual(self.watermark(), BASE_TIME + datetime.timedelta(seconds=9))
+        progress = self.sync()
+        self.assertEqual((progress['rows_written'], progress['rows_failed']), (20, 1))
+        self.assertEqual(self.watermark(), BASE_TIME + datetime.timedelta(seconds=9))
+
+
+class ImportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="jobs@example.com", username="jobs")
+        cls.other = Users.objects.create_user(email="victim@example.com", username="victim")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def job(self, status, **values):
+        return ImportJob.objects.create(user=self.user, status=status, state=secrets.token_urlsafe(16), **values)
+
+    def test_import_is_queued_for_the_caller(self):
+        response = self.client.post("/api/import/", {"client_id": "client", "serect_code": "secret", "user": "victim"})
+        self.assertEqual(response.status_code, 202)
+        job = ImportJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual((job.user, job.status), (self.user, ImportJob.PENDING))
+        self.assertIn(f"state={job.state}", response.data['auth_url'])
+        self.assertEqual(self.client.get(f"/api/import/{job.pk}/").data['status'], ImportJob.PENDING)
+
+        ZohoToken.objects.create(user=self.other, client_id="client", client_secret="secret", refresh_token="refresh")
+        response = self.client.post("/api/import/", {"client_id": "client", "serect_code": "secret", "user": "victim", "full_resync": "true"})
+        self.assertEqual(ImportJob.objects.get(pk=response.data['job_id']).user, self.user)
+        self.assertIn('auth_url', response.data)
+
+    def test_client_secret_stays_on_the_token(self):
+        response = self.client.post("/api/import/", {"client_id": "client", "serect_code": "secret"})
+        job = ImportJob.objects.get(pk=response.data['job_id'])
+        self.assertFalse(hasattr(job, 'client_secret'))
+        self.assertEqual(ZohoToken.objects.get(user=self.user).client_secret, "secret")
+        # Without a refresh token yet, a repeat request still needs the browser round trip.
+        self.assertIn('auth_url', self.client.post("/api/import/", {"client_id": "client", "serect_code": "secret"}).data)
+
+    def test_credentials_are_required_without_a_stored_token(self):
+        for data in ({}, {"client_id": "client"}, {"serect_code": "secret"}):
+            with self.subTest(data=data):
+                response = self.client.post("/api/import/", data)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(set(response.data), {"client_id", "serect_code"} - set(data))
+        self.assertFalse(ZohoToken.objects.filter(user=self.user).exists())
+        self.assertFalse(ImportJob.objects.filter(user=self.user).exists())
+
+    def test_callback_queues_the_job(self):
+        job = self.job(ImportJob.PENDING)
+        client = APIClient()
+        self.assertEqual(client.get("/api/import/callback/", {"code": "abc", "state": "unknown"}).status_code, 400)
+        self.assertEqual(client.get("/api/import/callback/", {"code": "abc", "state": job.state}).status_code, 200)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.authorization_code), (ImportJob.QUEUED, "abc"))
+        # A state can be used once.
+        self.assertEqual(client.get("/api/import/callback/", {"code": "abc", "state": job.state}).status_code, 400)
+
+    def test_claim(self):
+        first, second = self.job(ImportJob.QUEUED), self.job(ImportJob.QUEUED)
+        self.job(ImportJob.PENDING)
+        worker = ImportWorker()
+        self.assertEqual(worker.claim_job(), first)
+        self.assertEqual(worker.claim_job(), second)
+        self.assertIsNone(worker.claim_job())
+        first.refresh_from_db()
+        self.assertEqual(first.status, ImportJob.RUNNING)
+        self.assertIsNotNone(first.heartbeat_time)
+
+    @override_settings(IMPORT_JOB_STALE_AFTER=60)
+    def test_stale_running_job_is_reclaimed(self):
+        long_ago = timezone.now() - datetime.timedelta(minutes=5)
+        self.job(ImportJob.RUNNING, started_time=long_ago, heartbeat_time=timezone.now())
+        stale = self.job(ImportJob.RUNNING, started_time=long_ago, heartbeat_time=long_ago)
+        orphan = self.job(ImportJob.RUNNING, started_time=long_ago)
+        worker = ImportWorker()
+        self.assertEqual([worker.claim_job(), worker.claim_job(), worker.claim_job()], [stale, orphan, None])
+
+
+class TokenStoreTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="tokens@example.com", username="tokens")
+
+    def setUp(self):
+        self.server = FakeZohoServer().start()
+        self.addCleanup(self.server.stop)
+        accounts = override_settings(ZOHO_ACCOUNTS_URL=self.server.url)
+        accounts.enable()
+        self.addCleanup(accounts.disable)
+        token_store.cache.pop(self.user.id, None)
+        self.addCleanup(token_store.cache.pop, self.user.id, None)
+        ZohoToken.objects.create(user=self.user, client_id="client", client_secret="secret")
+
+    def expire_in(self, seconds):
+        ZohoToken.objects.filter(user=self.user).update(
+            access_token="old-token", refresh_token="refresh", expires_at=timezone.now() + datetime.timedelta(seconds=seconds))
+
+    def test_exchange_code(self):
+        self.assertEqual(token_store.exchange_code(self.user, "code"), "fake-access-token")
+        token = ZohoToken.objects.get(user=self.user)
+        self.assertEqual(token.refresh_token, "fake-refresh-token")
+        self.assertGreater(token.expires_at, timezone.now() + datetime.timedelta(minutes=50))
+
+    def test_valid_token_is_reused(self):
+        self.expire_in(3600)
+        self.assertEqual(token_store.get_access_token(self.user), "old-token")
+        with self.assertNumQueries(0):
+            self.assertEqual(token_store.get_access_token(self.user), "old-token")
+        self.assertEqual(self.server.requests, 0)
+
+    def test_expired_token_is_refreshed(self):
+        self.expire_in(-1)
+        self.assertEqual(token_store.get_access_token(self.user), "fake-access-token")
+        self.assertEqual(self.server.requests, 1)
+        self.assertEqual(ZohoToken.objects.get(user=self.user).access_token, "fake-access-token")
+        self.assertEqual(token_store.get_access_token(self.user), "fake-access-token")
+        self.assertEqual(self.server.requests, 1)
+
+    def test_expiring_token_is_refreshed_in_background(self):
+        self.expire_in(60)
+        with mock.patch.object(token_store, 'refresh_in_background') as refresh:
+            self.assertEqual(token_store.get_access_token(self.user), "old-token")
+        refresh.assert_called_once_with(self.user)
+
+
+class CsvLoaderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="csv@example.com", username="csv")
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def read(self, name):
+        with open(settings.BASE_DIR / name, newline='', encoding='utf-8-sig') as f:
+            return list(csv.reader(f))
+
+    def load(self, entity, rows, user=None):
+        path = os.path.join(self.directory, f"{entity}.csv")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+        return CsvLoader(entity, user or self.user).load(path)
+
+    def test_coercion(self):
+        header, *rows = self.read('contacts.csv')
+        column = header.index
+        rows[0][column('payment_terms')] = '30.0'
+        rows[0][column('is_linked_with_zohocrm')] = 'True'
+        rows[1][column('created_time')] = 'yesterday'
+        rows[2] = rows[2][:5]
+        stats = self.load('contacts', [header] + rows)
+        self.assertEqual((stats['loaded'], stats['failed']), (1, 2))
+        contact = Contact.objects.get(pk=rows[0][column('id')])
+        self.assertEqual((contact.user, contact.payment_terms, contact.is_linked_with_zohocrm), (self.user, 30, True))
+        self.assertEqual(contact.outstanding_receivable_amount, Decimal('0'))
+        self.assertIsNone(contact.website)
+        self.assertEqual(contact.created_time, datetime.datetime(2024, 6, 14, 13, 1, 33, tzinfo=datetime.timezone.utc))
+
+    def test_reload_and_references(self):
+        self.assertEqual(self.load('salesorders', self.read('sales_orders.csv'))['loaded'], 1)
+        self.assertIsNone(SalesOrder.objects.get(salesorder_number="SO-00001").contact_id)
+        self.assertEqual(self.load('contacts', self.read('contacts.csv'))['loaded'], 3)
+        self.assertEqual(self.load('contacts', self.read('contacts.csv'))['loaded'], 3)
+        self.assertEqual(Contact.objects.filter(user=self.user).count(), 3)
+        self.load('salesorders', self.read('sales_orders.csv'))
+        self.assertEqual(SalesOrder.objects.get(salesorder_number="SO-00001").contact_id, "1877419000000034003")
+
+    def test_references_stay_within_the_tenant(self):
+        other = Users.objects.create_user(email="csv-owner@example.com", username="csv-owner")
+        self.load('contacts', self.read('contacts.csv'), user=other)
+        self.assertEqual(self.load('salesorders', self.read('sales_orders.csv'))['loaded'], 1)
+        self.assertIsNone(SalesOrder.objects.get(salesorder_number="SO-00001").contact_id)
+
+    def test_cells_the_columns_cannot_hold(self):
+        header, *rows = self.read('contacts.csv')
+        rows[0][header.index('contact_name')] = "x" * 300
+        rows[1][header.index('outstanding_receivable_amount')] = "1234567890123.5"
+        stats = self.load('contacts', [header] + rows)
+        self.assertEqual((stats['loaded'], stats['failed']), (1, 2))
+        self.assertEqual(list(Contact.objects.filter(user=self.user).values_list('pk', flat=True)), [rows[2][header.index('id')]])
+
+    def test_repeated_keys(self):
+        header, *rows = self.read('contacts.csv')
+        repeated = list(rows[0])
+        repeated[header.index('contact_name')] = "Renamed"
+        for _ in range(2):
+            stats = self.load('contacts', [header] + rows + [repeated])
+            self.assertEqual((stats['loaded'], stats['failed']), (3, 0))
+        self.assertEqual(Contact.objects.get(pk=rows[0][header.index('id')]).contact_name, "Renamed")
+        self.assertEqual(SummaryTotal.objects.get(user=self.user, metric='receivables').count, 3)
+
+    def test_keys_of_another_tenant(self):
+        other = Users.objects.create_user(email="csv-other@example.com", username="csv-other")
+        self.load('contacts', self.read('contacts.csv'), user=other)
+        stats = self.load('contacts', self.read('contacts.csv'))
+        self.assertEqual((stats['loaded'], stats['failed']), (0, 3))
+        self.assertEqual(Contact.objects.filter(user=other).count(), 3)
+
+
+class NestedWriterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="nested@example.com", username="nested")
+        cls.other = Users.objects.create_user(email="nested-other@example.com", username="nested-other")
+
+    def address(self, city):
+        return {"attention": "", "address": "1 Main St", "street2": "", "city": city, "state": "TN", "zipcode": "600001",
+                "country": "India", "phone": "", "fax": ""}
+
+    def line_item(self, line_item_id):
+        return {"line_item_id": line_item_id, "bcy_rate": 5, "item_total_inclusive_of_tax": 10, "product_type": "goods"}
+
+    def test_contact_addresses_and_people(self):
+        records = zoho_records('contacts', range(2))
+        for i, record in enumerate(records):
+            record['billing_address'] = self.address("Chennai")
+            record['contact_persons'] = [{"contact_person_id": f"p{i}", "first_name": "Anbu", "email": f"p{i}@example.com"}]
+        BulkWriter('contacts', self.user).write(records)
+        first, second = (Contact.objects.get(pk=record['contact_id']) for record in records)
+        self.assertEqual(first.billing_address.city, "Chennai")
+        self.assertNotEqual(first.billing_address_id, second.billing_address_id)
+        self.assertEqual(list(first.contact_persons.values_list('contact_person_id', flat=True)), ["p0"])
+
+        # A changed owned address is updated in place.
+        records[0]['billing_address'] = self.address("Madurai")
+        BulkWriter('contacts', self.user).write(records[:1])
+        updated = Contact.objects.get(pk=first.pk)
+        self.assertEqual((updated.billing_address_id, updated.billing_address.city), (first.billing_address_id, "Madurai"))
+
+    def test_sales_order_children(self):
+        records = zoho_records('salesorders', range(2))
+        for record in records:
+            record['shipping_address'] = self.address("Chennai")
+            record['line_items'] = [self.line_item("l1")]
+        BulkWriter('salesorders', self.user).write(records)
+        others = zoho_records('salesorders', range(2, 3))
+        others[0]['shipping_address'] = self.address("Chennai")
+        BulkWriter('salesorders', self.other).write(others)
+
+        # Identical addresses are shared between one user's orders, never across users.
+        mine = set(SalesOrder.objects.filter(user=self.user).values_list('shipping_address_id', flat=True))
+        theirs = set(SalesOrder.objects.filter(user=self.other).values_list('shipping_address_id', flat=True))
+        self.assertEqual(len(mine), 1)
+        self.assertFalse(mine & theirs)
+
+        records[0]['line_items'] = [self.line_item("l2"), self.line_item("l3")]
+        BulkWriter('salesorders', self.user).write(records[:1])
+        order = SalesOrder.objects.get(salesorder_number=records[0]['salesorder_number'])
+        self.assertEqual(sorted(order.line_items.values_list('line_item_id', flat=True)), ["l2", "l3"])
+
+    def test_contact_persons_stay_with_their_tenant(self):
+        theirs = zoho_records('contacts', [7])[0]
+        theirs['contact_persons'] = [{"contact_person_id": "P1", "first_name": "Bob", "email": "bob@example.com"}]
+        BulkWriter('contacts', self.other).write([theirs])
+        version = DataVersion.objects.get(user=self.other, entity='contact').version
+
+        mine = zoho_records('contacts', [8])[0]
+        mine['contact_persons'] = [{"contact_person_id": "P1", "first_name": "Mallory", "email": "mallory@example.com"}]
+        BulkWriter('contacts', self.user).write([mine])
+        order = zoho_records('salesorders', [8])[0]
+        order['contact_persons'] = ["P1"]
+        BulkWriter('salesorders', self.user).write([order])
+
+        bob = Contact.objects.get(pk=theirs['contact_id']).contact_persons.get()
+        self.assertEqual((bob.user, bob.first_name, bob.email), (self.other, "Bob", "bob@example.com"))
+        mallory = Contact.objects.get(pk=mine['contact_id']).contact_persons.get()
+        self.assertEqual((mallory.user, mallory.first_name), (self.user, "Mallory"))
+        self.assertEqual(
+            list(SalesOrderContactPerson.objects.filter(sales_order__user=self.user).values_list('contact_person', flat=True)),
+            [mallory.pk])
+        self.assertEqual(DataVersion.objects.get(user=self.other, entity='contact').version, version)
+
+    def test_rejected_record_leaves_no_addresses(self):
+        BulkWriter('contacts', self.other).write(zoho_records('contacts', [5]))
+        record = zoho_records('contacts', [5])[0]
+        record['billing_address'] = self.address("Salem")
+        BulkWriter('contacts', self.user).write([record])
+        self.assertFalse(Address.objects.filter(city="Salem").exists())
+
+
+class CompiledValidatorTests(TestCase):
+    """The compiled validator must accept and reject exactly what the serializers do, with the same messages."""
+
+    INVALID = {
+        models.BooleanField: ["maybe"],
+        models.DecimalField: ["abc", "123456789012.5", "1.234"],
+        models.IntegerField: ["1.5", "x"],
+        models.DateTimeField: ["later"],
+        models.DateField: ["14/06/2024"],
+        models.EmailField: ["nope"],
+        models.URLField: ["not a url"],
+        models.CharField: ["x" * 300, None, ""],
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="validation@example.com", username="validation")
+
+    def rows(self, model):
+        valid = sample_rows(model, 1)[0]
+        rows = [valid]
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.name != 'user':
+                rows.append(dict(valid, **{field.name: "999"}))
+            if field.name not in valid:
+                continue
+            rows.extend(dict(valid, **{field.name: value}) for value in self.INVALID.get(type(field), []))
+            if field.choices:
+                rows.append(dict(valid, **{field.name: "unknown"}))
+            rows.append({name: value for name, value in valid.items() if name != field.name})
+        return rows
+
+    def test_parity_with_serializers(self):
+        for name, (model, _) in IMPORT_MODULES.items():
+            rows = self.rows(model)
+            _, errors = CompiledValidator.for_model(model).validate(rows)
+            compiled = dict(errors)
+            for index, row in enumerate(rows):
+                serializer = SERIALIZERS[name](data=dict(row, user=self.user.id))
+                serializer.is_valid()
+                expected = {field: [str(message) for message in messages] for field, messages in serializer.errors.items()}
+                self.assertEqual(compiled.get(index, {}), expected, f"{name} row {index}: {row}")
+
+
+class ExportTests(TestCase):
+    """Exported files must open in their own format and hold the seeded rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="export@example.com", username="export")
+        seed_rows(cls.user, 0)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(export_cache, 'root', Path(directory.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_xlsx(self):
+        content = self.export("/api/contacts/export/?format=xlsx")
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(xlsx_sheets(archive), ['Contacts'])
+            rows = xlsx_rows(archive, 1)
+        self.assertEqual(rows[0], ContactsView.export_schema.headers)
+        self.assertEqual(len(rows), ROWS_PER_USER + 1)
+        self.assertEqual(rows[1][:2], ["Contact 0-0", "Acme"])
+
+    def test_csv(self):
+        content = self.export("/api/expenses/export/?format=csv").decode()
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], ExpensesView.export_schema.headers)
+        self.assertEqual(len(rows), ROWS_PER_USER + 1)
+        self.assertEqual(rows[1][0], "2024-01-01")
+
+    def test_orders_and_invoices_export_their_own_date(self):
+        # created_time is the import time; the exported date must be the document's.
+        for path, model in (("/api/sales_order/", SalesOrder), ("/api/invoice/", Invoice)):
+            with self.subTest(path=path):
+                rows = list(csv.reader(io.StringIO(self.export(f"{path}export/?format=csv").decode())))
+                column = rows[0].index('Date Created')
+                dates = [str(date) for date in model.objects.filter(user=self.user).order_by('pk').values_list('date', flat=True)]
+                self.assertEqual([row[column] for row in rows[1:]], dates)
+                self.assertEqual(dates[0], "2024-01-01")
+
+    def test_cache_follows_writes(self):
+        first = self.export("/api/contacts/export/?format=csv")
+        cached = self.client.get("/api/contacts/export/?format=csv")
+        self.assertIsInstance(cached, FileResponse)
+        self.assertEqual(b''.join(cached.streaming_content), first)
+        # Contacts have no auto_now timestamp, so only the data version can tell this edit happened.
+        contact = Contact.objects.get(user=self.user, contact_id="c0-0")
+        self.assertEqual(self.client.patch(f"/api/contacts/{contact.pk}/", {"company_name": "Globex"}, format='json').status_code, 200)
+        rows = list(csv.reader(io.StringIO(self.export("/api/contacts/export/?format=csv").decode())))
+        self.assertEqual(rows[1][:2], ["Contact 0-0", "Globex"])
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_parquet_types_come_from_the_model(self):
+        content = self.export("/api/expenses/export/?format=parquet")
+        table = pyarrow.parquet.read_table(pyarrow.BufferReader(content))
+        self.assertEqual(table.num_rows, ROWS_PER_USER)
+        self.assertEqual(table.column_names, ExpensesView.export_schema.headers)
+        # AMOUNT is null on every seeded expense, so its values alone would say nothing.
+        self.assertEqual(table.column('AMOUNT').null_count, ROWS_PER_USER)
+        self.assertTrue(pyarrow.types.is_decimal(table.schema.field('AMOUNT').type))
+        self.assertTrue(pyarrow.types.is_date32(table.schema.field('DATE').type))
+        content = self.export("/api/invoice/export/?format=parquet")
+        self.assertTrue(pyarrow.types.is_date32(pyarrow.parquet.read_schema(pyarrow.BufferReader(content)).field('Date Created').type))
+
+
+class ExportSchemaCheckTests(SimpleTestCase):
+    def test_shipped_schemas_pass(self):
+        self.assertEqual(check_export_schemas(None), [])
+
+    def test_bad_columns_are_errors(self):
+        schema = ExportSchema('Contacts', [
+            ExportColumn('NAME', 'contact_name'),
+            ExportColumn('MISSING', 'no_such_field'),
+            ExportColumn('PEOPLE', 'contact_persons__email'),
+            ExportColumn('NESTED', 'company_name__length'),
+        ])
+        with mock.patch.object(ContactsView, 'export_schema', schema):
+            errors = check_export_schemas(None)
+        self.assertEqual([error.id for error in errors], ['app.E001'] * 3)
+        self.assertTrue(all(error.obj is ContactsView for error in errors))
+        self.assertEqual([error.msg for error in errors], [
+            "Export column 'MISSING': Contact has no field 'no_such_field'",
+            "Export column 'PEOPLE': 'contact_persons' is a to-many relation and would repeat rows",
+            "Export column 'NESTED': 'company_name' on Contact is not a relation",
+        ])
+
+
+class LedgerExportTests(TransactionTestCase):
+    """Each entity is rendered in its own thread, so those threads must see committed rows."""
+
+    def setUp(self):
+        self.user = Users.objects.create_user(email="ledger@example.com", username="ledger")
+        seed_rows(self.user, 0)
+        # Uneven row counts, so a sheet written under the wrong title shows.
+        SalesOrder.objects.filter(user=self.user, salesorder_number="SO-0-0").delete()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(export_cache, 'root', Path(directory.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return io.BytesIO(b''.join(response.streaming_content))
+
+    def expected(self):
+        return [
+            (viewset.export_schema.title, viewset.export_schema.headers, viewset.queryset.model.objects.filter(user=self.user).count())
+            for viewset in LedgerExportView.viewsets
+        ]
+
+    def test_sheets_follow_the_viewset_order(self):
+        with zipfile.ZipFile(self.export("/api/export/ledger/?format=xlsx")) as archive:
+            sheets = []
+            for index, title in enumerate(xlsx_sheets(archive), start=1):
+                rows = xlsx_rows(archive, index)
+                sheets.append((title, rows[0], len(rows) - 1))
+        self.assertEqual(sheets, self.expected())
+
+    def test_zip_entries_follow_the_viewset_order(self):
+        entries = []
+        with zipfile.ZipFile(self.export("/api/export/ledger/?format=zip")) as archive:
+            for name in archive.namelist():
+                rows = list(csv.reader(io.StringIO(archive.read(name).decode())))
+                entries.append((name[:-len('.csv')], rows[0], len(rows) - 1))
+        self.assertEqual(entries, self.expected())
+
+    def test_slow_producers_keep_their_place(self):
+        def producer(name, delay):
+            def produce():
+                time.sleep(delay)
+                yield name.encode()
+            return produce
+
+        outputs = in_parallel([producer("first", 0.2), producer("second", 0), producer("third", 0.1)])
+        self.assertEqual([b''.join(chunks) for chunks in outputs], [b"first", b"second", b"third"])
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="keyset@example.com", username="keyset")
+        seed_rows(cls.user, 0)
+        Expense.objects.create(user=cls.user, status="open", last_modified_time=None)
+        Expense.objects.create(user=cls.user, status="open", last_modified_time=None)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, link, key):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row[key] for row in response.data['results']])
+            url = response.data[link]
+        return pages
+
+    def test_round_trip(self):
+        # Invoices share auto_now timestamps, expenses have distinct ones and two without any.
+        for path, model in (("/api/invoice/", Invoice), ("/api/expenses/", Expense)):
+            with self.subTest(path=path):
+                expected = list(model.objects.filter(user=self.user).order_by(
+                    models.F('last_modified_time').desc(nulls_last=True), '-pk').values_list('pk', flat=True))
+                key = model._meta.pk.name
+                forward = self.walk(f"{path}?pagination=keyset&limit=7", 'next', key)
+                self.assertEqual(sum(forward, []), expected)
+                last = self.client.get(f"{path}?pagination=keyset&limit=7")
+                while last.data['next']:
+                    last = self.client.get(last.data['next'])
+                backward = self.walk(last.data['previous'], 'previous', key)
+                self.assertEqual(sum(reversed(backward), []) + forward[-1], expected)
+
+    def test_bad_cursor(self):
+        def cursor(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for value in ("not-base64!", cursor([1]), cursor({"v": None, "p": "abc"}), cursor({"v": None, "p": None}),
+                      cursor({"v": "yesterday", "p": 1}), cursor({"v": None})):
+            with self.subTest(cursor=value):
+                response = self.client.get("/api/expenses/", {'pagination': 'keyset', 'cursor': value})
+                self.assertEqual(response.status_code, 404)
+
+
+class QueryPlanTests(TestCase):
+    """EXPLAIN the list, export and filter queries and fail on full table scans."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(USERS):
+            user = Users.objects.create_user(email=f"user{index}@example.com", username=f"user{index}")
+            seed_rows(user, index)
+        cls.user = Users.objects.get(email="user0@example.com")
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute("ANALYZE")
+            elif connection.vendor == 'mysql':
+                for model in (Users, Contact, Invoice, SalesOrder, CreditNote, Expense):
+                    cursor.execute(f"ANALYZE TABLE {connection.ops.quote_name(model._meta.db_table)}")
+
+    def setUp(self):
+        if connection.vendor not in ('sqlite', 'mysql', 'postgresql'):
+            raise unittest.SkipTest(f"No plan checks for {connection.vendor}")
+        if connection.vendor == 'postgresql':
+            # Tiny test tables would otherwise always be read sequentially.
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def plan(self, queryset):
+        if connection.vendor == 'mysql':
+            plan = queryset.explain(format='json')
+            full_scan = re.search(r'"access_type":\s*"ALL"', plan) is not None
+            sort = re.search(r'"using_filesort":\s*true', plan) is not None
+        elif connection.vendor == 'postgresql':
+            plan = queryset.explain()
+            full_scan = 'Seq Scan' in plan
+            sort = re.search(r'^\s*(->\s*)?Sort\b', plan, re.M) is not None
+        else:
+            plan = queryset.explain()
+            full_scan = re.search(r'\bSCAN \w+(?! USING)\s*$', plan, re.M) is not None
+            sort = 'USE TEMP B-TREE FOR ORDER BY' in plan
+        return plan, full_scan, sort
+
+    def assertIndexed(self, queryset, ordered=False):
+        plan, full_scan, sort = self.plan(queryset)
+        self.assertFalse(full_scan, f"Full table scan:\n{queryset.query}\n{plan}")
+        if ordered:
+            self.assertFalse(sort, f"Ordering is not served by an index:\n{queryset.query}\n{plan}")
+
+    def test_keyset_list_pages(self):
+        for model in (Contact, Invoice, SalesOrder, CreditNote, Expense):
+            with self.subTest(model=model.__name__):
+                queryset = model.objects.filter(user=self.user).order_by('-last_modified_time', '-pk')[:101]
+                self.assertIndexed(queryset, ordered=True)
+
+    def test_export_batches(self):
+        for model in (Contact, Invoice, SalesOrder, CreditNote, Expense):
+            with self.subTest(model=model.__name__):
+                self.assertIndexed(model.objects.filter(user=self.user).order_by('pk').values_list('pk')[:2000])
+
+    def test_status_and_date_filters(self):
+        since = datetime.date(2024, 1, 10)
+        for model in (Invoice, SalesOrder, CreditNote, Expense):
+            with self.subTest(model=model.__name__):
+                self.assertIndexed(model.objects.filter(user=self.user, date__gte=since))
+                self.assertIndexed(model.objects.filter(user=self.user, status='open', date__gte=since))
+        self.assertIndexed(Contact.objects.filter(user=self.user, status='open'))
+
+    def test_customer_filters(self):
+        for model in (Invoice, CreditNote, Expense):
+            with self.subTest(model=model.__name__):
+                self.assertIndexed(model.objects.filter(user=self.user, customer_id='c0-1'))
+
+    def test_currency_and_amount_filters(self):
+        for model in (Invoice, CreditNote, Expense):
+            with self.subTest(model=model.__name__):
+                self.assertIndexed(model.objects.filter(user=self.user, currency_code='INR'))
+                self.assertIndexed(model.objects.filter(user=self.user, total__gte=10, total__lte=100))
+        self.assertIndexed(Contact.objects.filter(user=self.user, currency_code='INR'))
+
+    def test_search(self):
+        for viewset in (ContactsView, InvoiceView, SalesOrderView, CreditNoteView, ExpensesView):
+            with self.subTest(viewset=viewset.__name__):
+                request = SimpleNamespace(query_params={'q': 'Acme 0-1'})
+                queryset = viewset.queryset.model.objects.filter(user=self.user)
+                self.assertIndexed(FullTextSearchFilter().filter_queryset(request, queryset, viewset))
+
+    def test_username_lookup(self):
+        self.assertIndexed(Users.objects.filter(username='user3'))
+
+
+class ValuesReaderTests(TestCase):
+    """The values() list path must render exactly what the serializers render."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="reader@example.com", username="reader")
+        seed_rows(cls.user, 0)
+        person = ContactPerson.objects.create(contact_person_id="p1", first_name="Ada", email="ada@example.com")
+        Contact.objects.filter(user=cls.user).first().contact_persons.add(person)
+        CreditNote.objects.filter(user=cls.user).first().contact_persons.add(person)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_both(self, viewset, url):
+        lean = self.client.get(url)
+        viewset.lean_list = False
+        try:
+            full = self.client.get(url)
+        finally:
+            viewset.lean_list = True
+        self.assertEqual(lean.status_code, 200, lean.content)
+        # Offset pages are unordered, and a narrower SELECT may pick another
+        # index; every page here holds all rows, so compare them as sets.
+        return [sorted(json.dumps(row, sort_keys=True) for row in json.loads(response.content)['results'])
+                for response in (lean, full)]
+
+    def test_matches_serializer(self):
+        for path, viewset in (('contacts', ContactsView), ('sales_order', SalesOrderView), ('invoice', InvoiceView),
+                              ('credit_note', CreditNoteView), ('expenses', ExpensesView)):
+            for query in ('', '&pagination=keyset', '&fields=user,status'):
+                with self.subTest(path=path, query=query):
+                    lean, full = self.get_both(viewset, f"/api/{path}/?limit=50{query}")
+                    self.assertEqual(lean, full)
+
+    def test_sparse_fields(self):
+        response = self.client.get("/api/invoice/?fields=status,total&limit=1")
+        self.assertEqual(list(response.data['results'][0]), ['total', 'status'])
+        response = self.client.get("/api/invoice/?fields=status,bogus")
+        self.assertEqual(response.status_code, 400)
+
+
+def seed_relations(user):
+    contacts = list(Contact.objects.filter(user=user).order_by('pk'))
+    invoices = list(Invoice.objects.filter(user=user).order_by('pk'))
+    people = ContactPerson.objects.bulk_create([ContactPerson(user=user, contact_person_id=f"p{i}") for i in range(2)])
+    for i, contact in enumerate(contacts):
+        contact.billing_address = Address.objects.create(address_type=Address.BILLING, city=f"City {i}")
+        contact.default_templates = DefaultTemplates.objects.create()
+        contact.save()
+        contact.contact_persons.set(people)
+    for i, order in enumerate(SalesOrder.objects.filter(user=user).order_by('pk')):
+        order.contact = contacts[i]
+        order.billing_address = Address.objects.create(address_type=Address.BILLING)
+        order.shipping_address = Address.objects.create(address_type=Address.SHIPPING)
+        order.save()
+        LineItem.objects.bulk_create([
+            LineItem(sales_order=order, line_item_id=f"l{i}-{n}", bcy_rate=1, item_total_inclusive_of_tax=1)
+            for n in range(2)
+        ])
+        SubStatus.objects.create(sales_order=order, status_id=f"s{i}")
+        SalesOrderCustomField.objects.create(sales_order=order, customfield_id=f"f{i}", index=0)
+        SalesOrderContactPerson.objects.create(sales_order=order, contact_person=people[0])
+    for i, note in enumerate(CreditNote.objects.filter(user=user).order_by('pk')):
+        note.contact = contacts[i]
+        note.invoice = invoices[i]
+        note.billing_address = Address.objects.create(address_type=Address.BILLING)
+        note.shipping_address = Address.objects.create(address_type=Address.SHIPPING)
+        note.save()
+        note.contact_persons.set(people)
+        LineItem.objects.create(invoice=invoices[i], line_item_id=f"i{i}", bcy_rate=1, item_total_inclusive_of_tax=1)
+
+
+class ExpandTests(TestCase):
+    """?expand= must cost a fixed number of queries however many rows a page holds."""
+
+    # Query budget per request: the version stamp, COUNT(*), the page itself
+    # and one per prefetched relation.
+    BUDGETS = [
+        ('contacts', 'billing_address,shipping_address,contact_persons,default_templates', 4),
+        ('sales_order', 'contact.contact_persons,contact.billing_address,billing_address,shipping_address,'
+                        'line_items,sub_statuses,custom_fields,contact_persons.contact_person', 9),
+        ('invoice', 'line_items', 4),
+        ('credit_note', 'contact,invoice.line_items,billing_address,shipping_address,contact_persons', 6),
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="expand@example.com", username="expand")
+        seed_rows(cls.user, 0)
+        seed_relations(cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_query_budget(self):
+        for path, expand, budget in self.BUDGETS:
+            for limit in (2, ROWS_PER_USER):
+                with self.subTest(path=path, limit=limit), self.assertNumQueries(budget):
+                    response = self.client.get(f"/api/{path}/?limit={limit}&expand={expand}")
+                    self.assertEqual(len(response.data['results']), limit)
+
+    def test_retrieve_query_budget(self):
+        for path, expand, budget in self.BUDGETS:
+            viewset = {'contacts': ContactsView, 'sales_order': SalesOrderView, 'invoice': InvoiceView,
+                       'credit_note': CreditNoteView}[path]
+            pk = viewset.queryset.model.objects.filter(user=self.user).values_list('pk', flat=True).first()
+            with self.subTest(path=path), self.assertNumQueries(budget - 1):
+                self.assertEqual(self.client.get(f"/api/{path}/{pk}/?expand={expand}").status_code, 200)
+
+    def test_nested_output(self):
+        response = self.client.get("/api/sales_order/?limit=1&expand=contact.contact_persons,line_items,contact_persons.contact_person")
+        order = response.data['results'][0]
+        self.assertEqual(len(order['line_items']), 2)
+        self.assertEqual(order['contact']['contact_persons'][0]['contact_person_id'], "p0")
+        self.assertEqual(order['contact_persons'][0]['contact_person']['contact_person_id'], "p0")
+        self.assertIsInstance(order['billing_address'], int)
+
+    def test_other_tenants_rows_are_not_expanded(self):
+        other = Users.objects.create_user(email="expand-other@example.com", username="expand-other")
+        seed_rows(other, 1)
+        invoice = Invoice.objects.filter(user=other).first()
+        contact = Contact.objects.filter(user=other).first()
+        person = ContactPerson.objects.create(user=other, contact_person_id="foreign")
+        note = CreditNote.objects.filter(user=self.user).order_by('pk').first()
+        CreditNote.objects.filter(pk=note.pk).update(invoice=invoice, contact=contact)
+        note.contact_persons.add(person)
+        order = SalesOrder.objects.filter(user=self.user).order_by('pk').first()
+        SalesOrderContactPerson.objects.create(sales_order=order, contact_person=person)
+
+        for url in ("/api/credit_note/?expand=invoice,contact,contact_persons",
+                    f"/api/credit_note/{note.pk}/?expand=invoice,contact,contact_persons"):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                data = response.data['results'] if 'results' in response.data else [response.data]
+                row = next(row for row in data if row['creditnote_id'] == note.pk)
+                self.assertIsNone(row['invoice'])
+                self.assertIsNone(row['contact'])
+                self.assertEqual([p['contact_person_id'] for p in row['contact_persons']], ["p0", "p1"])
+        response = self.client.get(f"/api/sales_order/{order.pk}/?expand=contact_persons.contact_person")
+        people = [link['contact_person'] for link in response.data['contact_persons']]
+        self.assertEqual(people[0]['contact_person_id'], "p0")
+        self.assertIsNone(people[1])
+
+    def test_unknown_expansion(self):
+        self.assertEqual(self.client.get("/api/sales_order/?expand=contact.bogus").status_code, 400)
+        self.assertEqual(self.client.get("/api/expenses/?expand=invoice").status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="etag@example.com", username="etag")
+        seed_rows(cls.user, 0)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_not_modified(self):
+        response = self.client.get("/api/invoice/?limit=5")
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(1):
+            repeat = self.client.get("/api/invoice/?limit=5", HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(self.client.get("/api/invoice/?limit=6", HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_writes_invalidate_their_entity(self):
+        invoices = self.client.get("/api/invoice/?limit=5")['ETag']
+        contacts = self.client.get("/api/contacts/?limit=5")['ETag']
+        invoice = Invoice.objects.filter(user=self.user).first()
+        self.assertEqual(self.client.patch(f"/api/invoice/{invoice.pk}/", {"status": "void"}, format='json').status_code, 200)
+        self.assertEqual(self.client.get("/api/invoice/?limit=5", HTTP_IF_NONE_MATCH=invoices).status_code, 200)
+        self.assertEqual(self.client.get("/api/contacts/?limit=5", HTTP_IF_NONE_MATCH=contacts).status_code, 304)
+
+    def test_import_invalidates(self):
+        etag = self.client.get("/api/expenses/?limit=5")['ETag']
+        BulkWriter('expenses', self.user).save_objects([Expense(user=self.user, expense_id="imported", status="open")])
+        self.assertEqual(self.client.get("/api/expenses/?limit=5", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_cascaded_deletes_invalidate_the_children(self):
+        invoice = Invoice.objects.get(user=self.user, invoice_id="i0-1")
+        Expense.objects.filter(user=self.user, customer_id="c0-1").update(invoice=invoice)
+        CreditNote.objects.filter(user=self.user, creditnote_id="n0-1").update(invoice=invoice)
+        etags = {path: self.client.get(path)['ETag'] for path in ("/api/expenses/?limit=5", "/api/credit_note/?limit=5")}
+        self.assertEqual(self.client.delete(f"/api/invoice/{invoice.pk}/").status_code, 204)
+        self.assertFalse(Expense.objects.filter(user=self.user, customer_id="c0-1").exists())
+        for path, etag in etags.items():
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200, path)
+
+        contact = Contact.objects.get(user=self.user, contact_id="c0-2")
+        SalesOrder.objects.filter(user=self.user, salesorder_number="SO-0-2").update(contact=contact)
+        etag = self.client.get("/api/sales_order/?limit=5")['ETag']
+        response = self.client.delete("/api/contacts/bulk/", [contact.pk], format='json')
+        self.assertEqual(response.data['succeeded'], 1)
+        self.assertFalse(SalesOrder.objects.filter(user=self.user, salesorder_number="SO-0-2").exists())
+        self.assertEqual(self.client.get("/api/sales_order/?limit=5", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    @override_settings(RESPONSE_CACHE_TIMEOUT=60)
+    def test_response_cache(self):
+        first = self.client.get("/api/sales_order/?limit=5")
+        with self.assertNumQueries(1):
+            cached = self.client.get("/api/sales_order/?limit=5")
+        self.assertEqual(cached.data, first.data)
+        order = SalesOrder.objects.filter(user=self.user).first()
+        self.client.delete(f"/api/sales_order/{order.pk}/")
+        self.assertEqual(self.client.get("/api/sales_order/?limit=5").data['count'], ROWS_PER_USER - 1)
+
+
+class SummaryTests(TestCase):
+    """Deltas applied by writes must land where a full rebuild would."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="summary@example.com", username="summary")
+        seed_rows(cls.user, 0)
+        for i, invoice in enumerate(Invoice.objects.filter(user=cls.user)):
+            invoice.total, invoice.balance = 100 + i, i
+            invoice.save()
+        for i, expense in enumerate(Expense.objects.filter(user=cls.user)):
+            expense.account_name, expense.total = ['Rent', 'Travel'][i % 2], 10
+            expense.save()
+        Contact.objects.filter(user=cls.user).update(outstanding_receivable_amount_bcy=5)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def rebuilt(self):
+        with transaction.atomic():
+            summary.rebuild(self.user)
+            report = summary.report(self.user)
+            transaction.set_rollback(True)
+        return report
+
+    def test_report(self):
+        data = self.client.get("/api/summary/").data
+        self.assertEqual(data['receivables'], {'contacts': ROWS_PER_USER, 'outstanding_bcy': '200.00', 'unused_credits_bcy': '0.00'})
+        paid = next(row for row in data['invoices_by_status'] if row['status'] == 'paid')
+        self.assertEqual(paid['count'], ROWS_PER_USER // len(STATUSES))
+        self.assertEqual(data['expenses_by_account_month'][0], {'account_name': 'Rent', 'month': '2024-01', 'count': 16, 'total': '160.00'})
+
+    def test_constant_queries(self):
+        self.client.get("/api/summary/")
+        seed_rows(self.user, 1)
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get("/api/summary/").status_code, 200)
+
+    def test_viewset_writes_apply_deltas(self):
+        self.client.get("/api/summary/")
+        invoice = Invoice.objects.filter(user=self.user, status='draft').first()
+        self.client.patch(f"/api/invoice/{invoice.pk}/", {"status": "paid", "total": "999.99"}, format='json')
+        expense = Expense.objects.filter(user=self.user).first()
+        self.client.delete(f"/api/expenses/{expense.pk}/")
+        contact = Contact.objects.filter(user=self.user).first()
+        self.client.patch(f"/api/contacts/{contact.pk}/", {"outstanding_receivable_amount_bcy": "12.50"}, format='json')
+        self.assertEqual(self.client.get("/api/summary/").data, self.rebuilt())
+
+    def test_cascaded_deletes_apply_deltas(self):
+        self.client.get("/api/summary/")
+        invoice = Invoice.objects.get(user=self.user, invoice_id="i0-1")
+        Expense.objects.filter(user=self.user, customer_id__in=["c0-1", "c0-3"]).update(invoice=invoice)
+        self.assertEqual(self.client.delete(f"/api/invoice/{invoice.pk}/").status_code, 204)
+        invoice = Invoice.objects.get(user=self.user, invoice_id="i0-5")
+        Expense.objects.filter(user=self.user, customer_id="c0-5").update(invoice=invoice)
+        self.assertEqual(self.client.delete("/api/invoice/bulk/", [invoice.pk], format='json').data['succeeded'], 1)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), ROWS_PER_USER - 3)
+        self.assertEqual(self.client.get("/api/summary/").data, self.rebuilt())
+
+    def test_import_applies_deltas(self):
+        self.client.get("/api/summary/")
+        writer = BulkWriter('invoices', self.user)
+        changed = Invoice(user=self.user, invoice_id="i0-1", invoice_number="INV-0-1", customer_id="c0-1", status="void",
+                          date=datetime.date(2024, 1, 2), currency_code="INR", exchange_rate=1, total=7, balance=7)
+        added = Invoice(user=self.user, invoice_id="new", invoice_number="INV-new", customer_id="c0-1", status="open",
+                        date=datetime.date(2024, 2, 1), currency_code="INR", exchange_rate=1, total=3, balance=3)
+        writer.save_objects([changed, added])
+        self.assertEqual(self.client.get("/api/summary/").data, self.rebuilt())
+
+
+class BulkWriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="bulk@example.com", username="bulk")
+        cls.other = Users.objects.create_user(email="other@example.com", username="other")
+        seed_rows(cls.user, 0)
+        seed_rows(cls.other, 1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def invoice(self, key, **values):
+        return {"invoice_id": key, "invoice_number": f"INV-{key}", "customer_id": "c", "customer_name": "Bulk",
+                "status": "open", "currency_code": "INR", "exchange_rate": "1", "total": "10.00", **values}
+
+    def test_create(self):
+        items = [self.invoice(f"b{i}") for i in range(20)]
+        items += [self.invoice("b0"), self.invoice("i1-1"), self.invoice("bad", total="abc"), "junk"]
+        response = self.client.post("/api/invoice/bulk/", items, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['succeeded'], response.data['failed']), (20, 4))
+        statuses = [result['status'] for result in response.data['results']]
+        self.assertEqual(statuses, ['created'] * 20 + ['failed'] * 4)
+        self.assertIn('invoice_id', response.data['results'][20]['errors'])
+        self.assertIn('invoice_id', response.data['results'][21]['errors'])
+        self.assertEqual(Invoice.objects.filter(user=self.user, customer_name="Bulk").count(), 20)
+
+    def test_create_queries_do_not_grow_per_item(self):
+        # The first write also creates the version and summary rows.
+        self.client.post("/api/invoice/bulk/", [self.invoice("first")], format='json')
+        counts = []
+        for size in (5, 25):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post("/api/invoice/bulk/", [self.invoice(f"{size}-{i}") for i in range(size)], format='json')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_update_is_scoped_to_the_user(self):
+        items = [{"invoice_id": f"i0-{i}", "status": "void", "total": "1.50"} for i in range(10)]
+        items += [{"invoice_id": "i1-1", "status": "void"}, {"status": "void"}]
+        response = self.client.patch("/api/invoice/bulk/", items, format='json')
+        self.assertEqual((response.data['succeeded'], response.data['failed']), (10, 2))
+        self.assertEqual(Invoice.objects.filter(user=self.user, status="void", total="1.50").count(), 10)
+        self.assertNotEqual(Invoice.objects.get(invoice_id="i1-1").status, "void")
+
+    def test_references_to_another_tenant(self):
+        expense = {"date": "2022-01-01", "status": "unbilled", "customer_id": "c"}
+        response = self.client.post("/api/expenses/bulk/", [
+            {**expense, "invoice": "i0-1"}, {**expense, "invoice": "i1-1"},
+        ], format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'failed'])
+        self.assertEqual(response.data['results'][1]['errors'], {'invoice': ['Invalid pk "i1-1" - object does not exist.']})
+        note = CreditNote.objects.filter(user=self.user).first()
+        response = self.client.patch("/api/credit_note/bulk/", [{"creditnote_id": note.pk, "invoice": "i1-1"}], format='json')
+        self.assertEqual(response.data['results'][0]['errors'], {'invoice': ['Invalid pk "i1-1" - object does not exist.']})
+        response = self.client.patch(f"/api/credit_note/{note.pk}/", {"invoices": "i1-2"}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        # Deleting their invoice must leave this user's rows alone.
+        Invoice.objects.filter(invoice_id__in=["i1-1", "i1-2"]).delete()
+        self.assertTrue(Expense.objects.filter(user=self.user, invoice_id="i0-1").exists())
+        self.assertTrue(CreditNote.objects.filter(pk=note.pk).exists())
+
+    def test_delete(self):
+        response = self.client.delete("/api/invoice/bulk/", ["i0-1", "i0-2", "i1-3", "missing"], format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], ['deleted', 'deleted', 'failed', 'failed'])
+        self.assertTrue(Invoice.objects.filter(invoice_id="i1-3").exists())
+        self.assertEqual(Invoice.objects.filter(user=self.user).count(), ROWS_PER_USER - 2)
+
+    def test_summary_and_versions_follow(self):
+        before = self.client.get("/api/summary/")
+        self.client.post("/api/invoice/bulk/", [self.invoice(f"b{i}") for i in range(5)], format='json')
+        self.client.patch("/api/invoice/bulk/", [{"invoice_id": "b1", "status": "paid"}], format='json')
+        self.client.delete("/api/invoice/bulk/", ["b2", "i0-0"], format='json')
+        after = self.client.get("/api/summary/", HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(after.status_code, 200)
+        with transaction.atomic():
+            summary.rebuild(self.user)
+            self.assertEqual(after.data, summary.report(self.user))
+            transaction.set_rollback(True)
+
+    def test_rejects_non_lists(self):
+        self.assertEqual(self.client.post("/api/invoice/bulk/", {"invoice_id": "x"}, format='json').status_code, 400)
+        self.assertEqual(self.client.post("/api/invoice/bulk/", ["junk"], format='json').status_code, 400)
+
+
+@mock.patch.object(CachedCountPagination, 'background', False)
+class CountFreePaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="pages@example.com", username="pages")
+        seed_rows(cls.user, 0)
+
+    def setUp(self):
+        caches['default'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def page(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"/api/expenses/?{query}")
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries), "page request ran a COUNT(*)")
+        return response.data
+
+    def test_nocount(self):
+        first = self.page("pagination=nocount&limit=15")
+        self.assertNotIn('count', first)
+        self.assertEqual(len(first['results']), 15)
+        self.assertIn('offset=15', first['next'])
+        last = self.page("pagination=nocount&limit=15&offset=30")
+        self.assertEqual((len(last['results']), last['next']), (10, None))
+        exact = self.page("pagination=nocount&limit=40")
+        self.assertIsNone(exact['next'])
+
+    def test_cached_count(self):
+        response = self.client.get("/api/expenses/?pagination=cached&limit=15")
+        self.assertEqual((response.data['count'], response.data['count_exact']), (ROWS_PER_USER, False))
+        Expense.objects.create(user=self.user, status="open")
+        # Within the TTL the cached count is served without counting again.
+        self.assertEqual(self.page("pagination=cached&limit=15")['count'], ROWS_PER_USER)
+        # Reaching the end makes it exact again.
+        last = self.page("pagination=cached&limit=15&offset=30")
+        self.assertEqual((last['count'], last['count_exact'], last['next']), (ROWS_PER_USER + 1, True, None))
+        self.assertEqual(self.page("pagination=cached&limit=15")['count'], ROWS_PER_USER + 1)
+
+    def test_cached_count_is_per_filter(self):
+        self.client.get("/api/expenses/?pagination=cached&limit=5")
+        self.assertEqual(self.client.get("/api/expenses/?pagination=cached&limit=5&status=open").data['count'],
+                         ROWS_PER_USER // len(STATUSES))
+
+    @override_settings(PAGINATION_COUNT_TTL=0)
+    def test_stale_count_is_refreshed(self):
+        self.client.get("/api/expenses/?pagination=cached&limit=5")
+        Expense.objects.create(user=self.user, status="open")
+        self.assertEqual(self.client.get("/api/expenses/?pagination=cached&limit=5").data['count'], ROWS_PER_USER + 1)
+
+
+class PrincipalCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = Users.objects.create_user(email="principal@example.com", username="principal", password="secret")
+
+    def setUp(self):
+        principal_cache.clear()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/summary/")
+        self.assertEqual(response.status_code, 200)
+        return sum(Users._meta.db_table in query['sql'] for query in queries)
+
+    def test_user_is_cached(self):
+        self.assertEqual(self.user_queries(), 1)
+        self.assertEqual(self.user_queries(), 0)
+
+    def test_password_change_evicts(self):
+        self.user_queries()
+        self.user.set_password("changed")
+        self.user.save()
+        self.assertEqual(self.user_queries(), 1)
+
+    def test_deactivated_user_is_rejected(self):
+        self.user_queries()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get("/api/summary/")
+        self.assertEqual((response.status_code, response.data['code']), (401, 'user_inactive'))
+
+    def test_deleted_user_is_rejected(self):
+        self.user_queries()
+        Users.objects.filter(pk=self.user.pk).delete()
+        self.assertEqual(self.client.get("/api/summary/").status_code, 401)
+
+    @override_settings(PRINCIPAL_CACHE_ALIAS='default')
+    def test_shared_cache(self):
+        caches['default'].clear()
+        self.user_queries()
+        principal_cache.clear()
+        # Another process: its own LRU is empty, the shared cache is not.
+        self.assertEqual(self.user_queries(), 0)
+        self.user.save()
+        principal_cache.clear()
+        self.assertEqual(self.user_queries(), 1)
+
+    @override_settings(PRINCIPAL_CACHE_SIZE=1)
+    def test_least_recently_used_is_evicted(self):
+        other = Users.objects.create_user(email="other@example.com", username="other")
+        self.assertIsNotNone(principal_cache.get(self.user.pk))
+        self.assertIsNotNone(principal_cache.get(other.pk))
+        self.assertEqual(list(principal_cache.entries), [principal_cache.key(other.pk)])
+        self.assertIsNone(principal_cache.get(0))
@@ -3,7 +3,8 @@ from rest_framework.routers import SimpleRouter
 from .views import (
     SalesOrderView, UserRegisterView, ImportView, 
     ContactsView, LoginView, InvoiceView, 
-    CreditNoteView, ExpensesView
+    CreditNoteView, ExpensesView, ImportCallbackView, ImportJobView, ExportDownloadView, LedgerExportView,
+    SummaryView
 )
 
 router = SimpleRouter()
@@ -17,5 +18,10 @@ urlpatterns = [
     path('register/', UserRegisterView.as_view(), name='user-register'),
     path('login/', LoginView.as_view(), name='login'),
     path('import/', ImportView.as_view(), name='import'),
+    path('import/callback/', ImportCallbackView.as_view(), name='import-callback'),
+    path('import/<int:job_id>/', ImportJobView.as_view(), name='import-job'),
+    path('export/ledger/', LedgerExportView.as_view(), name='export-ledger'),
+    path('exports/<slug:key>/', ExportDownloadView.as_view(), name='export-download'),
+    path('summary/', SummaryView.as_view(), name='summary'),
     path('', include(router.urls))
 ]
@@ -1,28 +1,91 @@
 from django.contrib.auth import get_user_model, authenticate
-from django.http import HttpResponse
-from openpyxl import Workbook
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from rest_framework.generics import CreateAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.exceptions import AuthenticationFailed, NotAcceptable, ValidationError
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.fields import BooleanField
+from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
+from django_filters.rest_framework import DjangoFilterBackend
+from .authentication import CachedJWTAuthentication
 from .serializer import (
     CreditNoteSerializer, SalesOrderSerializer, UserRegisterSerializer,
-    ContactSerializer, InvoiceSerializer, ExpensesOrderSerializer
+    ContactSerializer, InvoiceSerializer, ExpensesOrderSerializer, ImportJobSerializer, ValuesReader,
+    related_lookups
 )
-from .models import Contact, CreditNote, SalesOrder, Invoice, Expense
-import webbrowser
-import socketserver
+from .models import Contact, ContactPerson, CreditNote, SalesOrder, Invoice, Expense, ImportJob, ZohoToken
+from .helper.export import ExportColumn, ExportSchema, pyarrow, stream_export, stream_ledger
+from .helper import cascade, summary, versions
+from .helper.bulk import BulkWrite
+from .helper.exportcache import export_cache
+from .helper.responsecache import response_cache
+from .filters import (
+    ContactFilter, CreditNoteFilter, ExpenseFilter, FullTextSearchFilter, InvoiceFilter, SalesOrderFilter
+)
+from .pagination import PAGINATION_MODES
+from .renderers import EXPORT_RENDERERS, LEDGER_RENDERERS
 import logging
-from .helper.handler import MyHandler
+import secrets
+import urllib.parse
 
 User = get_user_model()
 
+def export_response(request, title, version, chunks):
+    # Serves a cached copy when the data version still matches, otherwise
+    # streams chunks() to the client (or a background build with ?async=1).
+    renderer = request.accepted_renderer
+    key = export_cache.key(request.user.id, title, renderer.format, request.query_params, version)
+    meta = {"user_id": request.user.id, "filename": f"{title}.{renderer.format}", "content_type": renderer.media_type}
+    if export_cache.get(key):
+        return export_cache.response(key, meta)
+
+    if request.query_params.get('async') in BooleanField.TRUE_VALUES:
+        export_cache.build_async(key, meta, chunks)
+        return Response({
+            "status": "building",
+            "download_url": request.build_absolute_uri(reverse('export-download', args=[key])),
+        }, status=status.HTTP_202_ACCEPTED, content_type='application/json')
+
+    response = StreamingHttpResponse(export_cache.tee(key, meta, chunks()), content_type=renderer.media_type)
+    response['Content-Disposition'] = f'attachment; filename="{meta["filename"]}"'
+    return response
+
+def conditional_response(request, models, build):
+    # 304 when the client's copy of data built from `models` is still
+    # current, otherwise build() or the cached data of an identical response.
+    etag, last_modified = versions.stamp(
+        request.user.id, models, [request.build_absolute_uri(), request.accepted_renderer.media_type])
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        data = response_cache.get(etag)
+        if data is not None:
+            response = Response(data)
+        else:
+            response = build()
+            if response.status_code == status.HTTP_200_OK:
+                response_cache.set(etag, response.data)
+    if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def primary_contact_person(field):
+    people = ContactPerson.objects.filter(contact_persons=OuterRef('pk'), is_primary_contact=True)
+    return Subquery(people.values(field)[:1])
+
 class UserRegisterView(CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserRegisterSerializer
@@ -43,120 +106,315 @@ class LoginView(APIView):
 
 class BaseModelViewSet(ModelViewSet):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
+    export_schema = None
+    lean_list = True
 
     def get_queryset(self):
         user = self.request.user
         queryset = super().get_queryset().filter(user_id=user.id)
+        if self.action in ('list', 'retrieve'):
+            # Join or prefetch whatever the (expanded) serializer will read.
+            select, prefetch = related_lookups(self.get_serializer(), user=user)
+            if select:
+                queryset = queryset.select_related(*select)
+            queryset = queryset.prefetch_related(*prefetch)
         return queryset
 
-    def export_to_excel(self, request, queryset, title, headers, row_data_func):
-        workbook = Workbook()
-        worksheet = workbook.active
-        worksheet.title = title
-        worksheet.append(headers)
-        for data in queryset:
-            worksheet.append(row_data_func(data))
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        )
-        response['Content-Disposition'] = f'attachment; filename={title}.xlsx'
-        workbook.save(response)
-        return response
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method in SAFE_METHODS:
+            context['fields'] = self.query_list('fields')
+            context['expand'] = self.query_list('expand')
+        return context
+
+    def query_list(self, name):
+        # ?fields=id,status,total narrows both the SELECT and the output;
+        # ?expand=contact,line_items nests related objects.
+        value = self.request.query_params.get(name, '')
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    def conditional(self, request, build):
+        models = versions.VERSIONED_MODELS if self.query_list('expand') else [self.queryset.model]
+        return conditional_response(request, models, build)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, lambda: self.list_response(request))
+
+    def retrieve(self, request, *args, **kwargs):
+        retrieve = super().retrieve
+        return self.conditional(request, lambda: retrieve(request, *args, **kwargs))
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            self.record_write(serializer.instance, [], [serializer.instance])
+
+    def perform_update(self, serializer):
+        model = self.queryset.model
+        with transaction.atomic():
+            old = summary.snapshot(model, [serializer.instance.pk])
+            super().perform_update(serializer)
+            self.record_write(serializer.instance, old, [serializer.instance])
+
+    def perform_destroy(self, instance):
+        model = self.queryset.model
+        with transaction.atomic():
+            old = summary.snapshot(model, [instance.pk])
+            cascade.delete(model, [instance])
+            self.record_write(instance, old, [])
+
+    def record_write(self, instance, old, new):
+        # Runs in the writing transaction: summary deltas and version bumps
+        # commit together with the rows.
+        model = self.queryset.model
+        summary.apply(model, old, new)
+        for user_id in {self.request.user.id, instance.user_id}:
+            versions.bump(user_id, model)
+
+    def list_response(self, request):
+        try:
+            reader = ValuesReader(self.get_serializer()) if self.lean_list else None
+        except ValueError:
+            reader = None
+        if reader is None:
+            return super().list(request)
+
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        ordering_field = getattr(self.paginator, 'ordering_field', None)
+        queryset = queryset.values(*dict.fromkeys(reader.columns + ([ordering_field] if ordering_field else [])))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.represent(page))
+        return Response(reader.represent(list(queryset)))
+
+    @property
+    def paginator(self):
+        # ?pagination=keyset opts into cursor pages, ?pagination=nocount or
+        # cached into pages without COUNT(*); offset stays the default.
+        if not hasattr(self, '_paginator'):
+            mode = self.request.query_params.get('pagination') if self.request else None
+            pagination_class = PAGINATION_MODES.get(mode, self.pagination_class)
+            self._paginator = pagination_class() if pagination_class else None
+        return self._paginator
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        # POST creates, PATCH partially updates (items carry their primary
+        # key) and DELETE removes (a list of primary keys) up to
+        # BULK_WRITE_MAX_ITEMS rows in one transaction.
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({"non_field_errors": ["Expected a list of items."]})
+        max_items = getattr(settings, 'BULK_WRITE_MAX_ITEMS', 10000)
+        if len(items) > max_items:
+            raise ValidationError({"non_field_errors": [f"Ensure there are no more than {max_items} items."]})
+
+        writer = BulkWrite(self.queryset.model, request.user)
+        if request.method == 'POST':
+            results = writer.create(items)
+        elif request.method == 'PATCH':
+            results = writer.update(items)
+        else:
+            results = writer.delete(items)
+        failed = sum(1 for result in results if result["status"] == "failed")
+        if failed and failed == len(results):
+            code = status.HTTP_400_BAD_REQUEST
+        elif request.method == 'POST' and not failed:
+            code = status.HTTP_201_CREATED
+        else:
+            code = status.HTTP_200_OK
+        return Response({"succeeded": len(results) - failed, "failed": failed, "results": results}, status=code)
+
+    @action(detail=False, methods=['get'], url_path='export', renderer_classes=EXPORT_RENDERERS)
+    def export(self, request):
+        # The format comes from ?format= or the Accept header, against EXPORT_RENDERERS.
+        schema = self.export_schema
+        queryset = self.filter_queryset(self.get_queryset())
+        export_format = request.accepted_renderer.format
+        if export_format == 'parquet' and pyarrow is None:
+            raise NotAcceptable("Parquet export is not available on this server.")
+        return export_response(request, schema.title, export_cache.version(request.user.id, [queryset.model]),
+                               lambda: stream_export(export_format, schema.title, schema.headers, schema.rows(queryset),
+                                                     schema.fields(queryset.model)))
 
 class SalesOrderView(BaseModelViewSet):
     queryset = SalesOrder.objects.all()
     serializer_class = SalesOrderSerializer
-
-    @action(detail=False, methods=['get'], url_path='export')
-    def export_sales_orders(self, request):
-        queryset = self.filter_queryset(self.get_queryset())
-        headers = ['ID', 'Order Number', 'Customer', 'Date Created']
-        return self.export_to_excel(request, queryset, 'Sales Orders', headers, 
-                                    lambda data: [data.id, data.salesorder_number, data.customer_name, data.shipment_date])
+    filterset_class = SalesOrderFilter
+    search_fields = ['salesorder_number', 'reference_number', 'customer_name']
+    export_schema = ExportSchema('Sales Orders', [
+        ExportColumn('ID', 'id'),
+        ExportColumn('Order Number', 'salesorder_number'),
+        ExportColumn('Customer', 'customer_name'),
+        ExportColumn('Date Created', 'date'),
+    ])
 
 class ContactsView(BaseModelViewSet):
     queryset = Contact.objects.all()
     serializer_class = ContactSerializer
-
-    @action(detail=False, methods=['get'], url_path='export')
-    def export_contacts(self, request):
-        queryset = self.filter_queryset(self.get_queryset())
-        headers = ['NAME', 'COMPANY NAME', 'EMAIL', 'WORK PHONE', 'RECEIVABLES (BCY)', 'UNUSED CREDITS (BCY)']
-        return self.export_to_excel(request, queryset, 'Contacts', headers, 
-                                    lambda data: [data.contact_name, data.company_name, data.unused_credits_receivable_amount, data.unused_credits_receivable_amount_bcy])
+    filterset_class = ContactFilter
+    search_fields = ['contact_name', 'company_name']
+    export_schema = ExportSchema('Contacts', [
+        ExportColumn('NAME', 'contact_name'),
+        ExportColumn('COMPANY NAME', 'company_name'),
+        ExportColumn('EMAIL', primary_contact_person('email')),
+        ExportColumn('WORK PHONE', primary_contact_person('phone')),
+        ExportColumn('RECEIVABLES (BCY)', 'outstanding_receivable_amount_bcy'),
+        ExportColumn('UNUSED CREDITS (BCY)', 'unused_credits_receivable_amount_bcy'),
+    ])
 
 class InvoiceView(BaseModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
-
-    @action(detail=False, methods=['get'], url_path='export')
-    def export_invoices(self, request):
-        queryset = self.filter_queryset(self.get_queryset())
-        headers = ['ID', 'Order Number', 'Customer', 'Date Created']
-        return self.export_to_excel(request, queryset, 'Invoices', headers, 
-                                    lambda data: [data.id, data.salesorder_number, data.customer_name, data.shipment_date])
+    filterset_class = InvoiceFilter
+    search_fields = ['invoice_number', 'customer_name']
+    export_schema = ExportSchema('Invoices', [
+        ExportColumn('ID', 'invoice_id'),
+        ExportColumn('Invoice Number', 'invoice_number'),
+        ExportColumn('Customer', 'customer_name'),
+        ExportColumn('Date Created', 'date'),
+    ])
 
 class CreditNoteView(BaseModelViewSet):
     queryset = CreditNote.objects.all()
     serializer_class = CreditNoteSerializer
-
-    @action(detail=False, methods=['get'], url_path='export')
-    def export_credit_notes(self, request):
-        queryset = self.filter_queryset(self.get_queryset())
-        headers = ['ID', 'Credit Note', 'Status']
-        return self.export_to_excel(request, queryset, 'Credit Notes', headers, 
-                                    lambda data: [data.creditnote_id, data.creditnote_number, data.status])
+    filterset_class = CreditNoteFilter
+    search_fields = ['creditnote_number', 'reference_number', 'customer_name']
+    export_schema = ExportSchema('Credit Notes', [
+        ExportColumn('ID', 'creditnote_id'),
+        ExportColumn('Credit Note', 'creditnote_number'),
+        ExportColumn('Status', 'status'),
+    ])
 
 class ExpensesView(BaseModelViewSet):
     queryset = Expense.objects.all()
     serializer_class = ExpensesOrderSerializer
-
-    @action(detail=False, methods=['get'], url_path='export')
-    def export_expenses(self, request):
-        queryset = self.filter_queryset(self.get_queryset())
-        headers = ['DATE', 'EXPENSE ACCOUNT', 'REFERENCE NUMBER', 'VENDOR NAME', 'PAID THROUGH', 'CUSTOMER NAME', 'STATUS', 'AMOUNT']
-        return self.export_to_excel(request, queryset, 'Expenses', headers, 
-                                    lambda data: [data.date, data.account_name, data.reference_number, data.paid_through_account_name, data.customer_name, data.status, data.total])
+    filterset_class = ExpenseFilter
+    search_fields = ['reference_number', 'customer_name']
+    export_schema = ExportSchema('Expenses', [
+        ExportColumn('DATE', 'date'),
+        ExportColumn('EXPENSE ACCOUNT', 'account_name'),
+        ExportColumn('REFERENCE NUMBER', 'reference_number'),
+        ExportColumn('PAID THROUGH', 'paid_through_account_name'),
+        ExportColumn('CUSTOMER NAME', 'customer_name'),
+        ExportColumn('STATUS', 'status'),
+        ExportColumn('AMOUNT', 'total'),
+    ])
 
 class ImportView(APIView):
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
 
     def post(self, request):
         client_id = request.data.get('client_id')
         client_secret = request.data.get('serect_code')
-        user = request.data.get('user')
-        port = 8003
-        organization_id = "60030126546"
-        token_url = "https://accounts.zoho.in/oauth/v2/token"
-        scope = "ZohoBooks.fullaccess.all"
-        redirect_uri = f"http://localhost:{port}"
-        auth_url = f"https://accounts.zoho.in/oauth/v2/auth?client_id={client_id}&response_type=code&redirect_uri={redirect_uri}&scope={scope}&prompt=consent&access_type=offline"
-
-        apis_to_handle = [
-            {"url": "https://www.zohoapis.in/books/v3/contacts", "filename": "contacts.csv", "name": "contacts"},
-            {"url": "https://www.zohoapis.in/books/v3/salesorders", "filename": "sales_orders.csv", "name": "salesorders"},
-            {"url": "https://www.zohoapis.in/books/v3/invoices", "filename": "invoices.csv", "name": "invoices"},
-            {"url": "https://www.zohoapis.in/books/v3/creditnotes", "filename": "creditnotes.csv", "name": "creditnotes"},
-            {"url": "https://www.zohoapis.in/books/v3/expenses", "filename": "expenses.csv", "name": "expenses"},
+        user = request.user
+        organization_id = request.data.get('organization_id') or settings.ZOHO_ORGANIZATION_ID
+        full_resync = request.data.get('full_resync', False) in BooleanField.TRUE_VALUES
+
+        reauthorize = request.data.get('reauthorize', False) in BooleanField.TRUE_VALUES
+
+        token = ZohoToken.objects.filter(user=user).first()
+        if token and token.refresh_token and not reauthorize and client_id in (None, '', token.client_id):
+            # A stored refresh token lets the job run without the browser round trip.
+            job = ImportJob.objects.create(
+                user=user,
+                status=ImportJob.QUEUED,
+                state=secrets.token_urlsafe(32),
+                client_id=token.client_id,
+                organization_id=organization_id,
+                full_resync=full_resync,
+            )
+            return Response({
+                "message": "Import queued.",
+                "job_id": job.id,
+            }, status=status.HTTP_202_ACCEPTED)
+
+        credentials = {"client_id": client_id, "serect_code": client_secret}
+        missing = {name: ["This field is required."] for name, value in credentials.items() if not value}
+        if missing:
+            raise ValidationError(missing)
+        # The worker reads the client credentials from here to exchange the code;
+        # the secret is never copied onto the job.
+        ZohoToken.objects.update_or_create(user=user, defaults={"client_id": client_id, "client_secret": client_secret})
+        job = ImportJob.objects.create(
+            user=user,
+            state=secrets.token_urlsafe(32),
+            client_id=client_id,
+            organization_id=organization_id,
+            full_resync=full_resync,
+        )
+        query = urllib.parse.urlencode({
+            "client_id": client_id,
+            "response_type": "code",
+            "redirect_uri": settings.ZOHO_REDIRECT_URI,
+            "scope": settings.ZOHO_SCOPE,
+            "prompt": "consent",
+            "access_type": "offline",
+            "state": job.state,
+        })
+        auth_url = f"{settings.ZOHO_ACCOUNTS_URL}/oauth/v2/auth?{query}"
+        return Response({
+            "message": "Authorization process started.",
+            "job_id": job.id,
+            "auth_url": auth_url,
+        }, status=status.HTTP_202_ACCEPTED)
+
+class ImportCallbackView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        code = request.query_params.get('code')
+        job = ImportJob.objects.filter(state=request.query_params.get('state'), status=ImportJob.PENDING).first()
+        if not code or job is None:
+            return HttpResponse(b"Error: No code provided or invalid request.", status=400)
+        job.authorization_code = code
+        job.status = ImportJob.QUEUED
+        job.save(update_fields=['authorization_code', 'status'])
+        logging.info(f"Import job {job.id} authorized and queued")
+        return HttpResponse(b"Authorization received. Data import has been queued.")
+
+class ImportJobView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ImportJob, pk=job_id, user=request.user)
+        return Response(ImportJobSerializer(job).data)
+
+class LedgerExportView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+    renderer_classes = LEDGER_RENDERERS
+    viewsets = [ContactsView, SalesOrderView, InvoiceView, CreditNoteView, ExpensesView]
+
+    def get(self, request):
+        entities = [
+            (viewset.export_schema, viewset.queryset.model.objects.filter(user_id=request.user.id))
+            for viewset in self.viewsets
         ]
+        version = export_cache.version(request.user.id, [viewset.queryset.model for viewset in self.viewsets])
+        export_format = request.accepted_renderer.format
+        return export_response(request, 'Ledger', version, lambda: stream_ledger(export_format, entities))
+
+class ExportDownloadView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
+
+    def get(self, request, key):
+        meta = export_cache.get(key)
+        if meta is not None and meta['user_id'] == request.user.id:
+            return export_cache.response(key, meta)
+        if export_cache.is_building(key):
+            return Response({"status": "building"}, status=status.HTTP_202_ACCEPTED)
+        return Response({"detail": "Export not found or expired."}, status=status.HTTP_404_NOT_FOUND)
+
+class SummaryView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [CachedJWTAuthentication]
 
-        user = User.objects.get(username=user)
-        webbrowser.open(auth_url)
-        with socketserver.ThreadingTCPServer(("", port), MyHandler) as httpd:
-            httpd.RequestHandlerClass.user = user
-            httpd.RequestHandlerClass.client_id = client_id
-            httpd.RequestHandlerClass.client_secret = client_secret
-            httpd.RequestHandlerClass.redirect_uri = redirect_uri
-            httpd.RequestHandlerClass.organization_id = organization_id
-            httpd.RequestHandlerClass.token_url = token_url
-            httpd.RequestHandlerClass.apis_to_handle = apis_to_handle
-
-            try:
-                httpd.serve_forever()
-            except KeyboardInterrupt:
-                logging.info("Server stopped.")
-        httpd.shutdown()
-        httpd.server_close()
-        return Response({"message": "Authorization process started."})
+    def get(self, request):
+        return conditional_response(request, summary.SUMMARY_MODELS, lambda: Response(summary.report(request.user)))
@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 	'rest_framework',
 	'corsheaders',
+	'django_filters',
     'app'
 ]
 
@@ -91,9 +92,17 @@ DATABASES = {
         'NAME': 'barbarik',
 		'USER': 'root',
 		'PASSWORD': 'anbu1912',
-		'PORT': '3306'
+		'PORT': '3306',
     }
 }
+# load_csv's LOAD DATA LOCAL INFILE uses this connection; request
+# connections keep local_infile off.
+DATABASES['bulk_load'] = dict(
+    DATABASES['default'],
+    OPTIONS={**DATABASES['default'].get('OPTIONS', {}), 'local_infile': 1},
+    TEST={'MIRROR': 'default'},
+)
+CSV_LOAD_DATABASE = 'bulk_load'
 
 
 
@@ -138,4 +147,52 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-AUTH_USER_MODEL = "app.Users"
\ No newline at end of file
+AUTH_USER_MODEL = "app.Users"
+
+# Zoho Books import
+ZOHO_ACCOUNTS_URL = "https://accounts.zoho.in"
+ZOHO_API_URL = "https://www.zohoapis.in/books/v3"
+ZOHO_ORGANIZATION_ID = "60030126546"
+ZOHO_SCOPE = "ZohoBooks.fullaccess.all"
+ZOHO_REDIRECT_URI = "http://localhost:8000/api/import/callback/"
+ZOHO_TOKEN_REFRESH_MARGIN = 300
+ZOHO_PAGE_SIZE = 200
+ZOHO_MAX_CONCURRENCY = 5
+ZOHO_MAX_RETRIES = 5
+ZOHO_TIMEOUT = 30
+IMPORT_CHUNK_SIZE = 500
+IMPORT_WORKER_POLL_INTERVAL = 5
+# Running jobs whose heartbeat is older than IMPORT_JOB_STALE_AFTER seconds
+# are claimed again by another worker.
+IMPORT_WORKER_HEARTBEAT_INTERVAL = 30
+IMPORT_JOB_STALE_AFTER = 300
+
+# Bulk write endpoints (/api/<entity>/bulk/)
+BULK_WRITE_MAX_ITEMS = 10000
+BULK_WRITE_BATCH_SIZE = 500
+
+# Exports
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_PARQUET_ROW_GROUP_SIZE = 50000
+EXPORT_CACHE_DIR = BASE_DIR / 'export_cache'
+EXPORT_CACHE_MAX_BYTES = 1024 ** 3
+
+# API response caching
+# List and detail responses carry ETag/Last-Modified either way. A positive
+# timeout also keeps serialized responses in this cache alias; configure a
+# shared CACHES backend when running several workers.
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = 0
+
+# ?pagination=cached: row counts per user and filter, recomputed in the
+# background once older than the TTL (seconds).
+PAGINATION_COUNT_CACHE_ALIAS = 'default'
+PAGINATION_COUNT_TTL = 300
+
+# Authenticated users are cached by id for PRINCIPAL_CACHE_TTL seconds in
+# each process (LRU of PRINCIPAL_CACHE_SIZE) and, if an alias is set, in that
+# shared cache. Saving a user evicts it; other processes see the change
+# within the TTL. 0 disables the cache.
+PRINCIPAL_CACHE_TTL = 60
+PRINCIPAL_CACHE_SIZE = 10000
+PRINCIPAL_CACHE_ALIAS = None